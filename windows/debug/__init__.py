@@ -1,3 +1,4 @@
 from .debugger import Debugger, HXBreakpoint
 from .localdbg import LocalDebugger
+from .symbols import Symbolizer
 from .breakpoints import *
\ No newline at end of file
@@ -13,6 +13,7 @@ from windows import winproxy
 from windows.generated_def.winstructs import *
 from windows.generated_def import windef
 from .breakpoints import *
+from .symbols import Symbolizer
 
 #from windows.syswow64 import CS_32bits
 from windows.winobject.exception import VectoredException
@@ -63,6 +64,7 @@ class Debugger(object):
         self._breakpoint_to_reput = {}
 
         self._module_by_process = {}
+        self._symbolizer_by_process = {}
 
         self._pending_breakpoints_new = defaultdict(list)
 
@@ -127,6 +129,7 @@ class Debugger(object):
         del self.processes[target.pid]
         del self._watched_pages[target.pid]
         del self._module_by_process[target.pid]
+        del self._symbolizer_by_process[target.pid]
 
         if target is self.current_process:
             self._finish_debug_event(self.REMOVE_ME_debug_event, DBG_CONTINUE)
@@ -180,7 +183,9 @@ class Debugger(object):
         exe_path = self.current_process.get_mapped_filename(create_process_event.lpBaseOfImage)
         exe_name = os.path.basename(exe_path)
         #print("Exe name is {0}".format(exe_name))
-        self._module_by_process[self.current_process.pid][exe_name] = windows.pe_parse.GetPEFile(create_process_event.lpBaseOfImage, self.current_process)
+        pe = windows.pe_parse.GetPEFile(create_process_event.lpBaseOfImage, self.current_process)
+        self._module_by_process[self.current_process.pid][exe_name] = pe
+        self._symbolizer_by_process[self.current_process.pid].add_pe(exe_name, pe)
         #self._setup_pending_breakpoints_load_dll(exe_name) # Already setup in _setup_pending_breakpoints_new_process
 
 
@@ -211,8 +216,7 @@ class Debugger(object):
             mod = [modules[dll]]
         if not mod:
             return None
-        # TODO: optim exports are the same for whole system (32 vs 64 bits)
-        # I don't have to reparse the exports each time..
+        # The exports are parsed once by PE identity (see pe_parse.pe_index)
         # Try to interpret api as an int
         try:
             api_int = int(api, 0)
@@ -225,6 +229,14 @@ class Debugger(object):
             raise ValueError("Unknown API <{0}> in DLL {1}".format(api, dll))
         return exports[api]
 
+    def symbolize(self, addr, target=None):
+        """Return ``addr`` in ``target`` (default: the current process) as ``module!export+offset``
+
+        :rtype: :class:`str`"""
+        if target is None:
+            target = self.current_process
+        return self._symbolizer_by_process[target.pid].symbolize(addr)
+
     def add_pending_breakpoint(self, bp, target):
         self._pending_breakpoints_new[target].append(bp)
 
@@ -669,6 +681,7 @@ class Debugger(object):
         self.breakpoints[self.current_process.pid] = {}
         self._memory_save[self.current_process.pid] = {}
         self._module_by_process[self.current_process.pid] = {}
+        self._symbolizer_by_process[self.current_process.pid] = Symbolizer()
         self._update_debugger_state(debug_event)
         self._add_exe_to_module_list(create_process)
         self._setup_pending_breakpoints_new_process(self.current_process)
@@ -693,6 +706,7 @@ class Debugger(object):
         del self._watched_pages[self.current_process.pid]
         del self._memory_save[self.current_process.pid]
         del self._module_by_process[self.current_process.pid]
+        del self._symbolizer_by_process[self.current_process.pid]
 
         cpid = self.current_process.pid
         self.current_thread = None
@@ -745,7 +759,9 @@ class Debugger(object):
         if dll_name.endswith(".dll64"):
             dll_name = dll_name[:-6] +  "64" # Crade..
         #print("Load {0} -> {1}".format(dll, dll_name))
-        self._module_by_process[self.current_process.pid][dll_name] = windows.pe_parse.GetPEFile(load_dll.lpBaseOfDll, self.current_process)
+        pe = windows.pe_parse.GetPEFile(load_dll.lpBaseOfDll, self.current_process)
+        self._module_by_process[self.current_process.pid][dll_name] = pe
+        self._symbolizer_by_process[self.current_process.pid].add_pe(dll_name, pe)
         self._setup_pending_breakpoints_load_dll(dll_name)
         with self.DisabledMemoryBreakpoint():
             try:
@@ -758,6 +774,7 @@ class Debugger(object):
         """Handle UNLOAD_DLL_DEBUG_EVENT"""
         self._update_debugger_state(debug_event)
         unload_dll = debug_event.u.UnloadDll
+        self._symbolizer_by_process[self.current_process.pid].remove_module(unload_dll.lpBaseOfDll)
         with self.DisabledMemoryBreakpoint():
             return self.on_unload_dll(unload_dll)
 
@@ -0,0 +1,132 @@
+"""Resolution of addresses to ``module!export+offset`` with the exports of the loaded modules"""
+import bisect
+import collections
+
+Symbol = collections.namedtuple("Symbol", ["module", "export", "offset"])
+
+
+class ModuleSymbols(object):
+    """The sorted exports of a module: built at the first lookup in the module"""
+    def __init__(self, name, baseaddr, size, pe):
+        self.name = name
+        self.baseaddr = baseaddr
+        self.size = size
+        self.pe = pe
+        self._rvas = None
+        self._names = None
+
+    def load_exports(self):
+        if self.pe is None:
+            rvas_by_key, forwarded = {}, {}
+        else:
+            rvas_by_key, forwarded = self.pe.get_export_tables()
+        # The smallest name of an RVA, else its lowest ordinal as "#N"
+        names_by_rva = {}
+        ordinals_by_rva = {}
+        for key, rva in rvas_by_key.items():
+            # RVA 0: unused slot of the export address table
+            if key in forwarded or not rva:
+                continue
+            if isinstance(key, (int, long)):
+                ordinals_by_rva[rva] = min(key, ordinals_by_rva.get(rva, key))
+            else:
+                names_by_rva[rva] = min(key, names_by_rva.get(rva, key))
+        for rva, ordinal in ordinals_by_rva.items():
+            names_by_rva.setdefault(rva, "#{0}".format(ordinal))
+        self._rvas = sorted(names_by_rva)
+        self._names = [names_by_rva[rva] for rva in self._rvas]
+
+    def resolve(self, addr):
+        if self._rvas is None:
+            self.load_exports()
+        rva = addr - self.baseaddr
+        index = bisect.bisect_right(self._rvas, rva) - 1
+        if index < 0:
+            return Symbol(self.name, None, rva)
+        return Symbol(self.name, self._names[index], rva - self._rvas[index])
+
+    def __repr__(self):
+        return '<{0} "{1}" at {2:#x}>'.format(type(self).__name__, self.name, self.baseaddr)
+
+
+class Symbolizer(object):
+    """Resolve the addresses of a process to the closest previous export of their module.
+
+    The module ranges and the exports of each module are sorted lists: a resolution is two binary searches.
+    """
+    def __init__(self):
+        self.starts = []
+        self.modules = []
+
+    @classmethod
+    def from_process(cls, process):
+        """A :class:`Symbolizer` for the modules in the PEB of ``process``"""
+        self = cls()
+        for module in process.peb.modules:
+            self.add_module(module.name, module.baseaddr, module.SizeOfImage, module.pe)
+        return self
+
+    def add_module(self, name, baseaddr, size, pe=None):
+        """Add the module ``name`` at ``baseaddr``. ``pe`` (:class:`windows.pe_parse.PEFile`) gives the exports"""
+        self.remove_module(baseaddr)
+        index = bisect.bisect_right(self.starts, baseaddr)
+        self.starts.insert(index, baseaddr)
+        self.modules.insert(index, ModuleSymbols(name, baseaddr, size, pe))
+
+    def add_pe(self, name, pe):
+        """Add the module ``name`` described by the :class:`windows.pe_parse.PEFile` ``pe``"""
+        self.add_module(name, pe.baseaddr, pe.get_OptionalHeader().SizeOfImage, pe)
+
+    def remove_module(self, baseaddr):
+        """Remove the module at ``baseaddr``: return ``False`` if there is no such module"""
+        index = bisect.bisect_left(self.starts, baseaddr)
+        if index == len(self.starts) or self.starts[index] != baseaddr:
+            return False
+        del self.starts[index]
+        del self.modules[index]
+        return True
+
+    def get_module(self, addr):
+        """The :class:`ModuleSymbols` that contains ``addr`` or ``None``"""
+        index = bisect.bisect_right(self.starts, addr) - 1
+        if index < 0:
+            return None
+        module = self.modules[index]
+        if addr >= module.baseaddr + module.size:
+            return None
+        return module
+
+    def resolve(self, addr):
+        """Return the :class:`Symbol` ``(module, export, offset)`` of ``addr`` or ``None`` if ``addr`` is not in a module.
+
+        ``export`` is ``None`` if ``addr`` is before the first export (``offset`` is then relative to the module)
+        """
+        # Inlined get_module / ModuleSymbols.resolve: this is the hot path of the tracers
+        index = bisect.bisect_right(self.starts, addr) - 1
+        if index < 0:
+            return None
+        module = self.modules[index]
+        rva = addr - module.baseaddr
+        if rva >= module.size:
+            return None
+        if module._rvas is None:
+            module.load_exports()
+        rvas = module._rvas
+        index = bisect.bisect_right(rvas, rva) - 1
+        if index < 0:
+            return Symbol(module.name, None, rva)
+        return Symbol(module.name, module._names[index], rva - rvas[index])
+
+    def symbolize(self, addr):
+        """Return ``addr`` as a :class:`str`: ``module!export+0x10``, ``module+0x1234`` or ``0x12345678``"""
+        symbol = self.resolve(addr)
+        if symbol is None:
+            return "{0:#x}".format(addr)
+        if symbol.export is None:
+            return "{0}+{1:#x}".format(symbol.module, symbol.offset)
+        if not symbol.offset:
+            return "{0}!{1}".format(symbol.module, symbol.export)
+        return "{0}!{1}+{2:#x}".format(symbol.module, symbol.export, symbol.offset)
+
+    def __len__(self):
+        return len(self.modules)
@@ -1,8 +1,14 @@
 import sys
 import ctypes
+import struct
 
+import windows
 import windows.utils as utils
+from windows import winproxy
 from . import native_exec
+from .native_exec import native_function, simple_disasm, trampoline
+from .native_exec import simple_x86 as x86
+from .native_exec import simple_x64 as x64
 from .generated_def import winfuncs
 from .generated_def.windef import PAGE_EXECUTE_READWRITE
 from .generated_def.winstructs import *
@@ -41,24 +47,19 @@ for func in winfuncs.functions:
     add_callback_to_module(CallBackDeclaration())
 
 
-class IATHook(object):
-    """Look at my hook <3"""
-    yolo = []
-
-    def __init__(self, IAT_entry, callback, types=None):
+class Hook(object):
+    """Base of the hooks: call ``callback`` with a ``real_function`` keyword argument"""
+    def __init__(self, callback, types=None):
         if types is None:
             if not hasattr(callback, "_types_info"):
-                raise ValueError("Callback for IATHook has no type infomations")
+                raise ValueError("Callback for {0} has no type infomations".format(type(self).__name__))
             types = callback._types_info
         self.original_types = types
         self.callback_types = self.transform_arguments(self.original_types)
-        self.entry = IAT_entry
         self.callback = callback
         self.stub = ctypes.WINFUNCTYPE(*self.callback_types)(self.hook_callback)
         self.stub_addr = ctypes.cast(self.stub, PVOID).value
-        self.realfunction = ctypes.WINFUNCTYPE(*types)(IAT_entry.nonhookvalue)
         self.is_enable = False
-        #IATHook.yolo.append(self)
 
     def transform_arguments(self, types):
         res = []
@@ -69,18 +70,6 @@ class IATHook(object):
                 res.append(type)
         return res
 
-    def enable(self):
-        """Enable the IAT hook: you MUST keep a reference to the IATHook while the hook is enabled"""
-        with utils.VirtualProtected(self.entry.addr, ctypes.sizeof(PVOID), PAGE_EXECUTE_READWRITE):
-            self.entry.value = self.stub_addr
-        self.is_enable = True
-
-    def disable(self):
-        """Disable the IAT hook"""
-        with utils.VirtualProtected(self.entry.addr, ctypes.sizeof(PVOID), PAGE_EXECUTE_READWRITE):
-            self.entry.value = self.entry.nonhookvalue
-        self.is_enable = False
-
     def hook_callback(self, *args):
         adapted_args = []
         for value, type in zip(args, self.original_types[1:]):
@@ -97,6 +86,409 @@ class IATHook(object):
             return self.realfunction(*args)
         return self.callback(*adapted_args, real_function=real_function)
 
+
+class IATHook(Hook):
+    """Look at my hook <3
+
+    If ``native_filter`` is a :class:`NativeFilter` the IAT entry points to the native filter
+    that only calls the Python callback for the matching calls.
+    """
+    yolo = []
+
+    def __init__(self, IAT_entry, callback, types=None, native_filter=None):
+        super(IATHook, self).__init__(callback, types)
+        self.entry = IAT_entry
+        self.realfunction = ctypes.WINFUNCTYPE(*self.original_types)(IAT_entry.nonhookvalue)
+        self.native_filter = native_filter
+        self.hook_addr = self.stub_addr
+        if native_filter is not None:
+            self.hook_addr = native_filter.setup(self.original_types, self.stub_addr, IAT_entry.nonhookvalue)
+        #IATHook.yolo.append(self)
+
+    def enable(self):
+        """Enable the IAT hook: you MUST keep a reference to the IATHook while the hook is enabled"""
+        with utils.VirtualProtected(self.entry.addr, ctypes.sizeof(PVOID), PAGE_EXECUTE_READWRITE):
+            self.entry.value = self.hook_addr
+        self.is_enable = True
+
+    def disable(self):
+        """Disable the IAT hook"""
+        with utils.VirtualProtected(self.entry.addr, ctypes.sizeof(PVOID), PAGE_EXECUTE_READWRITE):
+            self.entry.value = self.entry.nonhookvalue
+        self.is_enable = False
+
     # Use this tricks to prevent garbage collection of hook ?
     #def __del__(self):
     #    pass
+
+
+class NativeFilter(object):
+    """A filter of the calls of an :class:`IATHook` that runs in native code
+
+    The calls whose arguments match all the ``conditions`` call the Python callback,
+    the other calls jump directly to the real function.
+    A condition is a tuple ``(argument_index, operator, value)`` with ``operator`` in
+    ``==``, ``!=``, ``&`` (one of the bits of ``value`` is set), ``<`` and ``>`` (unsigned comparisons).
+
+    The filter counts the calls (:attr:`nb_calls`) and the matching calls (:attr:`nb_matched`).
+    A filter can only be used by one hook.
+    """
+    # Jump to use if the condition does NOT match
+    operators = {"==": "Jnz", "!=": "Jz", "&": "Jz", "<": "Jnb", ">": "Jbe"}
+    x64_arguments_registers = ["RCX", "RDX", "R8", "R9"]
+
+    def __init__(self, *conditions):
+        for index, operator, value in conditions:
+            if operator not in self.operators:
+                raise ValueError("Unknown NativeFilter operator <{0}>".format(operator))
+        self.conditions = conditions
+        self.data = None
+        self.code_addr = None
+
+    @property
+    def nb_calls(self):
+        """Number of calls to the hooked function"""
+        return self.data[0] if self.data is not None else 0
+
+    @property
+    def nb_matched(self):
+        """Number of calls that matched the conditions"""
+        return self.data[1] if self.data is not None else 0
+
+    def setup(self, types, match_addr, nomatch_addr):
+        """Generate the filter of a function of prototype ``types``, return the address of its code"""
+        if self.data is not None:
+            raise ValueError("NativeFilter is already used by a hook")
+        ptr_size = ctypes.sizeof(ctypes.c_size_t)
+        # Data: nb_calls, nb_matched, match_addr, nomatch_addr (aligned for the lock inc)
+        data_addr = native_function.allocator.reserve_size(ptr_size * 5)
+        data_addr += -data_addr % ptr_size
+        self.data = (ctypes.c_size_t * 4).from_address(data_addr)
+        self.data[2] = match_addr
+        self.data[3] = nomatch_addr
+        if windows.current_process.bitness == 32:
+            code = self.generate_code_32(types[1:], data_addr)
+        else:
+            code = self.generate_code_64(types[1:], data_addr)
+        self.code_addr = native_function.allocator.write_code(code.get_code())
+        return self.code_addr
+
+    def generate_code_32(self, arg_types, data_addr):
+        # Offset of the arguments on the stack at the function entry
+        offsets = []
+        offset = 4
+        for arg_type in arg_types:
+            offsets.append(offset)
+            offset += (ctypes.sizeof(arg_type) + 3) & ~3
+        code = x86.MultipleInstr()
+        code += x86.LockPrefix + x86.Inc(x86.mem("[{0}]".format(data_addr)))
+        for index, operator, value in self.conditions:
+            if ctypes.sizeof(arg_types[index]) > 4:
+                raise ValueError("NativeFilter cannot compare the argument {0} of size {1}".format(index, ctypes.sizeof(arg_types[index])))
+            arg = x86.mem("[ESP + {0}]".format(offsets[index]))
+            if operator == "&":
+                code += x86.Test(arg, value & 0xffffffff)
+            else:
+                code += x86.Cmp(arg, value & 0xffffffff)
+            code += getattr(x86, self.operators[operator])(":NO_MATCH")
+        code += x86.LockPrefix + x86.Inc(x86.mem("[{0}]".format(data_addr + 4)))
+        code += x86.Jmp(x86.mem("[{0}]".format(data_addr + 8)))
+        code += x86.Label(":NO_MATCH")
+        code += x86.Jmp(x86.mem("[{0}]".format(data_addr + 12)))
+        return code
+
+    def generate_code_64(self, arg_types, data_addr):
+        # Only volatile registers that are not used for arguments are modified: RAX, R10 and R11
+        code = x64.MultipleInstr()
+        code += x64.Mov("R10", data_addr)
+        code += x64.LockPrefix + x64.Inc(x64.mem("[R10]"))
+        for index, operator, value in self.conditions:
+            size = ctypes.sizeof(arg_types[index])
+            if index < 4:
+                arg = self.x64_arguments_registers[index]
+            else:
+                code += x64.Mov("RAX", x64.mem("[RSP + {0}]".format(8 + 8 * index)))
+                arg = "RAX"
+            if size <= 4:
+                arg = x64.registers_64_to_32_bits[arg]
+                value &= 0xffffffff
+            else:
+                value &= 0xffffffffffffffff
+                if value >= 0x8000000000000000:
+                    value -= 0x10000000000000000
+                if not -0x80000000 <= value <= 0x7fffffff:
+                    # The immediats are sign extended: compare with a register
+                    code += x64.Mov("R11", value)
+                    value = "R11"
+            code += (x64.Test if operator == "&" else x64.Cmp)(arg, value)
+            code += getattr(x64, self.operators[operator])(":NO_MATCH")
+        code += x64.LockPrefix + x64.Inc(x64.mem("[R10 + 8]"))
+        code += x64.Jmp(x64.mem("[R10 + 16]"))
+        code += x64.Label(":NO_MATCH")
+        code += x64.Jmp(x64.mem("[R10 + 24]"))
+        return code
+
+
+class CountingHookData(ctypes.Structure):
+    """The data shared by the native code of a :class:`CountingHook` and Python"""
+    _fields_ = [("nb_calls", ctypes.c_size_t),
+                ("nb_samples", ctypes.c_size_t),
+                ("real_function", ctypes.c_size_t)]
+
+
+class CountingHook(object):
+    """A hook of an IAT entry that counts the calls in native code (``lock xadd``) without calling Python
+
+    If ``latency_ring_size`` is not 0, the ``rdtsc`` duration of one call every ``sampling`` calls is recorded
+    in a ring buffer of ``latency_ring_size`` entries (the durations are truncated to 32 bits on 32 bits process).
+    The latency measure needs the prototype of the function: ``types`` (see :class:`Callback`) or
+    a known function of :mod:`windows.generated_def.winfuncs` with the same name as the IAT entry.
+
+    The counters are only read when asked: :attr:`nb_calls` and :func:`latencies`.
+
+    On 64 bits process, the stub of the latency measure registers its unwind data (``RtlAddFunctionTable``)
+    for the exceptions raised by the hooked function, it is removed when the :class:`CountingHook` is destroyed.
+    """
+    def __init__(self, IAT_entry, types=None, latency_ring_size=0, sampling=1):
+        if latency_ring_size & (latency_ring_size - 1) or sampling < 1 or sampling & (sampling - 1):
+            raise ValueError("CountingHook latency_ring_size and sampling must be powers of 2")
+        if latency_ring_size and types is None:
+            if not hasattr(winfuncs, IAT_entry.name + "Prototype"):
+                raise ValueError("CountingHook with latency on an unknown function <{0}> needs types".format(IAT_entry.name))
+            prototype = getattr(winfuncs, IAT_entry.name + "Prototype")
+            types = (prototype._restype_,) + prototype._argtypes_
+        self.entry = IAT_entry
+        self.types = types
+        self.latency_ring_size = latency_ring_size
+        self.sampling = sampling
+        self.is_enable = False
+
+        data_size = ctypes.sizeof(CountingHookData) + ctypes.sizeof(ctypes.c_size_t) * (latency_ring_size + 1)
+        data_addr = native_function.allocator.reserve_size(data_size)
+        data_addr += -data_addr % ctypes.sizeof(ctypes.c_size_t)
+        self.data = CountingHookData.from_address(data_addr)
+        self.data.real_function = IAT_entry.nonhookvalue
+        self.ring = (ctypes.c_size_t * latency_ring_size).from_address(data_addr + ctypes.sizeof(CountingHookData))
+        self.function_table = None
+        if windows.current_process.bitness == 32:
+            self.code_addr = native_function.allocator.write_code(self.generate_code_32(data_addr).get_code())
+            return
+        code, frame = self.generate_code_64(data_addr)
+        if frame is None:
+            self.code_addr = native_function.allocator.write_code(code)
+            return
+        # The latency measure calls the real function from a stack frame: the unwinder needs
+        # the RUNTIME_FUNCTION of the stub to go through it when an exception is raised by the call
+        code += "\x00" * (-len(code) % 4)
+        function_table_offset, unwind_data = x64_unwind_data(len(code), *frame)
+        code += unwind_data
+        # The UNWIND_INFO and RUNTIME_FUNCTION are aligned on 4
+        self.code_addr = native_function.allocator.reserve_size(len(code) + 3)
+        self.code_addr += -self.code_addr % 4
+        ctypes.memmove(self.code_addr, code, len(code))
+        self.function_table = self.code_addr + function_table_offset
+        winproxy.RtlAddFunctionTable(self.function_table, 1, self.code_addr)
+
+    def __del__(self):
+        if getattr(self, "function_table", None) is not None and winproxy is not None:
+            winproxy.RtlDeleteFunctionTable(self.function_table)
+
+    @property
+    def nb_calls(self):
+        """Number of calls to the hooked function"""
+        return self.data.nb_calls
+
+    def latencies(self):
+        """The last recorded latencies (in ``rdtsc`` ticks) from the oldest to the newest"""
+        nb_samples = self.data.nb_samples
+        if nb_samples <= self.latency_ring_size:
+            return self.ring[:nb_samples]
+        start = nb_samples % self.latency_ring_size
+        return self.ring[start:] + self.ring[:start]
+
+    def reset(self):
+        """Reset the counters"""
+        self.data.nb_calls = 0
+        self.data.nb_samples = 0
+
+    def enable(self):
+        """Enable the counting hook"""
+        with utils.VirtualProtected(self.entry.addr, ctypes.sizeof(PVOID), PAGE_EXECUTE_READWRITE):
+            self.entry.value = self.code_addr
+        self.is_enable = True
+
+    def disable(self):
+        """Disable the counting hook"""
+        with utils.VirtualProtected(self.entry.addr, ctypes.sizeof(PVOID), PAGE_EXECUTE_READWRITE):
+            self.entry.value = self.entry.nonhookvalue
+        self.is_enable = False
+
+    def generate_code_32(self, data_addr):
+        nb_calls, nb_samples, real_function, ring = [x86.mem("[{0}]".format(data_addr + 4 * i)) for i in range(4)]
+        code = x86.MultipleInstr()
+        if not self.latency_ring_size:
+            code += x86.LockPrefix + x86.Inc(nb_calls)
+            code += x86.Jmp(real_function)
+            return code
+        code += x86.Mov("EAX", 1)
+        code += x86.LockPrefix + x86.Xadd(nb_calls, "EAX")
+        if self.sampling > 1:
+            code += x86.Test("EAX", self.sampling - 1)
+            code += x86.Jnz(":NO_SAMPLE")
+        # stdcall: copy the arguments and call the real function
+        nb_args_dword = sum((ctypes.sizeof(arg_type) + 3) // 4 for arg_type in self.types[1:])
+        code += x86.Rdtsc()
+        code += x86.Push("EAX")
+        for i in range(nb_args_dword):
+            code += x86.Push(x86.mem("[ESP + {0}]".format(4 + 4 * nb_args_dword)))
+        code += x86.Call(real_function)
+        code += x86.Push("EDX")
+        code += x86.Push("EAX")
+        code += x86.Rdtsc()
+        code += x86.Sub("EAX", x86.mem("[ESP + 8]"))
+        code += x86.Mov("ECX", 1)
+        code += x86.LockPrefix + x86.Xadd(nb_samples, "ECX")
+        code += x86.And("ECX", self.latency_ring_size - 1)
+        code += x86.Mov(x86.mem("[ECX * 4 + {0}]".format(data_addr + 12)), "EAX")
+        code += x86.Pop("EAX")
+        code += x86.Pop("EDX")
+        code += x86.Add("ESP", 4)
+        code += x86.Ret(4 * nb_args_dword) if nb_args_dword else x86.Ret()
+        code += x86.Label(":NO_SAMPLE")
+        code += x86.Jmp(real_function)
+        return code
+
+    def generate_code_64(self, data_addr):
+        """Return the code and the ``(begin, end, prolog size, frame size)`` of its part with a stack frame
+        (``None`` without latency measure)"""
+        # Only the volatile registers RAX, RCX (after the call), R10 and R11 are modified
+        code = x64.MultipleInstr()
+        code += x64.Mov("R10", data_addr)
+        if not self.latency_ring_size:
+            code += x64.LockPrefix + x64.Inc(x64.mem("[R10]"))
+            code += x64.Jmp(x64.mem("[R10 + 16]"))
+            return code.get_code(), None
+        code += x64.Mov("EAX", 1)
+        code += x64.LockPrefix + x64.Xadd(x64.mem("[R10]"), "RAX")
+        if self.sampling > 1:
+            code += x64.Test("EAX", self.sampling - 1)
+            code += x64.Jz(":SAMPLE")
+            code += x64.Jmp(x64.mem("[R10 + 16]"))
+            code += x64.Label(":SAMPLE")
+        code = code.get_code()
+        nb_stack_args = max(len(self.types) - 1 - 4, 0)
+        # Frame: shadow space + stack arguments + start tsc, RSP aligned on 16 for the call
+        frame_size = 0x20 + 8 * nb_stack_args + 8
+        frame_size += 8 - frame_size % 16 if frame_size % 16 != 8 else 0
+        # The prolog is only the allocation of the frame
+        prolog = x64.Sub("RSP", frame_size).get_code()
+        sample = x64.MultipleInstr()
+        sample += x64.Mov("R11", "RDX")
+        sample += x64.Rdtsc()
+        sample += x64.Shl("RDX", 32)
+        sample += x64.Or("RAX", "RDX")
+        sample += x64.Mov("RDX", "R11")
+        sample += x64.Mov(x64.mem("[RSP + {0}]".format(frame_size - 8)), "RAX")
+        for i in range(4, 4 + nb_stack_args):
+            sample += x64.Mov("RAX", x64.mem("[RSP + {0}]".format(frame_size + 8 + 8 * i)))
+            sample += x64.Mov(x64.mem("[RSP + {0}]".format(8 * i)), "RAX")
+        sample += x64.Mov("RAX", data_addr)
+        sample += x64.Call(x64.mem("[RAX + 16]"))
+        sample += x64.Mov(x64.mem("[RSP]"), "RAX")
+        sample += x64.Rdtsc()
+        sample += x64.Shl("RDX", 32)
+        sample += x64.Or("RAX", "RDX")
+        sample += x64.Sub("RAX", x64.mem("[RSP + {0}]".format(frame_size - 8)))
+        sample += x64.Mov("R10", data_addr)
+        sample += x64.Mov("ECX", 1)
+        sample += x64.LockPrefix + x64.Xadd(x64.mem("[R10 + 8]"), "RCX")
+        sample += x64.And("ECX", self.latency_ring_size - 1)
+        sample += x64.Mov(x64.mem("[R10 + RCX * 8 + 24]"), "RAX")
+        sample += x64.Mov("RAX", x64.mem("[RSP]"))
+        # Epilog
+        sample += x64.Add("RSP", frame_size)
+        sample += x64.Ret()
+        function = prolog + sample.get_code()
+        return code + function, (len(code), len(code) + len(function), len(prolog), frame_size)
+
+
+UWOP_ALLOC_LARGE = 1
+UWOP_ALLOC_SMALL = 2
+
+
+def x64_unwind_data(offset, begin, end, prolog_size, frame_size):
+    """Return the ``UNWIND_INFO`` + ``RUNTIME_FUNCTION`` of a x64 function of ``code[begin:end]`` whose prolog
+    (``prolog_size`` bytes) only allocates ``frame_size`` bytes of stack, to write at ``code[offset:]``
+    (aligned on 4). The RVA are relative to the ``code``.
+
+    :return: the offset of the ``RUNTIME_FUNCTION`` in ``code`` and the data
+    :rtype: (:class:`int`, :class:`str`)
+    """
+    if frame_size <= 128:
+        unwind_codes = [(prolog_size, UWOP_ALLOC_SMALL | ((frame_size - 8) // 8) << 4)]
+    elif frame_size < 0x80000:
+        unwind_codes = [(prolog_size, UWOP_ALLOC_LARGE), frame_size // 8]
+    else:
+        unwind_codes = [(prolog_size, UWOP_ALLOC_LARGE | 1 << 4), frame_size & 0xffff, frame_size >> 16]
+    nb_codes = len(unwind_codes)
+    # The array of unwind codes always has an even number of entries
+    unwind_codes += [0] * (nb_codes % 2)
+    # Version 1, no flags, no frame register
+    data = struct.pack("<BBBB", 1, prolog_size, nb_codes, 0)
+    for unwind_code in unwind_codes:
+        data += struct.pack("<BB", *unwind_code) if isinstance(unwind_code, tuple) else struct.pack("<H", unwind_code)
+    data += struct.pack("<III", begin, end, offset)
+    return offset + len(data) - 12, data
+
+
+class InlineHook(Hook):
+    """Hook a function of the current process by replacing its first instructions by a jump to the callback
+
+    The replaced instructions are relocated in a trampoline used as the ``real_function``.
+    """
+    def __init__(self, addr, callback, types=None):
+        super(InlineHook, self).__init__(callback, types)
+        self.addr = addr
+        bitness = windows.current_process.bitness
+        detour = trampoline.detour_code(self.stub_addr, bitness)
+        code = ctypes.string_at(addr, len(detour) + simple_disasm.MAX_INSTRUCTION_LENGTH)
+        # The size of the trampoline does not depend of its address
+        trampoline_code, self.stolen_size = trampoline.build_trampoline(code, addr, 0, len(detour), bitness)
+        self.trampoline_addr = native_function.allocator.reserve_size(len(trampoline_code))
+        trampoline_code, _ = trampoline.build_trampoline(code, addr, self.trampoline_addr, len(detour), bitness)
+        ctypes.memmove(self.trampoline_addr, trampoline_code, len(trampoline_code))
+        self.original_code = code[:self.stolen_size]
+        self.hook_code = trampoline.hook_patch(detour, self.stolen_size)
+        self.realfunction = ctypes.WINFUNCTYPE(*self.original_types)(self.trampoline_addr)
+
+    def enable(self):
+        """Enable the inline hook: you MUST keep a reference to the InlineHook while the hook is enabled"""
+        enable_inline_hooks([self])
+
+    def disable(self):
+        """Disable the inline hook"""
+        disable_inline_hooks([self])
+
+
+def write_code_patches(patches):
+    """Write the ``(addr, code)`` patches in the current process with one VirtualProtected by range of pages"""
+    for range_addr, range_size, range_patches in trampoline.patches_by_pages(patches):
+        with utils.VirtualProtected(range_addr, range_size, PAGE_EXECUTE_READWRITE):
+            for addr, code in range_patches:
+                ctypes.memmove(addr, code, len(code))
+
+
+def enable_inline_hooks(hooks):
+    """Enable a batch of :class:`InlineHook`"""
+    hooks = [hook for hook in hooks if not hook.is_enable]
+    write_code_patches([(hook.addr, hook.hook_code) for hook in hooks])
+    for hook in hooks:
+        hook.is_enable = True
+
+
+def disable_inline_hooks(hooks):
+    """Disable a batch of :class:`InlineHook`"""
+    hooks = [hook for hook in hooks if hook.is_enable]
+    write_code_patches([(hook.addr, hook.original_code) for hook in hooks])
+    for hook in hooks:
+        hook.is_enable = False
@@ -16,25 +16,41 @@ from windows.dbgprint import dbgprint
 class InjectionFailedError(WindowsError):
     pass
 
+# The manual LoadLibrary shellcodes do not depend on the target: assembled once
+# Parameter: a pointer on [KERNEL32_NAME, LOADLIBRARYA_NAME, DLL_NAME]
+RemoteManualLoadLibray32 = x86.MultipleInstr()
+RemoteManualLoadLibray32 += x86.Mov("ECX", x86.mem("[ESP + 4]"))
+RemoteManualLoadLibray32 += x86.Push(x86.mem("[ECX + 4]"))
+RemoteManualLoadLibray32 += x86.Push(x86.mem("[ECX]"))
+RemoteManualLoadLibray32 += x86.Call(":FUNC_GETPROCADDRESS32")
+RemoteManualLoadLibray32 += x86.Push(x86.mem("[ECX + 8]"))
+RemoteManualLoadLibray32 += x86.Call("EAX") # LoadLibrary
+RemoteManualLoadLibray32 += x86.Pop("ECX")
+RemoteManualLoadLibray32 += x86.Pop("ECX")
+RemoteManualLoadLibray32 += x86.Ret()
+RemoteManualLoadLibray32 += GetProcAddress32
+
+RemoteManualLoadLibray64 = x64.MultipleInstr()
+RemoteManualLoadLibray64 += x64.Mov("R15", "RCX")
+RemoteManualLoadLibray64 += x64.Mov("RCX", x64.mem("[R15 + 0]"))
+RemoteManualLoadLibray64 += x64.Mov("RDX", x64.mem("[R15 + 8]"))
+RemoteManualLoadLibray64 += x64.Call(":FUNC_GETPROCADDRESS64")
+RemoteManualLoadLibray64 += x64.Mov("RCX", x64.mem("[R15 + 0x10]"))
+RemoteManualLoadLibray64 += x64.Push("RCX")
+RemoteManualLoadLibray64 += x64.Push("RCX")
+RemoteManualLoadLibray64 += x64.Push("RCX")
+RemoteManualLoadLibray64 += x64.Call("RAX") # LoadLibrary
+RemoteManualLoadLibray64 += x64.Pop("RCX")
+RemoteManualLoadLibray64 += x64.Pop("RCX")
+RemoteManualLoadLibray64 += x64.Pop("RCX")
+RemoteManualLoadLibray64 += x64.Ret()
+RemoteManualLoadLibray64 += GetProcAddress64
+
 def perform_manual_getproc_loadlib_32(target, dll_name):
     dll = "KERNEL32.DLL\x00".encode("utf-16-le")
     api = "LoadLibraryA\x00"
     dll_to_load = dll_name + "\x00"
 
-    RemoteManualLoadLibray = x86.MultipleInstr()
-    code = RemoteManualLoadLibray
-    code += x86.Mov("ECX", x86.mem("[ESP + 4]"))
-    code += x86.Push(x86.mem("[ECX + 4]"))
-    code += x86.Push(x86.mem("[ECX]"))
-    code += x86.Call(":FUNC_GETPROCADDRESS32")
-    code += x86.Push(x86.mem("[ECX + 8]"))
-    code += x86.Call("EAX") # LoadLibrary
-    code += x86.Pop("ECX")
-    code += x86.Pop("ECX")
-    code += x86.Ret()
-
-    RemoteManualLoadLibray += GetProcAddress32
-
     with target.allocated_memory(0x1000) as addr:
         addr2 = addr + len(dll)
         addr3 = addr2 + len(api)
@@ -47,7 +63,7 @@ def perform_manual_getproc_loadlib_32(target, dll_name):
         target.write_qword(addr4 + 4, addr2)
         target.write_qword(addr4 + 0x8, addr3)
 
-        t = target.execute(RemoteManualLoadLibray.get_code(), addr4)
+        t = target.execute(RemoteManualLoadLibray32.get_code(), addr4)
         t.wait()
         if not t.exit_code:
             raise InjectionFailedError("Injection of <{0}> failed".format(dll_name))
@@ -58,24 +74,6 @@ def perform_manual_getproc_loadlib_64(target, dll_name):
     api = "LoadLibraryA\x00"
     dll_to_load = dll_name + "\x00"
 
-    RemoteManualLoadLibray = x64.MultipleInstr()
-    code = RemoteManualLoadLibray
-    code += x64.Mov("R15", "RCX")
-    code += x64.Mov("RCX", x64.mem("[R15 + 0]"))
-    code += x64.Mov("RDX", x64.mem("[R15 + 8]"))
-    code += x64.Call(":FUNC_GETPROCADDRESS64")
-    code += x64.Mov("RCX", x64.mem("[R15 + 0x10]"))
-    code += x64.Push("RCX")
-    code += x64.Push("RCX")
-    code += x64.Push("RCX")
-    code += x64.Call("RAX") # LoadLibrary
-    code += x64.Pop("RCX")
-    code += x64.Pop("RCX")
-    code += x64.Pop("RCX")
-    code += x64.Ret()
-
-    RemoteManualLoadLibray += GetProcAddress64
-
     with target.allocated_memory(0x1000) as addr:
         addr2 = addr + len(dll)
         addr3 = addr2 + len(api)
@@ -88,7 +86,7 @@ def perform_manual_getproc_loadlib_64(target, dll_name):
         target.write_qword(addr4 + 8, addr2)
         target.write_qword(addr4 + 0x10, addr3)
 
-        t = target.execute(RemoteManualLoadLibray.get_code(), addr4)
+        t = target.execute(RemoteManualLoadLibray64.get_code(), addr4)
         t.wait()
         if not t.exit_code:
             raise InjectionFailedError("Injection of <{0}> failed".format(dll_name))
@@ -129,6 +127,45 @@ def load_dll_in_remote_process(target, dll_name):
         return perform_manual_getproc_loadlib_32(target, dll_name)
     return perform_manual_getproc_loadlib_64(target, dll_name)
 
+# The python exec shellcodes are assembled once, only the address of the python functions
+# ({placeholder}) are patched for each target
+python_exec_shellcode_32 = """
+    mov eax, {Py_IsInitialized}
+    call eax
+    mov edi, eax
+    cmp eax, 0
+    jnz :DO_ENSURE
+        # Python Initilisation code
+        # init multithread (for other injection)
+        mov eax, {PyEval_InitThreads}
+        call eax
+        mov eax, {Py_Initialize}
+        call eax
+    label :DO_ENSURE
+    mov eax, {PyGILState_Ensure}
+    call eax
+    push eax
+    # Get the string to execute from parameters
+    mov eax, [esp + 0x8]
+    push eax
+    mov eax, {PyRun_SimpleString}
+    call eax
+    mov esi, eax
+    mov eax, {PyGILState_Release}
+    call eax
+    pop eax
+    cmp edi, 0
+    jnz :RETURN
+        # If PyEval_InitThreads was called (init done in this thread)
+        # We must release the GIL
+        mov eax, {PyEval_SaveThread}
+        call eax
+    label :RETURN
+    mov eax, esi
+    pop edi
+    ret
+"""
+
 python_function_32_bits = {}
 
 def generate_python_exec_shellcode_32(target, PyDll):
@@ -152,44 +189,60 @@ def generate_python_exec_shellcode_32(target, PyDll):
     Py_Initialize = Py_exports["Py_Initialize"] + base
     PyRun_SimpleString = Py_exports["PyRun_SimpleString"] + base
 
-    code = x86.MultipleInstr()
-    code += x86.Mov('EAX', Py_IsInitialized)
-    code += x86.Call('EAX')
-    code += x86.Mov("EDI", "EAX")
-    code += x86.Cmp("EAX", 0)
-    code += x86.Jnz(":DO_ENSURE")
-    # Python Initilisation code
-    # init multithread (for other injection)
-    code +=     x86.Mov('EAX', PyEval_InitThreads)
-    code +=     x86.Call('EAX')
-    code +=     x86.Mov('EAX', Py_Initialize)
-    code +=     x86.Call('EAX')
-    code += x86.Label(":DO_ENSURE")
-    code += x86.Mov('EAX', PyGILState_Ensure)
-    code += x86.Call('EAX')
-    code += x86.Push('EAX')
-    # Get the string to execute from parameters
-    code += x86.Mov("EAX", x86.mem("[ESP + 0x8]"))
-    code += x86.Push('EAX')
-    code += x86.Mov('EAX', PyRun_SimpleString)
-    code += x86.Call('EAX')
-    code += x86.Mov("ESI", "EAX")
-    code += x86.Mov('EAX', PyGILState_Release)
-    code += x86.Call('EAX')
-    code += x86.Pop('EAX')
-    code += x86.Cmp("EDI", 0)
-    code += x86.Jnz(":RETURN")
-    # If PyEval_InitThreads was called (init done in this thread)
-    # We must release the GIL
-    code +=     x86.Mov('EAX', PyEval_SaveThread)
-    code +=     x86.Call('EAX')
-    code += x86.Label(":RETURN")
-    code += x86.Mov("EAX", "ESI")
-    code += x86.Pop("EDI")
-    code += x86.Ret()
-    return code.get_code()
+    return x86.assemble(python_exec_shellcode_32, PyEval_InitThreads=PyEval_InitThreads,
+                            Py_IsInitialized=Py_IsInitialized, PyGILState_Release=PyGILState_Release,
+                            PyGILState_Ensure=PyGILState_Ensure, PyEval_SaveThread=PyEval_SaveThread,
+                            Py_Initialize=Py_Initialize, PyRun_SimpleString=PyRun_SimpleString)
 
 
+python_exec_shellcode_64 = """
+    # Do stack alignement
+    push rcx
+    # Reserve space for call
+    push rdi
+    push rdi
+    push rdi
+    push rdi
+    mov rax, {Py_IsInitialized}
+    call rax
+    mov rdi, rax
+    cmp rax, 0
+    jnz :DO_ENSURE
+        # Python Initilisation code
+        # init multithread (for other injection)
+        mov rax, {PyEval_InitThreads}
+        call rax
+        mov rax, {Py_Initialize}
+        call rax
+    label :DO_ENSURE
+    mov rax, {PyGILState_Ensure}
+    call rax
+    mov r15, rax
+    mov rcx, [rsp + 0x20]
+    mov rax, {PyRun_SimpleString}
+    call rax
+    mov rcx, r15
+    mov r15, rax
+    mov rax, {PyGILState_Release}
+    call rax
+    cmp rdi, 0
+    jnz :RETURN
+        # If PyEval_InitThreads was called (init done in this thread)
+        # We must release the GIL
+        mov rax, {PyEval_SaveThread}
+        call rax
+    label :RETURN
+    # Clean space for call
+    pop rdi
+    pop rdi
+    pop rdi
+    pop rdi
+    # Remove stack alignement
+    pop rcx
+    mov rax, r15
+    ret
+"""
+
 python_function_64_bits = {}
 
 def generate_python_exec_shellcode_64(target, PyDll):
@@ -213,45 +266,10 @@ def generate_python_exec_shellcode_64(target, PyDll):
     Py_Initialize = Py_exports["Py_Initialize"] + base
     PyRun_SimpleString = Py_exports["PyRun_SimpleString"] + base
 
-    Reserve_space_for_call = x64.MultipleInstr([x64.Push('RDI')] * 4)
-    Clean_space_for_call = x64.MultipleInstr([x64.Pop('RDI')] * 4)
-    code = x64.MultipleInstr()
-    # Do stack alignement
-    code += x64.Push('RCX')
-    code += Reserve_space_for_call
-    code += x64.Mov('RAX', Py_IsInitialized)
-    code += x64.Call('RAX')
-    code += x64.Mov("RDI", "RAX")
-    code += x64.Cmp("RAX", 0)
-    code += x64.Jnz(":DO_ENSURE")
-    code +=     x64.Mov('RAX', PyEval_InitThreads)
-    code +=     x64.Call('RAX')
-    code +=     x64.Mov('RAX', Py_Initialize)
-    code +=     x64.Call('RAX')
-    code += x64.Label(":DO_ENSURE")
-    code += x64.Mov('RAX', PyGILState_Ensure)
-    code += x64.Call('RAX')
-    code += x64.Mov('R15', 'RAX')
-    code += x64.Mov("RCX", x64.mem("[RSP + 0x20]"))
-    code += x64.Mov('RAX', PyRun_SimpleString)
-    code += x64.Call('RAX')
-    code += x64.Mov('RCX', 'R15')
-    code += x64.Mov('R15', 'RAX')
-    code += x64.Mov('RAX', PyGILState_Release)
-    code += x64.Call('RAX')
-    code += x64.Cmp("RDI", 0)
-    code += x64.Jnz(":RETURN")
-    # If PyEval_InitThreads was called (init done in this thread)
-    # We must release the GIL
-    code +=     x64.Mov('RAX', PyEval_SaveThread)
-    code +=     x64.Call('RAX')
-    code += x64.Label(":RETURN")
-    code += Clean_space_for_call
-    # Remove stack alignement
-    code += x64.Pop('RCX')
-    code += x64.Mov("RAX", "R15")
-    code += x64.Ret()
-    return code.get_code()
+    return x64.assemble(python_exec_shellcode_64, PyEval_InitThreads=PyEval_InitThreads,
+                            Py_IsInitialized=Py_IsInitialized, PyGILState_Release=PyGILState_Release,
+                            PyGILState_Ensure=PyGILState_Ensure, PyEval_SaveThread=PyEval_SaveThread,
+                            Py_Initialize=Py_Initialize, PyRun_SimpleString=PyRun_SimpleString)
 
 
 def inject_python_command(target, code_injected, PYDLL):
@@ -0,0 +1,193 @@
+"""Benchmark of the instruction encoders of simple_x86 / simple_x64
+
+Usage: python bench_encoding.py [NB_ROUND]
+
+Print the number of instructions encoded per second for each encoding engine
+and for the test_simple_x86.py / test_simple_x64.py corpora with and without the dispatch cache
+the time to assemble a MultipleInstr with hundreds of labels
+the speed of the text assembler with and without its cache
+and the speed of the length disassembler on the assembled corpora
+"""
+import os
+import re
+import sys
+import time
+
+import simple_x86 as x86
+import simple_x64 as x64
+import simple_disasm
+
+
+x86_corpus = [
+    (x86.Mov, ('EAX', 'ESP')),
+    (x86.Mov, ('ECX', x86.mem('[EAX]'))),
+    (x86.Mov, ('EDX', x86.mem('[ESP + EBP * 2 + 0x223344]'))),
+    (x86.Mov, ('EAX', x86.mem('fs:[0x30]'))),
+    (x86.Mov, ('EAX', 0x11223344)),
+    (x86.Mov, ('AX', 'AX')),
+    (x86.Add, ('EAX', 8)),
+    (x86.Add, (x86.mem('[EAX]'), 10)),
+    (x86.Push, ('ECX',)),
+    (x86.Push, (x86.mem('[ECX + 8]'),)),
+    (x86.Pop, ('EDI',)),
+    (x86.Lea, ('ECX', x86.mem('[EDI + -0xff]'))),
+    (x86.Call, ('EAX',)),
+    (x86.Cmp, ('EAX', -1)),
+    (x86.Xor, ('EAX', 'EAX')),
+    (x86.Test, (x86.mem('[ECX + 0x100]'), 'ECX')),
+    (x86.Shl, ('EDX', 0x12)),
+    (x86.Jmp, (0x100,)),
+    (x86.Jz, (0x10,)),
+    (x86.Ret, ()),
+]
+
+
+x64_corpus = [
+    (x64.Mov, ('RAX', 'RSP')),
+    (x64.Mov, ('RAX', x64.mem('gs:[0x60]'))),
+    (x64.Mov, ('RCX', 0x1122334455667788)),
+    (x64.Mov, ('RAX', x64.mem('[R12 + R15]'))),
+    (x64.Mov, ('ECX', x64.mem('[RBX + RCX + 0x10]'))),
+    (x64.Mov, (x64.mem('[RAX]'), 0x11223344)),
+    (x64.Add, ('RAX', x64.mem('[R9 + R8 * 2 + 0x7fffffff]'))),
+    (x64.Add, ('RAX', -1)),
+    (x64.Sub, ('RCX', 'RSP')),
+    (x64.Push, ('R15',)),
+    (x64.Push, (0x42,)),
+    (x64.Pop, ('RAX',)),
+    (x64.Lea, ('RAX', x64.mem('[RAX + 1]'))),
+    (x64.Call, ('RAX',)),
+    (x64.Cmp, ('RAX', -1)),
+    (x64.Xor, ('R15', x64.mem('[RAX + R8 * 2 + 0x11223344]'))),
+    (x64.Test, ('RCX', 'RCX')),
+    (x64.Shr, ('R15', 0x12)),
+    (x64.Jmp, (0x100,)),
+    (x64.Ret, ()),
+]
+
+
+def load_test_corpus(module, filename):
+    """Extract the ``TestInstr(X)(ARGS)`` of a test script that can be encoded"""
+    corpus = []
+    filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    for line in open(filename):
+        match = re.match(r"^TestInstr\((\w+)[^)]*\)\((.*)\)\s*$", line.strip())
+        if not match:
+            continue
+        instr = getattr(module, match.group(1))
+        args = eval("({0},)".format(match.group(2)) if match.group(2).strip() else "()", vars(module))
+        try:
+            instr(*args)
+        except ValueError:
+            continue  # must_fail tests
+        corpus.append((instr, args))
+    return corpus
+
+
+def bench(module, corpus, use_int_encoder, nb_round, use_dispatch_cache=True):
+    module.USE_INT_ENCODER = use_int_encoder
+    module.USE_DISPATCH_CACHE = use_dispatch_cache
+    try:
+        start = time.time()
+        for i in range(nb_round):
+            for instr, args in corpus:
+                instr(*args).get_code()
+        duration = time.time() - start
+    finally:
+        module.USE_INT_ENCODER = False
+        module.USE_DISPATCH_CACHE = True
+    return (nb_round * len(corpus)) / duration
+
+
+def check(module, corpus):
+    module.CROSS_CHECK_ENCODER = True
+    try:
+        for instr, args in corpus:
+            instr(*args)
+    finally:
+        module.CROSS_CHECK_ENCODER = False
+
+
+def build_labeled_code(module, nb_label):
+    """Code with ``nb_label`` labels, each one targeted by a forward jump, a backward jump and a call"""
+    code = module.MultipleInstr()
+    for i in range(nb_label):
+        code += module.Label(":LABEL_{0}".format(i))
+        code += module.Jz(":LABEL_{0}".format((i + 7) % nb_label))
+        code += module.Nop() * (i % 5)
+        code += module.Jmp(":LABEL_{0}".format(i // 2))
+        code += module.Call(":LABEL_{0}".format((i * 13) % nb_label))
+        code += module.Ret()
+    return code
+
+
+def bench_labels(module, nb_label):
+    code = build_labeled_code(module, nb_label)
+    start = time.time()
+    code.relax()
+    relax_duration = time.time() - start
+    result = code.get_code()
+    total_duration = time.time() - start
+    return len(result), relax_duration, total_duration
+
+
+x86_asm_stub = """mov eax, {func}; push [esp + 8]; push [esp + 8]; call eax
+    test eax, eax; jz :FAIL; ret; label :FAIL; mov eax, fs:[0x30]; ret"""
+
+x64_asm_stub = """mov rax, {func}; mov rcx, [rsp + 8]; sub rsp, 0x28; call rax; add rsp, 0x28
+    test rax, rax; jz :FAIL; ret; label :FAIL; mov rax, gs:[0x60]; ret"""
+
+
+def bench_assemble(module, source, nb_round, use_cache):
+    start = time.time()
+    for i in range(nb_round):
+        if not use_cache:
+            module.assemble_cache.clear()
+        module.assemble(source, func=0x42424242 + i)
+    return nb_round / (time.time() - start)
+
+
+def bench_length_scan(code, bitness):
+    start = time.time()
+    nb_instr = sum(1 for x in simple_disasm.iter_instructions(code, bitness=bitness))
+    return nb_instr, time.time() - start
+
+
+def main(nb_round=500):
+    for name, module, corpus in [("x86", x86, x86_corpus), ("x64", x64, x64_corpus)]:
+        check(module, corpus)
+        bitarray_speed = bench(module, corpus, False, nb_round)
+        int_speed = bench(module, corpus, True, nb_round)
+        print("{0}: BitArray    {1:>10.0f} instr/s".format(name, bitarray_speed))
+        print("{0}: IntBitArray {1:>10.0f} instr/s (x{2:.2f})".format(name, int_speed, int_speed / bitarray_speed))
+
+    for name, module, filename in [("x86", x86, "test_simple_x86.py"), ("x64", x64, "test_simple_x64.py")]:
+        corpus = load_test_corpus(module, filename)
+        for use_int_encoder in (False, True):
+            engine = "IntBitArray" if use_int_encoder else "BitArray"
+            no_cache_speed = bench(module, corpus, use_int_encoder, nb_round // 5 or 1, use_dispatch_cache=False)
+            cache_speed = bench(module, corpus, use_int_encoder, nb_round // 5 or 1)
+            print("{0} {1} ({2} instrs) {3}: no dispatch cache {4:>8.0f} instr/s | dispatch cache {5:>8.0f} instr/s (x{6:.2f})".format(
+                    name, filename, len(corpus), engine, no_cache_speed, cache_speed, cache_speed / no_cache_speed))
+
+    for name, module, source in [("x86", x86, x86_asm_stub), ("x64", x64, x64_asm_stub)]:
+        no_cache_speed = bench_assemble(module, source, nb_round, False)
+        cache_speed = bench_assemble(module, source, nb_round, True)
+        print("{0}: assemble stub: no cache {1:>8.0f} stub/s | cache {2:>8.0f} stub/s (x{3:.2f})".format(
+                name, no_cache_speed, cache_speed, cache_speed / no_cache_speed))
+
+    for name, module in [("x86", x86), ("x64", x64)]:
+        for nb_label in (100, 500):
+            size, relax_duration, total_duration = bench_labels(module, nb_label)
+            print("{0}: {1} labels ({2} bytes): relax {3:.1f}ms | relax + get_code {4:.1f}ms".format(
+                    name, nb_label, size, relax_duration * 1000, total_duration * 1000))
+
+    for name, module, bitness, filename in [("x86", x86, 32, "test_simple_x86.py"), ("x64", x64, 64, "test_simple_x64.py")]:
+        code = "".join(instr(*args).get_code() for instr, args in load_test_corpus(module, filename)) * (nb_round // 5 or 1)
+        nb_instr, duration = bench_length_scan(code, bitness)
+        print("{0}: length scan of {1} bytes: {2} instrs in {3:.3f}s ({4:>8.0f} instr/s)".format(
+                name, len(code), nb_instr, duration, nb_instr / duration))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
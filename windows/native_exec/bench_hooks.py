@@ -0,0 +1,119 @@
+"""Benchmark of the IAT hooks with and without a native filter
+
+Usage: python bench_hooks.py [NB_CALLS]
+
+A native loop calls a native function through an IAT entry hooked with :class:`windows.hooks.IATHook`.
+Print the number of calls per second without hook, with a Python hook
+and with a :class:`windows.hooks.NativeFilter` that lets 1% (or none) of the calls reach the Python hook.
+"""
+import sys
+import time
+import ctypes
+
+import windows
+import windows.hooks
+import windows.pe_parse as pe_parse
+import windows.native_exec.simple_x86 as x86
+import windows.native_exec.simple_x64 as x64
+from windows.native_exec import native_function
+from windows.generated_def.winstructs import DWORD
+
+
+def generate_target():
+    """DWORD WINAPI target(DWORD x) {return x;}"""
+    if windows.current_process.bitness == 32:
+        code = x86.MultipleInstr()
+        code += x86.Pop("ECX")
+        code += x86.Pop("EAX")
+        code += x86.Jmp("ECX")
+    else:
+        code = x64.MultipleInstr()
+        code += x64.Mov("RAX", "RCX")
+        code += x64.Ret()
+    return native_function.allocator.write_code(code.get_code())
+
+
+def generate_caller(entry_addr):
+    """void caller(DWORD nb_calls) {for (i = 0; i < nb_calls; i++) (*entry)(i);}"""
+    if windows.current_process.bitness == 32:
+        code = x86.MultipleInstr()
+        code += x86.Push("ESI")
+        code += x86.Push("EDI")
+        code += x86.Mov("ESI", x86.mem("[ESP + 0xc]"))
+        code += x86.Xor("EDI", "EDI")
+        code += x86.Label(":LOOP")
+        code += x86.Push("EDI")
+        code += x86.Call(x86.mem("[{0}]".format(entry_addr)))
+        code += x86.Inc("EDI")
+        code += x86.Cmp("EDI", "ESI")
+        code += x86.Jnz(":LOOP")
+        code += x86.Pop("EDI")
+        code += x86.Pop("ESI")
+        code += x86.Ret()
+    else:
+        code = x64.MultipleInstr()
+        code += x64.Push("RSI")
+        code += x64.Push("RDI")
+        code += x64.Sub("RSP", 0x28)
+        code += x64.Mov("ESI", "ECX")
+        code += x64.Xor("RDI", "RDI")
+        code += x64.Label(":LOOP")
+        code += x64.Mov("RCX", "RDI")
+        code += x64.Mov("RAX", entry_addr)
+        code += x64.Call(x64.mem("[RAX]"))
+        code += x64.Inc("RDI")
+        code += x64.Cmp("RDI", "RSI")
+        code += x64.Jnz(":LOOP")
+        code += x64.Add("RSP", 0x28)
+        code += x64.Pop("RDI")
+        code += x64.Pop("RSI")
+        code += x64.Ret()
+    return windows.native_exec.create_function(code.get_code(), [None, DWORD])
+
+
+def create_entry():
+    """An IAT entry that points to the target function"""
+    entry_addr = native_function.allocator.reserve_int()
+    ctypes.c_size_t.from_address(entry_addr).value = generate_target()
+    transformers = pe_parse.CtypesStructureTransformers(*pe_parse.get_structure_transformer_for_target(None))
+    return pe_parse.IATEntry.create(entry_addr, -1, "target", None, transformers)
+
+
+def bench(caller, nb_calls):
+    start = time.time()
+    caller(nb_calls)
+    return nb_calls / (time.time() - start)
+
+
+def main(nb_calls=1000000):
+    entry = create_entry()
+    caller = generate_caller(entry.addr)
+    python_calls = []
+
+    @windows.hooks.Callback(DWORD, DWORD)
+    def python_hook(x, real_function):
+        python_calls.append(x)
+        return real_function()
+
+    print("No hook: {0:>12.0f} calls/s".format(bench(caller, nb_calls)))
+
+    # The Python hook is slow: only do a part of the calls
+    entry.set_hook(python_hook)
+    python_speed = bench(caller, nb_calls // 100)
+    entry.remove_hook()
+    print("Python hook: {0:>12.0f} calls/s".format(python_speed))
+
+    for name, native_filter, nb_matched in [("1% of calls", windows.hooks.NativeFilter((0, "<", nb_calls // 100)), nb_calls // 100),
+                                            ("no call", windows.hooks.NativeFilter((0, "==", 0xffffffff)), 0)]:
+        del python_calls[:]
+        entry.set_hook(python_hook, native_filter=native_filter)
+        speed = bench(caller, nb_calls)
+        entry.remove_hook()
+        if (native_filter.nb_calls, native_filter.nb_matched, len(python_calls)) != (nb_calls, nb_matched, nb_matched):
+            raise AssertionError("Bad native filter counters: {0} calls / {1} matched / {2} Python calls".format(
+                native_filter.nb_calls, native_filter.nb_matched, len(python_calls)))
+        print("Native filter matching {0}: {1:>12.0f} calls/s (x{2:.1f})".format(name, speed, speed / python_speed))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,47 @@
+"""Benchmark of the generation of syswow64 call stubs
+
+Usage: python bench_stubs.py [NB_STUB]
+
+Print the time to generate NB_STUB stubs with :func:`windows.syswow64.generate_syswow64_call_code`
+by patching the assembled templates and by assembling each stub (templates caches cleared)
+"""
+import sys
+import time
+
+import windows.syswow64 as syswow64
+import windows.native_exec.simple_x64 as x64
+
+
+def generate_stubs(nb_stub, use_templates):
+    stubs = []
+    for i in range(nb_stub):
+        if not use_templates:
+            syswow64.syswow64_call_templates.clear()
+            x64.assemble_cache.clear()
+        nb_args = i % 12
+        target_addr = 0x7ffe00000000 + i * 0x10
+        argument_buffer = 0x10000000 + i * 0x100
+        stubs.append(syswow64.generate_syswow64_call_code(nb_args, target_addr, argument_buffer, argument_buffer + 0x80))
+    return stubs
+
+
+def bench(nb_stub, use_templates):
+    start = time.time()
+    stubs = generate_stubs(nb_stub, use_templates)
+    return stubs, time.time() - start
+
+
+def main(nb_stub=10000):
+    templates_stubs, templates_duration = bench(nb_stub, True)
+    # Full assembly is slow: only assemble a part of the stubs
+    nb_assembled = max(nb_stub // 20, 1)
+    assembled_stubs, assembled_duration = bench(nb_assembled, False)
+    if assembled_stubs != templates_stubs[:nb_assembled]:
+        raise AssertionError("Patched templates differ from assembled stubs")
+    print("{0} stubs with templates: {1:.3f}s ({2:.1f}us/stub)".format(nb_stub, templates_duration, templates_duration * 1000000 / nb_stub))
+    print("{0} stubs assembled: {1:.3f}s ({2:.1f}us/stub)".format(nb_assembled, assembled_duration, assembled_duration * 1000000 / nb_assembled))
+    print("Speedup: x{0:.1f}".format((assembled_duration / nb_assembled) / (templates_duration / nb_stub)))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -3,12 +3,6 @@ import mmap
 import platform
 import sys
 
-import windows
-import windows.winproxy
-
-from . import simple_x86 as x86
-from . import simple_x64 as x64
-
 
 class PyObj(ctypes.Structure):
     _fields_ = [("ob_refcnt", ctypes.c_size_t),
@@ -43,6 +37,8 @@ class MyMap(mmap.mmap):
 class Win32MyMap(MyMap):
     @classmethod
     def get_map(cls, size):
+        # Imported here: UnixMyMap does not need the windows package
+        import windows.winproxy
         addr = windows.winproxy.VirtualAlloc(0, size, 0x1000, 0x40)
         new_map = (ctypes.c_char * size).from_address(addr)
         new_map.addr = addr
@@ -0,0 +1,455 @@
+"""Table driven x86/x64 length disassembler and a minimal decoder to :mod:`simple_x86` / :mod:`simple_x64` instructions
+
+The length decoder handles the legacy/REX/VEX/EVEX encodings of the general purpose, x87, SSE and AVX opcodes.
+The decoder only knows the instructions that :mod:`simple_x86` / :mod:`simple_x64` can assemble.
+"""
+import binascii
+import collections
+import itertools
+
+import simple_x86 as x86
+import simple_x64 as x64
+
+
+class DecodeError(ValueError):
+    pass
+
+
+# Opcode flags
+MODRM = 0x1
+IMM8 = 0x2
+IMM16 = 0x4
+IMMZ = 0x8  # 16 or 32 bits immediat (operand size)
+IMMV = 0x10  # 16, 32 or 64 bits immediat (operand size with REX.W)
+MOFFS = 0x20  # Address sized offset
+REL = 0x40  # The immediat is a relative branch
+GROUP3 = 0x80  # The immediat is only present if modrm.reg is 0 or 1 (TEST)
+PREFIX = 0x100
+INVALID = 0x200
+INVALID64 = 0x400
+ESCAPE = 0x800
+# Flags of the decoded instruction
+RIP_RELATIVE = 0x1000
+VEX = 0x2000
+
+MAX_INSTRUCTION_LENGTH = 15
+
+
+def _opcode_table(default, spec):
+    table = [default] * 256
+    for flags, opcodes in spec:
+        for opcode in opcodes:
+            table[opcode] = flags
+    return table
+
+
+# One byte opcodes
+one_byte_opcodes = _opcode_table(0, [
+    # ADD / OR / ADC / SBB / AND / SUB / XOR / CMP
+    (MODRM, [base + i for base in range(0, 0x40, 8) for i in range(4)]),
+    (IMM8, range(0x04, 0x40, 8)),
+    (IMMZ, range(0x05, 0x40, 8)),
+    (INVALID64, [0x06, 0x07, 0x0e, 0x16, 0x17, 0x1e, 0x1f, 0x27, 0x2f, 0x37, 0x3f]),
+    (ESCAPE, [0x0f]),
+    (PREFIX, [0x26, 0x2e, 0x36, 0x3e, 0x64, 0x65, 0x66, 0x67, 0xf0, 0xf2, 0xf3]),
+    (INVALID64, [0x60, 0x61]),
+    (MODRM | INVALID64, [0x62, 0xc4, 0xc5]),  # BOUND / LES / LDS: EVEX / VEX prefixes in 64 bits
+    (MODRM, [0x63] + list(range(0x84, 0x90)) + [0xd0, 0xd1, 0xd2, 0xd3] + list(range(0xd8, 0xe0)) + [0xfe, 0xff]),
+    (IMMZ, [0x68, 0xa9]),
+    (MODRM | IMMZ, [0x69, 0x81, 0xc7]),
+    (IMM8, [0x6a, 0xa8, 0xcd, 0xe4, 0xe5, 0xe6, 0xe7] + list(range(0xb0, 0xb8))),
+    (MODRM | IMM8, [0x6b, 0x80, 0x83, 0xc0, 0xc1, 0xc6]),
+    (MODRM | IMM8 | INVALID64, [0x82]),
+    (IMM8 | REL, list(range(0x70, 0x80)) + [0xe0, 0xe1, 0xe2, 0xe3, 0xeb]),
+    (IMMZ | IMM16 | INVALID64, [0x9a, 0xea]),  # Far call / jmp
+    (MOFFS, [0xa0, 0xa1, 0xa2, 0xa3]),
+    (IMMV, range(0xb8, 0xc0)),
+    (IMM16, [0xc2, 0xca]),
+    (IMM16 | IMM8, [0xc8]),
+    (INVALID64, [0xce]),
+    (IMM8 | INVALID64, [0xd4, 0xd5]),
+    (INVALID, [0xd6]),
+    (IMMZ | REL, [0xe8, 0xe9]),
+    (MODRM | IMM8 | GROUP3, [0xf6]),
+    (MODRM | IMMZ | GROUP3, [0xf7]),
+])
+
+# Two bytes opcodes (0F XX)
+two_bytes_opcodes = _opcode_table(INVALID, [
+    (MODRM, [0x00, 0x01, 0x02, 0x03, 0x0d] + list(range(0x10, 0x24)) + list(range(0x28, 0x30)) +
+            list(range(0x40, 0x70)) + [0x74, 0x75, 0x76, 0x78, 0x79, 0x7c, 0x7d, 0x7e, 0x7f] + list(range(0x90, 0xa0)) +
+            [0xa3, 0xa5, 0xab, 0xad, 0xae, 0xaf] + list(range(0xb0, 0xba)) + list(range(0xbb, 0xc2)) +
+            [0xc3, 0xc7] + list(range(0xd0, 0x100))),
+    (0, [0x05, 0x06, 0x07, 0x08, 0x09, 0x0b, 0x0e, 0x77, 0xa0, 0xa1, 0xa2, 0xa8, 0xa9, 0xaa] +
+        list(range(0x30, 0x38)) + list(range(0xc8, 0xd0))),
+    (MODRM | IMM8, [0x0f, 0x70, 0x71, 0x72, 0x73, 0xa4, 0xac, 0xba, 0xc2, 0xc4, 0xc5, 0xc6]),
+    (MODRM, [0x38]),  # Three bytes opcodes 0F 38 XX
+    (MODRM | IMM8, [0x3a]),  # Three bytes opcodes 0F 3A XX
+    (IMMZ | REL, range(0x80, 0x90)),
+])
+
+# Opcode maps of VEX / EVEX instructions (all of them have a ModRM but VZEROUPPER/VZEROALL)
+vex_opcode_maps = {
+    1: [(flags & IMM8) | MODRM for flags in two_bytes_opcodes],
+    2: [MODRM] * 256,
+    3: [MODRM | IMM8] * 256,
+}
+vex_opcode_maps[1][0x77] = 0
+
+
+instr_layout = collections.namedtuple("instr_layout", ["length", "prefixes", "rex", "opcode", "modrm", "sib",
+                                                       "disp_offset", "disp_size", "imm_offset", "imm_size", "flags"])
+"""The layout of a decoded instruction, offsets are relative to the begin of the instruction"""
+
+
+def decode_layout(code, offset=0, bitness=32):
+    """Decode the layout (prefixes, opcode, modrm, displacement and immediat) of the instruction at ``offset``
+
+    :rtype: :class:`instr_layout`
+    """
+    # The offset of the instruction in the code of the caller, for the errors
+    instr_offset = offset
+    if not isinstance(code, bytearray):
+        code = bytearray(code[offset: offset + MAX_INSTRUCTION_LENGTH])
+        offset = 0
+    is_64 = bitness == 64
+    end = len(code)
+    pos = offset
+    rex = 0
+    opsize16 = addrsize_override = False
+    try:
+        # Prefixes
+        while True:
+            byte = code[pos]
+            if is_64 and 0x40 <= byte <= 0x4f:
+                rex = byte
+            elif one_byte_opcodes[byte] & PREFIX:
+                rex = 0  # A REX must be the last prefix
+                if byte == 0x66:
+                    opsize16 = True
+                elif byte == 0x67:
+                    addrsize_override = True
+            else:
+                break
+            pos += 1
+        prefixes_end = pos
+        pos += 1
+        if byte == 0x0f:
+            byte = code[pos]
+            pos += 1
+            if byte == 0x38 or byte == 0x3a:
+                opcode = (0x0f, byte, code[pos])
+                flags = MODRM if byte == 0x38 else MODRM | IMM8
+                pos += 1
+            else:
+                opcode = (0x0f, byte)
+                flags = two_bytes_opcodes[byte]
+        elif (byte == 0xc4 or byte == 0xc5 or byte == 0x62) and (is_64 or code[pos] >= 0xc0):
+            # VEX / EVEX: the opcode map is in the prefix
+            if byte == 0xc5:
+                opcode_map = 1
+                pos += 1
+            elif byte == 0xc4:
+                opcode_map = code[pos] & 0x1f
+                rex = 0x40 | ((~code[pos] >> 5) & 0x7) | ((code[pos + 1] >> 4) & 0x8)
+                pos += 2
+            else:
+                opcode_map = code[pos] & 0x3
+                rex = 0x40 | ((~code[pos] >> 5) & 0x7) | ((code[pos + 1] >> 4) & 0x8)
+                pos += 3
+            if opcode_map not in vex_opcode_maps:
+                raise DecodeError("Invalid VEX opcode map {0} at offset {1:#x}".format(opcode_map, instr_offset))
+            opcode = (byte, code[pos])
+            flags = vex_opcode_maps[opcode_map][code[pos]] | VEX
+            pos += 1
+        else:
+            opcode = (byte,)
+            flags = one_byte_opcodes[byte]
+        if flags & INVALID or (is_64 and flags & INVALID64):
+            raise DecodeError("Invalid opcode {0} at offset {1:#x}".format(binascii.hexlify(bytearray(opcode)), instr_offset))
+
+        # ModRM / SIB / displacement
+        modrm = sib = None
+        disp_size = 0
+        if flags & MODRM:
+            modrm = code[pos]
+            pos += 1
+            mod = modrm >> 6
+            rm = modrm & 7
+            if mod == 3:
+                pass
+            elif addrsize_override and not is_64:
+                # 16 bits addressing
+                if mod == 1:
+                    disp_size = 1
+                elif mod == 2 or rm == 6:
+                    disp_size = 2
+            else:
+                if rm == 4:
+                    sib = code[pos]
+                    pos += 1
+                    if mod == 0 and sib & 7 == 5:
+                        disp_size = 4
+                if mod == 1:
+                    disp_size = 1
+                elif mod == 2:
+                    disp_size = 4
+                elif rm == 5:
+                    disp_size = 4
+                    if is_64:
+                        flags |= RIP_RELATIVE
+            if flags & GROUP3 and (modrm >> 3) & 7 > 1:
+                flags &= ~(IMM8 | IMMZ)
+        disp_offset = pos - offset
+        pos += disp_size
+
+        # Immediats
+        imm_size = 0
+        if flags & (IMMZ | IMMV):
+            if rex & 8 and flags & IMMV:
+                imm_size = 8
+            elif opsize16 and not (rex & 8) and not (is_64 and flags & REL):
+                imm_size = 2
+            else:
+                imm_size = 4
+        if flags & IMM16:
+            imm_size += 2
+        if flags & IMM8:
+            imm_size += 1
+        if flags & MOFFS:
+            imm_size = (4 if addrsize_override else 8) if is_64 else (2 if addrsize_override else 4)
+        imm_offset = pos - offset
+        pos += imm_size
+    except IndexError:
+        raise DecodeError("Truncated instruction at offset {0:#x}".format(instr_offset))
+    if pos > end:
+        raise DecodeError("Truncated instruction at offset {0:#x}".format(instr_offset))
+    length = pos - offset
+    if length > MAX_INSTRUCTION_LENGTH:
+        raise DecodeError("Instruction too long at offset {0:#x}".format(instr_offset))
+    return instr_layout(length, code[offset: prefixes_end], rex, opcode, modrm, sib,
+                        disp_offset, disp_size, imm_offset, imm_size, flags)
+
+
+def instruction_length(code, offset=0, bitness=32):
+    """Return the length of the instruction at ``offset`` in ``code``"""
+    return decode_layout(code, offset, bitness).length
+
+
+def iter_instructions(code, offset=0, size=None, bitness=32):
+    """Yield the ``(offset, layout)`` of the instructions in ``code[offset: offset + size]``
+
+    Stop with a :class:`DecodeError` on an invalid instruction.
+    """
+    code = bytearray(code)
+    end = len(code) if size is None else min(len(code), offset + size)
+    while offset < end:
+        layout = decode_layout(code, offset, bitness)
+        yield offset, layout
+        offset += layout.length
+
+
+# Minimal decoder to simple_x86 / simple_x64 instructions
+
+class Decoder(object):
+    """Decode the instructions that an assembler module (:mod:`simple_x86` or :mod:`simple_x64`) can encode
+
+    An instruction is decoded by re-encoding the candidate instructions types of its opcode
+    with the candidate operands of its layout until one gives the same bytes.
+    """
+    wrapping_prefixes = {0xf0: "LockPrefix", 0xf2: "Repne", 0xf3: "Rep"}
+    segment_prefixes = {0x26: "ES", 0x2e: "CS", 0x36: "SS", 0x3e: "DS", 0x64: "FS", 0x65: "GS"}
+
+    def __init__(self, module, bitness):
+        self.module = module
+        self.bitness = bitness
+        if bitness == 64:
+            self.address_registers = module.x64_regs
+            self.registers = [[module.registers_64_to_32_bits[r] for r in module.x64_regs], module.x64_regs]
+            self.registers_64 = [module.x64_regs]
+            self.registers_16 = self.registers
+            self.opcode_prefixes = [0x66] + list(range(0x40, 0x50))
+        else:
+            self.address_registers = module.x86_regs
+            self.registers = [module.x86_regs]
+            self.registers_64 = self.registers
+            self.registers_16 = [module.x86_16bits_regs]
+            self.opcode_prefixes = [0x66]
+        self.opcode_index, self.generic_types = self.build_opcode_index()
+
+    def build_opcode_index(self):
+        """Map the opcode of the encodings of each instruction to the instruction types"""
+        index = {}
+        generic_types = []
+        for name, instr_type in sorted(vars(self.module).items()):
+            if not (isinstance(instr_type, type) and issubclass(instr_type, self.module.Instruction)):
+                continue
+            for type_encoding in instr_type.encoding:
+                bits = []
+                for element in type_encoding:
+                    if not isinstance(element, self.module.RawBits):
+                        break
+                    bits.extend(element.array)
+                keys = self.opcode_keys(bits)
+                if isinstance(element, self.module.ModRM) and element.has_direction_bit:
+                    # The ModRM sets the direction bit of the opcode
+                    keys += [key[:-1] + (key[-1] ^ 2,) for key in keys]
+                if not keys:
+                    if instr_type not in generic_types:
+                        generic_types.append(instr_type)
+                    continue
+                for key in keys:
+                    if instr_type not in index.setdefault(key, []):
+                        index[key].append(instr_type)
+        return index, generic_types
+
+    def opcode_keys(self, bits):
+        """Return the possible opcodes of an encoding starting with ``bits``"""
+        def byte_at(i):
+            return int("".join(str(b) for b in bits[i * 8: (i + 1) * 8]), 2)
+        # Skip the prefixes that are part of the encoding
+        while len(bits) >= 16 and byte_at(0) in self.opcode_prefixes:
+            bits = bits[8:]
+        nb_bytes = 3 if len(bits) >= 16 and byte_at(0) == 0x0f and byte_at(1) in (0x38, 0x3a) else 2
+        nb_bytes = nb_bytes if len(bits) >= 8 and byte_at(0) == 0x0f else 1
+        known_bits = min(len(bits), nb_bytes * 8)
+        if known_bits <= (nb_bytes - 1) * 8:
+            return []
+        prefix = tuple(byte_at(i) for i in range(nb_bytes - 1))
+        last_bits = bits[(nb_bytes - 1) * 8: known_bits]
+        nb_unknown = 8 - len(last_bits)
+        first = int("".join(str(b) for b in last_bits), 2) << nb_unknown
+        return [prefix + (first + i,) for i in range(1 << nb_unknown)]
+
+    def register_names(self, layout):
+        if layout.rex & 8:
+            return self.registers_64
+        if 0x66 in layout.prefixes:
+            return self.registers_16
+        return self.registers
+
+    def memory_operands(self, layout, code):
+        """Return the possible mem_access of the ModRM of ``layout``"""
+        if layout.flags & RIP_RELATIVE:
+            raise DecodeError("RIP relative addressing is not supported by {0}".format(self.module.__name__))
+        address_registers = self.address_registers
+        if 0x67 in layout.prefixes:
+            if self.bitness != 64:
+                raise DecodeError("16 bits addressing is not supported by {0}".format(self.module.__name__))
+            address_registers = [self.module.registers_64_to_32_bits[r] for r in address_registers]
+        rex = layout.rex
+        mod, rm = layout.modrm >> 6, layout.modrm & 7
+        base = index = scale = None
+        if rm == 4:
+            scale = 1 << (layout.sib >> 6)
+            index_number = ((layout.sib >> 3) & 7) | ((rex & 2) << 2)
+            if index_number != 4:
+                index = address_registers[index_number]
+            if not (mod == 0 and layout.sib & 7 == 5):
+                base = address_registers[(layout.sib & 7) | ((rex & 1) << 3)]
+        elif not (mod == 0 and rm == 5):
+            base = address_registers[rm | ((rex & 1) << 3)]
+        if index is None:
+            scale = None
+        segment = None
+        for prefix in layout.prefixes:
+            segment = self.segment_prefixes.get(prefix, segment)
+        disp_values = [0]
+        if layout.disp_size:
+            disp_values = integer_values(code[layout.disp_offset: layout.disp_offset + layout.disp_size])
+        return [self.module.create_displacement(base=base, index=index, scale=scale, disp=disp, prefix=segment)
+                for disp in disp_values]
+
+    def candidate_arguments(self, layout, code):
+        """Return the possible arguments of the instruction ``code`` of layout ``layout``"""
+        registers = self.register_names(layout)
+        rex = layout.rex
+        imm = code[layout.imm_offset: layout.imm_offset + layout.imm_size]
+        if layout.flags & REL:
+            return [(value + layout.length,) for value in integer_values(imm, signed_only=True)]
+        if layout.modrm is not None:
+            reg_number = ((layout.modrm >> 3) & 7) | ((rex & 4) << 1)
+            reg = [names[reg_number] for names in registers]
+            if layout.modrm >> 6 == 3:
+                rm = [names[(layout.modrm & 7) | ((rex & 1) << 3)] for names in registers]
+                if layout.opcode in [(0x0f, 0x20), (0x0f, 0x22)]:
+                    control_register = "CR{0}".format(reg_number)
+                    return [(x, control_register) for x in rm] + [(control_register, x) for x in rm]
+            else:
+                rm = self.memory_operands(layout, code)
+            if layout.imm_size:
+                imms = integer_values(imm)
+                return list(itertools.product(rm, imms)) + list(itertools.product(reg, rm, imms))
+            return [(x,) for x in rm] + list(itertools.product(rm, reg)) + list(itertools.product(reg, rm))
+        accumulator = [names[0] for names in registers]
+        if layout.flags & MOFFS:
+            segment = None
+            for prefix in layout.prefixes:
+                segment = self.segment_prefixes.get(prefix, segment)
+            mems = [self.module.create_displacement(disp=disp, prefix=segment) for disp in integer_values(imm)]
+            return list(itertools.product(accumulator, mems)) + list(itertools.product(mems, accumulator))
+        opcode_reg = [names[(layout.opcode[-1] & 7) | ((rex & 1) << 3)] for names in registers]
+        if layout.imm_size:
+            imms = integer_values(imm)
+            args = [(x,) for x in imms] + list(itertools.product(accumulator, imms)) + list(itertools.product(opcode_reg, imms))
+            if layout.flags & IMMZ and layout.flags & IMM16:
+                # Far call / jmp: selector + offset
+                args.append((integer_values(imm[-2:])[0], integer_values(imm[:-2])[0]))
+            return args
+        return ([()] + [(x,) for x in opcode_reg] + [(x,) for x in accumulator] +
+                list(zip(accumulator, opcode_reg)) + list(zip(opcode_reg, accumulator)))
+
+    def decode(self, code, offset=0):
+        """Decode the instruction at ``offset`` in ``code`` to an instruction of ``module``"""
+        layout = decode_layout(code, offset, self.bitness)
+        code = bytes(bytearray(code[offset: offset + layout.length]))
+        wrappers = []
+        for prefix in bytearray(layout.prefixes):
+            if prefix not in self.wrapping_prefixes:
+                break
+            wrappers.append(getattr(self.module, self.wrapping_prefixes[prefix]))
+        target = code[len(wrappers):]
+        for instr_type in self.opcode_index.get(layout.opcode, []) + self.generic_types:
+            for args in self.candidate_arguments(layout, bytearray(code)):
+                try:
+                    instr = instr_type(*args)
+                except (ValueError, TypeError, KeyError, IndexError, AttributeError, NotImplementedError):
+                    continue
+                if instr.get_code() != target:
+                    continue
+                for prefix in reversed(wrappers):
+                    instr = prefix + instr
+                return instr
+        raise DecodeError("Cannot decode <{0}> with {1}".format(binascii.hexlify(code), self.module.__name__))
+
+
+def integer_values(data, signed_only=False):
+    """Return the signed value (and unsigned value if different) of the little endian integer ``data``"""
+    value = 0
+    for byte in reversed(bytearray(data)):
+        value = (value << 8) | byte
+    size = len(data) * 8
+    signed = value - (1 << size) if value >> (size - 1) else value
+    if signed_only or signed == value:
+        return [signed]
+    return [signed, value]
+
+
+decoders = {}
+
+
+def get_decoder(bitness):
+    if bitness not in decoders:
+        decoders[bitness] = Decoder(x64 if bitness == 64 else x86, bitness)
+    return decoders[bitness]
+
+
+def decode(code, offset=0, bitness=32):
+    """Decode the instruction at ``offset`` in ``code`` to a :mod:`simple_x86` (or :mod:`simple_x64` if ``bitness`` is 64) instruction"""
+    return get_decoder(bitness).decode(code, offset)
+
+
+def decode_all(code, bitness=32):
+    """Decode all the instructions of ``code``, return a list of instructions"""
+    decoder = get_decoder(bitness)
+    return [decoder.decode(code, offset) for offset, layout in iter_instructions(code, bitness=bitness)]
@@ -1,4 +1,7 @@
+import binascii
+import bisect
 import collections
+import re
 import struct
 
 
@@ -75,18 +78,118 @@ class BitArray(object):
         return type(self)(self.size, self.array)
 
 
+class IntBitArray(object):
+    """Same interface as :class:`BitArray` but the bits are stored in a single integer
+
+       Bit 0 of the array (the first one dumped) is the most significant bit of ``value``
+    """
+    __slots__ = ["size", "value"]
+
+    def __init__(self, size, bits):
+        if len(bits) > size:
+            raise ValueError("size > len(bits)")
+        if isinstance(bits, str):
+            value = int(bits, 2) if bits else 0
+        else:
+            value = 0
+            for bit in bits:
+                x = int(bit)
+                if x not in [0, 1]:
+                    raise ValueError("Not expected bits value {0}".format(x))
+                value = (value << 1) | x
+        self.size = size
+        self.value = value
+
+    @classmethod
+    def _new(cls, size, value):
+        res = object.__new__(cls)
+        res.size = size
+        res.value = value
+        return res
+
+    def dump(self):
+        nb_bytes = self.size // 8
+        if not nb_bytes:
+            return bytearray()
+        value = self.value >> (self.size % 8)
+        return bytearray(binascii.unhexlify("{0:0{1}x}".format(value, nb_bytes * 2)))
+
+    def _bit_index(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("IntBitArray index out of range")
+        return self.size - 1 - index
+
+    def __getitem__(self, slice):
+        if isinstance(slice, (int, long)):
+            return (self.value >> self._bit_index(slice)) & 1
+        return self.to_list()[slice]
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, (int, long)):
+            raise TypeError("IntBitArray only support single bit assignment")
+        bit = 1 << self._bit_index(index)
+        if value:
+            self.value |= bit
+        else:
+            self.value &= ~bit
+        return True
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+    def __add__(self, other):
+        if not isinstance(other, IntBitArray):
+            return NotImplemented
+        return IntBitArray._new(self.size + other.size, (self.value << other.size) | other.value)
+
+    def __or__(self, other):
+        if not isinstance(other, IntBitArray):
+            return NotImplemented
+        if self.size != other.size:
+            raise ValueError("OR ON DIFF SIZE")
+        return IntBitArray._new(self.size, self.value | other.value)
+
+    def to_list(self):
+        return [(self.value >> i) & 1 for i in reversed(range(self.size))]
+
+    def to_int(self):
+        return self.value
+
+    @classmethod
+    def from_string(cls, str_base):
+        if not str_base:
+            return cls._new(0, 0)
+        return cls._new(len(str_base) * 8, int(binascii.hexlify(str_base), 16))
+
+    @classmethod
+    def from_int(cls, size, x):
+        if x < 0:
+            x = x & ((2 ** size) - 1)
+        if x >> size:
+            raise ValueError("size > len(bits)")
+        return cls._new(size, x)
+
+    def copy(self):
+        return type(self)._new(self.size, self.value)
+
+
 # Prefix
 class Prefix(object):
     PREFIX_VALUE = None
 
     def __init__(self, next=None):
         self.next = next
+        self.code = None
 
     def __add__(self, other):
         return type(self)(other)
 
     def get_code(self):
-        return chr(self.PREFIX_VALUE) + self.next.get_code()
+        if self.code is None:
+            self.code = chr(self.PREFIX_VALUE) + self.next.get_code()
+        return self.code
 
 
 def create_prefix(name, value):
@@ -246,28 +349,34 @@ def mem(data):
 
 class X64RegisterSelector(object):
 
-    reg_opcode = {v: BitArray.from_int(size=3, x=i) for i, v in enumerate(reg_order)}
-    new_reg_opcode = {v: BitArray.from_int(size=3, x=i) for i, v in enumerate(new_reg_order)}
+    reg_number = {v: i for i, v in enumerate(reg_order)}
+    new_reg_number = {v: i for i, v in enumerate(new_reg_order)}
+    reg_opcode = {v: BitArray.from_int(size=3, x=i) for v, i in reg_number.items()}
+    new_reg_opcode = {v: BitArray.from_int(size=3, x=i) for v, i in new_reg_number.items()}
 
     def accept_arg(self, args, instr_state):
         x = args[0]
+        bits = instr_state.bits
         try:
             if getattr(instr_state.type, "default_32_bits", False):
-                return (1, self.reg_opcode[x.upper()], BitArray(8, [0, 1, 0, 0 ,1 , 0, 0, 0]))
-            return (1, self.reg_opcode[x.upper()], BitArray(8, [0, 1, 0, 0 ,0 , 0, 0, 0]))
+                return (1, self.get_reg_bits(x, bits, new_reg=False), bits.from_int(8, 0x48))
+            return (1, self.get_reg_bits(x, bits, new_reg=False), bits.from_int(8, 0x40))
         except (KeyError, AttributeError):
             pass
         try:
-            return (1, self.new_reg_opcode[x.upper()], BitArray(8, [0, 1, 0, 0 ,1 , 0, 0, 1]))
+            return (1, self.get_reg_bits(x, bits, new_reg=True), bits.from_int(8, 0x49))
         except (KeyError, AttributeError):
             return (None, None, None)
 
     @classmethod
-    def get_reg_bits(cls, name):
-        try:
-            return cls.reg_opcode[name.upper()]
-        except KeyError:
-            return cls.new_reg_opcode[name.upper()]
+    def get_reg_bits(cls, name, bits=BitArray, new_reg=None):
+        """Return the 3 bits of register ``name``, ``new_reg`` restrict the lookup to (non-)R8-R15 registers"""
+        name = name.upper()
+        if new_reg is None:
+            new_reg = name not in cls.reg_number
+        if bits is BitArray:
+            return cls.new_reg_opcode[name] if new_reg else cls.reg_opcode[name]
+        return bits.from_int(3, cls.new_reg_number[name] if new_reg else cls.reg_number[name])
 
 
 class FixedRegister(object):
@@ -280,16 +389,28 @@ class FixedRegister(object):
         rex = None
         if isinstance(x, str) and x.upper() == self.reg:
             if self.is_64_bit_register:
-                rex = BitArray.from_int(8, 0x48)
-            return 1, BitArray(0, []), rex
+                rex = instr_state.bits.from_int(8, 0x48)
+            return 1, instr_state.bits(0, []), rex
         return None, None, None
 
 RegisterRax = lambda: FixedRegister('RAX', is_64_bit_register=True)
 
 
 class RawBits(BitArray):
+    """Constant bits of an encoding, the int value and full bytes are computed once at creation"""
+    def __init__(self, size, bits):
+        super(RawBits, self).__init__(size, bits)
+        self.int_value = self.to_int()
+        self.code = bytes(self.dump()) if not size % 8 else None
+
+    def copy(self):
+        """Return a mutable :class:`BitArray` with the same bits"""
+        return BitArray(self.size, self.array)
+
     def accept_arg(self, args, instr_state):
-        return (0, self.copy(), None)
+        if instr_state.bits is BitArray:
+            return (0, self.copy(), None)
+        return (0, instr_state.bits.from_int(self.size, self.int_value), None)
 
 
 class ImmediatOverflow(ValueError):
@@ -353,7 +474,7 @@ class Imm8(object):
             imm8 = accept_as_8immediat(x)
         except ImmediatOverflow:
             return None, None, None
-        return (1, BitArray.from_string(imm8), None)
+        return (1, instr_state.bits.from_string(imm8), None)
 
 
 class Imm16(object):
@@ -366,7 +487,7 @@ class Imm16(object):
             imm16 = accept_as_16immediat(x)
         except ImmediatOverflow:
             return None, None
-        return (1, BitArray.from_string(imm16), None)
+        return (1, instr_state.bits.from_string(imm16), None)
 
 
 class Imm32(object):
@@ -379,7 +500,7 @@ class Imm32(object):
             imm32 = accept_as_32immediat(x)
         except ImmediatOverflow:
             return None, None, None
-        return (1, BitArray.from_string(imm32), None)
+        return (1, instr_state.bits.from_string(imm32), None)
 
 class AnyImm32(object):
     def accept_arg(self, args, instr_state):
@@ -391,7 +512,7 @@ class AnyImm32(object):
             imm32 = accept_as_any_32immediat(x)
         except ImmediatOverflow:
             return None, None, None
-        return (1, BitArray.from_string(imm32), None)
+        return (1, instr_state.bits.from_string(imm32), None)
 
 
 class Imm64(object):
@@ -404,7 +525,7 @@ class Imm64(object):
             imm64 = accept_as_64immediat(x)
         except ImmediatOverflow:
             return None, None, None
-        return (1, BitArray.from_string(imm64), None)
+        return (1, instr_state.bits.from_string(imm64), None)
 
 
 class Mov_RAX_OFF64(object):
@@ -417,7 +538,8 @@ class Mov_RAX_OFF64(object):
         # Migth Raise an ImmediatOverflow bu no other encoding for this so precise error is cool
         if arg2.prefix is not None:
             instr_state.prefixes.append(x64_segment_selectors[arg2.prefix])
-        return (2, BitArray.from_int(8, 0xa1) + BitArray.from_string(accept_as_64immediat(arg2.disp)), BitArray.from_int(8, 0x48))
+        bits = instr_state.bits
+        return (2, bits.from_int(8, 0xa1) + bits.from_string(accept_as_64immediat(arg2.disp)), bits.from_int(8, 0x48))
 
 
 class Mov_OFF64_RAX(object):
@@ -429,7 +551,8 @@ class Mov_OFF64_RAX(object):
             return (None, None, None)
         if arg2.prefix is not None:
             instr_state.prefixes.append(x64_segment_selectors[arg2.prefix])
-        return (2, BitArray.from_int(8, 0xa3) + BitArray.from_string(accept_as_64immediat(arg2.disp)), BitArray.from_int(8, 0x48))
+        bits = instr_state.bits
+        return (2, bits.from_int(8, 0xa3) + bits.from_string(accept_as_64immediat(arg2.disp)), bits.from_int(8, 0x48))
 
 
 class ModRM(object):
@@ -463,12 +586,13 @@ class ModRM(object):
 
 # Sub ModRM encoding
 class SubModRM(object):
-    def __init__(self):
-        self.mod = BitArray(2, "")
-        self.reg = BitArray(3, "")
-        self.rm = BitArray(3, "")
-        self.after = BitArray(0, "")
-        self.rex = BitArray(8, "01000000")
+    def __init__(self, bits=BitArray):
+        self.bits = bits
+        self.mod = self.bits(2, "")
+        self.reg = self.bits(3, "")
+        self.rm = self.bits(3, "")
+        self.after = self.bits(0, "")
+        self.rex = self.bits(8, "01000000")
         self.is_rex_needed = False
         self.direction = 0
         # 32/64 bits data operation
@@ -505,7 +629,7 @@ class SubModRM(object):
             self.rex[4] = 1
             self.setup_as_64bit_operation()
 
-        self.reg = X64RegisterSelector.get_reg_bits(name)
+        self.reg = X64RegisterSelector.get_reg_bits(name, self.bits)
         if X64.is_new_reg(name):
             self.is_rex_needed = True
             self.rex[5] = 1
@@ -519,7 +643,7 @@ class SubModRM(object):
             self.is_rex_needed = True
             self.setup_as_64bit_operation()
 
-        self.rm = X64RegisterSelector.get_reg_bits(name)
+        self.rm = X64RegisterSelector.get_reg_bits(name, self.bits)
         if X64.is_new_reg(name):
             self.is_rex_needed = True
             self.rex[7] = 1
@@ -531,7 +655,7 @@ class SubModRM(object):
         else:
             self.setup_as_64bits_addressing()
 
-        self.rm = X64RegisterSelector.get_reg_bits(name)
+        self.rm = X64RegisterSelector.get_reg_bits(name, self.bits)
         if X64.is_new_reg(name):
             self.is_rex_needed = True
             self.rex[7] = 1
@@ -547,7 +671,7 @@ class SubModRM(object):
         if X64.is_new_reg(baseregister):
             self.is_rex_needed = True
             self.rex[7] = 1
-        return X64RegisterSelector.get_reg_bits(baseregister)
+        return X64RegisterSelector.get_reg_bits(baseregister, self.bits)
 
     def setup_sib_index_rex(self, indexregister):
         if indexregister in registers_32_bits:
@@ -559,7 +683,7 @@ class SubModRM(object):
         if X64.is_new_reg(indexregister):
             self.is_rex_needed = True
             self.rex[6] = 1
-        return X64RegisterSelector.get_reg_bits(indexregister)
+        return X64RegisterSelector.get_reg_bits(indexregister, self.bits)
 
 
 class ModRM_REG__REG(SubModRM):
@@ -569,9 +693,9 @@ class ModRM_REG__REG(SubModRM):
         return X64.is_reg(arg1) and X64.is_reg(arg2)
 
     def __init__(self, arg1, arg2, reversed, instr_state):
-        super(ModRM_REG__REG, self).__init__()
+        super(ModRM_REG__REG, self).__init__(instr_state.bits)
 
-        self.mod = BitArray(2, "11")
+        self.mod = self.bits(2, "11")
         self.is_rex_needed = True
         #self.rex[4] = 1 # Setup by setup_reg_as_register or setup_rm_as_register
         self.setup_reg_as_register(arg2)
@@ -585,7 +709,7 @@ class ModRM_REG64__MEM(SubModRM):
         return X64.is_reg(arg1) and X64.is_mem_acces(arg2)
 
     def __init__(self, arg1, arg2, reversed, instr_state):
-        super(ModRM_REG64__MEM, self).__init__()
+        super(ModRM_REG64__MEM, self).__init__(instr_state.bits)
         if arg2.prefix is not None:
             instr_state.prefixes.append(x64_segment_selectors[arg2.prefix])
         # # ARG1 : REG
@@ -626,19 +750,19 @@ class ModRM_REG64__MEM(SubModRM):
             force_displacement = 0
 
         self.setup_reg_as_register(arg1)
-        self.rm = BitArray(3, "100")
+        self.rm = self.bits(3, "100")
         self.compute_displacement(arg2.disp, force_displacement)
         self.after = self.compute_sib(arg2) + self.after
         if not arg2.base:
-            self.mod = BitArray(2, "00")
+            self.mod = self.bits(2, "00")
         self.direction = not reversed
         if self.is_32bits_addressing == True:
             instr_state.prefixes.append(AddressSizeOverride)
 
     def compute_displacement(self, displacement, force_displacement=0):
         if not displacement and not force_displacement:
-            self.mod = BitArray(2, "00")
-            self.after = BitArray(0, "")
+            self.mod = self.bits(2, "00")
+            self.after = self.bits(0, "")
             return
         # Pack in a byte
         try:
@@ -646,8 +770,8 @@ class ModRM_REG64__MEM(SubModRM):
         except ImmediatOverflow:
             v = None
         if v is not None and force_displacement <= 1:
-            self.mod = BitArray(2, "01")
-            self.after = BitArray.from_string(v)
+            self.mod = self.bits(2, "01")
+            self.after = self.bits.from_string(v)
             return
         # Pack in a dword
         try:
@@ -655,22 +779,22 @@ class ModRM_REG64__MEM(SubModRM):
         except ImmediatOverflow:
             v = None
         if v is not None and force_displacement <= 4:
-            self.mod = BitArray(2, "10")
-            self.after = BitArray.from_string(v)
+            self.mod = self.bits(2, "10")
+            self.after = self.bits.from_string(v)
             return
         raise ValueError("Displacement {0} is too big".format(hex(displacement)))
 
     def compute_sib(self, mem_access):
         scale = {1: 0, 2: 1, 4: 2, 8: 3}
         if mem_access.index is None and mem_access.base is None:
-            return BitArray(2, "00") + BitArray(3, "100") + BitArray(3, "101")
+            return self.bits(2, "00") + self.bits(3, "100") + self.bits(3, "101")
         if mem_access.index is None:
-            return BitArray(2, "00") + BitArray(3, "100") + self.setup_sib_base_rex(mem_access.base)
+            return self.bits(2, "00") + self.bits(3, "100") + self.setup_sib_base_rex(mem_access.base)
         if mem_access.scale not in scale:
             raise ValueError("Invalid scale for mem access <{0}>".format(mem_access.scale))
         if mem_access.base is None:
-            return BitArray.from_int(2, scale[mem_access.scale]) + self.setup_sib_index_rex(mem_access.index) + BitArray(3, "101")
-        return BitArray.from_int(2, scale[mem_access.scale]) + self.setup_sib_index_rex(mem_access.index) + self.setup_sib_base_rex(mem_access.base)
+            return self.bits.from_int(2, scale[mem_access.scale]) + self.setup_sib_index_rex(mem_access.index) + self.bits(3, "101")
+        return self.bits.from_int(2, scale[mem_access.scale]) + self.setup_sib_index_rex(mem_access.index) + self.setup_sib_base_rex(mem_access.base)
 
 
 class Slash(object):
@@ -698,42 +822,150 @@ class Slash(object):
             return arg_consum, value, rex
         return arg_consum - 1, value, rex
 
-instr_state = collections.namedtuple('instr_state', ['previous', 'prefixes', 'type'])
+# Encoding dispatch cache
+# The encoding chosen for an instruction only depends on its type and on the 'shape' of its operands:
+# the exact registers/strings, the layout of the memory accesses and the range of the immediates.
+# The first successful encoding for a given shape is stored in `encoding_dispatch_cache`
+# and tried directly the next time the same shape is encoded.
+USE_DISPATCH_CACHE = True
+encoding_dispatch_cache = {}
+
+
+def _immediat_boundaries():
+    # All the ranges accepted by the Imm* / JmpImm* parameters
+    ranges = [(-2 ** 7, 2 ** 7 - 1), (-2 ** 15, 2 ** 15 - 1), (0, 2 ** 16 - 1),
+              (-2 ** 31, 2 ** 31 - 1), (0, 2 ** 32 - 1), (-2 ** 63, 2 ** 63 - 1),
+              (0, 2 ** 64 - 1), (0, 0)]
+    jump_subs = (0, 2, 5, 6)
+    res = set()
+    for low, high in ranges:
+        for sub in jump_subs:
+            res.add(low + sub)
+            res.add(high + sub + 1)
+    return sorted(res)
+
+immediat_boundaries = _immediat_boundaries()
+
+
+def immediat_kind(x):
+    """Return the index of the interval of ``x`` in ``immediat_boundaries``:
+       two immediates with the same kind are accepted by the same parameters"""
+    return bisect.bisect_right(immediat_boundaries, x)
+
+
+def operand_kind(arg):
+    """Return the shape of an operand used as dispatch key (``None`` if the operand cannot be cached)"""
+    if isinstance(arg, str):
+        return arg
+    if isinstance(arg, (int, long)):
+        return (int, immediat_kind(arg))
+    if isinstance(arg, mem_access):
+        if not isinstance(arg.disp, (int, long)):
+            return None
+        return (mem_access, arg.base, arg.index, arg.scale, immediat_kind(arg.disp), arg.prefix)
+    return None
+
+
+def dispatch_key(instr_type, args):
+    key = [instr_type]
+    for arg in args:
+        kind = operand_kind(arg)
+        if kind is None:
+            return None
+        key.append(kind)
+    return tuple(key)
+
+
+instr_state = collections.namedtuple('instr_state', ['previous', 'prefixes', 'type', 'bits'])
+
+# Encoding engine used by Instruction:
+#   - USE_INT_ENCODER: encode with IntBitArray (integer based) instead of the list based BitArray
+#   - CROSS_CHECK_ENCODER: encode with both engines and raise EncoderMismatch if the results differ
+USE_INT_ENCODER = False
+CROSS_CHECK_ENCODER = False
+
+
+class EncoderMismatch(AssertionError):
+    pass
 
 
 class Instruction(object):
     encoding = []
-    default_rex = BitArray.from_int(8, 0x40)
+    default_rex = RawBits.from_int(8, 0x40)
 
     def __init__(self, *initial_args):
-        for type_encoding in self.encoding:
-            args = list(initial_args)
-            res = []
-            prefix = []
-            full_rex = self.default_rex
-            #if hasattr(self, "default_32_bits") and self.default_32_bits:
-            #    full_rex = BitArray.from_int(8, 0x48)
-            for element in type_encoding:
-                arg_consum, value, rex = element.accept_arg(args, instr_state(res, prefix, type(self)))
-                if arg_consum is None:
-                    break
-                res.append(value)
-                del args[:arg_consum]
-                if rex is not None:
-                    full_rex = full_rex | rex
-            else:  # if no break
-                if args:  # if still args: fail
-                    continue
-                self.prefix = prefix
-                self.value = sum(res, BitArray(0, ""))
-                if str(full_rex.dump()) != "\x40":
-                    self.value = full_rex + self.value
-                return
+        bits = IntBitArray if USE_INT_ENCODER else BitArray
+        value, self.prefix = self.encode(initial_args, bits)
+        self.code = self.dump_code(value, self.prefix)
+        if CROSS_CHECK_ENCODER:
+            self.cross_check(initial_args, bits)
+
+    def encode(self, initial_args, bits):
+        """Return the ``(value, prefix)`` encoding of ``initial_args`` using the bit array type ``bits``"""
+        key = dispatch_key(type(self), initial_args) if USE_DISPATCH_CACHE else None
+        if key is not None and key in encoding_dispatch_cache:
+            result = self.encode_with(self.encoding[encoding_dispatch_cache[key]], initial_args, bits)
+            if result is not None:
+                return result
+        for i, type_encoding in enumerate(self.encoding):
+            result = self.encode_with(type_encoding, initial_args, bits)
+            if result is not None:
+                if key is not None:
+                    encoding_dispatch_cache[key] = i
+                return result
         raise ValueError("Cannot encode <{0} {1}>:(".format(type(self).__name__, initial_args))
 
+    def encode_with(self, type_encoding, initial_args, bits):
+        """Try to encode ``initial_args`` with one entry of ``encoding``, return ``None`` if not possible"""
+        if not initial_args and len(type_encoding) == 1 and isinstance(type_encoding[0], RawBits):
+            return type_encoding[0], []  # Constant instruction: use the pre-dumped RawBits
+        args = list(initial_args)
+        res = []
+        prefix = []
+        if bits is BitArray:
+            full_rex = self.default_rex
+        else:
+            full_rex = bits.from_int(self.default_rex.size, self.default_rex.int_value)
+        #if hasattr(self, "default_32_bits") and self.default_32_bits:
+        #    full_rex = BitArray.from_int(8, 0x48)
+        for element in type_encoding:
+            arg_consum, value, rex = element.accept_arg(args, instr_state(res, prefix, type(self), bits))
+            if arg_consum is None:
+                return None
+            res.append(value)
+            del args[:arg_consum]
+            if rex is not None:
+                full_rex = full_rex | rex
+        if args:  # if still args: fail
+            return None
+        value = sum(res, bits(0, ""))
+        if full_rex.to_int() != 0x40:
+            value = full_rex + value
+        return value, prefix
+
+    def cross_check(self, initial_args, bits):
+        other_bits = BitArray if bits is IntBitArray else IntBitArray
+        value, prefix = self.encode(initial_args, other_bits)
+        code = self.dump_code(value, prefix)
+        if code != self.code or prefix != self.prefix:
+            raise EncoderMismatch("Encoders mismatch for <{0} {1}>: {2} vs {3}".format(type(self).__name__,
+                                    initial_args, repr(self.code), repr(code)))
+
+    @staticmethod
+    def dump_code(value, prefix):
+        """Return the bytes of the encoding ``value`` preceded by its ``prefix``"""
+        prefix_opcode = b"".join(chr(p.PREFIX_VALUE) for p in prefix)
+        if isinstance(value, RawBits):
+            return prefix_opcode + value.code
+        return prefix_opcode + bytes(value.dump())
+
+    @property
+    def value(self):
+        """The encoding of the instruction (without prefix) as a :class:`BitArray`"""
+        return BitArray.from_string(self.code[len(self.prefix):])
+
     def get_code(self):
-        prefix_opcode = b"".join(chr(p.PREFIX_VALUE) for p in self.prefix)
-        return prefix_opcode + bytes(self.value.dump())
+        return self.code
 
     def __mul__(self, value):
         if not isinstance(value, (int, long)):
@@ -760,8 +992,9 @@ class JmpType(Instruction):
 
 
 class Push(Instruction):
+    # The imm32 is sign-extended to 64bits
     encoding = [(RawBits.from_int(5, 0x50 >> 3), X64RegisterSelector()),
-                (RawBits.from_int(8, 0x68), AnyImm32()),
+                (RawBits.from_int(8, 0x68), Imm32()),
                 (RawBits.from_int(8, 0xff), Slash(6))]
 
 
@@ -776,6 +1009,11 @@ class Xchg(Instruction):
                 (RawBits.from_int(5, 0x90 >> 3), X64RegisterSelector(), RegisterRax())]
 
 
+class Xadd(Instruction):
+    default_32_bits = True
+    encoding = [(RawBits.from_int(16, 0x0fc1), ModRM([ModRM_REG__REG, ModRM_REG64__MEM], has_direction_bit=False))]
+
+
 class Ret(Instruction):
     encoding = [(RawBits.from_int(8, 0xc3),)]
 
@@ -838,6 +1076,10 @@ class Cpuid(Instruction):
     encoding = [(RawBits.from_int(16, 0x0fa2),)]
 
 
+class Rdtsc(Instruction):
+    encoding = [(RawBits.from_int(16, 0x0f31),)]
+
+
 class JmpImm(object):
     accept_as_Ximmediat = (None)
 
@@ -854,7 +1096,7 @@ class JmpImm(object):
             jmp_imm = self.accept_as_Ximmediat(jump_size)
         except ImmediatOverflow:
             return (None, None, None)
-        return (1, BitArray.from_string(jmp_imm), None)
+        return (1, instr_state.bits.from_string(jmp_imm), None)
 
 
 class JmpImm8(JmpImm):
@@ -872,7 +1114,8 @@ class Call(JmpType):
 class Jmp(JmpType):
     encoding = [(RawBits.from_int(8, 0xeb), JmpImm8(2)),
                 (RawBits.from_int(8, 0xe9), JmpImm32(5)),
-                (RawBits.from_int(13, 0xffe0 >> 3), X64RegisterSelector())]
+                (RawBits.from_int(13, 0xffe0 >> 3), X64RegisterSelector()),
+                (RawBits.from_int(8, 0xff), Slash(4))]
 
 
 class Jz(JmpType):
@@ -923,7 +1166,7 @@ class Cmp(Instruction):
 class Test(Instruction):
     default_32_bits = True
     refuse_reverse = True
-    encoding = [(RawBits.from_int(8, 0xf7), Slash(7), AnyImm32()),
+    encoding = [(RawBits.from_int(8, 0xf7), Slash(0), AnyImm32()),
                 (RawBits.from_int(8, 0x85), ModRM([ModRM_REG__REG, ModRM_REG64__MEM], has_direction_bit=False))]
 
 
@@ -994,8 +1237,10 @@ class Retf32(Instruction):
     encoding = [(RawBits.from_int(8, 0xcb),)]
 
 
-class _NopArtifact(Nop):
-    pass
+class Label(object):
+
+    def __init__(self, name):
+        self.name = name
 
 
 def JmpAt(addr):
@@ -1005,29 +1250,117 @@ def JmpAt(addr):
     return code
 
 
-class Label(object):
+class _LabelPosition(object):
+    """Position of a label in a MultipleInstr"""
+    __slots__ = ["name", "offset"]
+
     def __init__(self, name):
         self.name = name
+        self.offset = None
+
+
+class _LabeledJump(object):
+    """A jump of type `type` to a `_LabelPosition` in a MultipleInstr"""
+    __slots__ = ["type", "label", "target", "offset"]
+
+    def __init__(self, type, label, target=None):
+        self.type = type
+        self.label = label
+        self.target = target
+        self.offset = None
+
+
+_jump_size_cache = {}
+
+
+def jump_size(jump_type, distance):
+    """Size of the jump of type ``jump_type`` for a given ``distance``
+
+       The size only depends on the range of ``distance`` (see :func:`immediat_kind`)"""
+    key = (jump_type, immediat_kind(distance))
+    try:
+        return _jump_size_cache[key]
+    except KeyError:
+        size = len(jump_type(distance).get_code())
+        _jump_size_cache[key] = size
+        return size
+
+
+# (opcode bytes, format of the displacement) of each jump type by range of distance
+_jump_encoding_cache = {}
+
+
+def jump_code(jump_type, distance):
+    """Code of the jump of type ``jump_type`` for a given ``distance``
+
+       The jump is encoded once by range of ``distance``: the other ones only pack their displacement"""
+    key = (jump_type, immediat_kind(distance))
+    try:
+        opcode, format = _jump_encoding_cache[key]
+    except KeyError:
+        code = bytes(jump_type(distance).get_code())
+        # The displacement is the last field, relative to the end of the jump
+        for format in ("<i", "<b"):
+            field_size = struct.calcsize(format)
+            if len(code) > field_size and struct.unpack(format, code[-field_size:])[0] == distance - len(code):
+                _jump_encoding_cache[key] = (code[:-field_size], format)
+                break
+        return code
+    try:
+        return opcode + struct.pack(format, distance - len(opcode) - struct.calcsize(format))
+    except struct.error:
+        # The displacement does not fit the encoding of the other distances of its range
+        return bytes(jump_type(distance).get_code())
 
 
 class MultipleInstr(object):
-    JUMP_SIZE = 6
+    """A list of instructions, labels and jumps to labels.
+
+    The code is assembled with a jump relaxation on :func:`get_code`:
+    all jumps to labels start with their smallest encoding and only the jumps whose
+    displacement does not fit are grown, until no more jump needs to grow.
+    Each pass is linear in the number of instructions.
+    """
 
     def __init__(self, init_instrs=()):
-        self.instrs = {}
+        # Instructions / _LabelPosition / _LabeledJump in order
+        self.fragments = []
+        # Size of each fragment (current size for jumps)
+        self.sizes = []
+        # Current _LabelPosition of each defined label
         self.labels = {}
+        # Jumps to labels not defined yet
         self.expected_labels = {}
-        # List of all labeled jump already resolved
-        # Will be used for 'relocation'
-        self.computed_jump = []
-        self.size = 0
+        self.jumps = []
+        self.is_relaxed = True
+        # Assembled code, reset when the code changes
+        self.code = None
         for i in init_instrs:
             self += i
 
+    @property
+    def size(self):
+        """Size of the code (the labels must be resolved)"""
+        self.relax()
+        return sum(self.sizes)
+
     def get_code(self):
-        if self.expected_labels:
-            raise ValueError("Unresolved labels: {0}".format(self.expected_labels.keys()))
-        return b"".join([bytes(x[1].get_code()) for x in sorted(self.instrs.items())])
+        self.relax()
+        if self.code is not None:
+            return self.code
+        res = []
+        for fragment, size in zip(self.fragments, self.sizes):
+            if isinstance(fragment, _LabelPosition):
+                continue
+            if isinstance(fragment, _LabeledJump):
+                code = jump_code(fragment.type, fragment.target.offset - fragment.offset)
+                if len(code) != size:
+                    raise ValueError("Jump relaxation failed for {0} to <{1}>".format(fragment.type.__name__, fragment.label))
+                res.append(bytes(code))
+                continue
+            res.append(bytes(fragment.get_code()))
+        self.code = b"".join(res)
+        return self.code
 
     def add_instruction(self, instruction):
         if isinstance(instruction, Label):
@@ -1036,117 +1369,72 @@ class MultipleInstr(object):
         if isinstance(instruction, DelayedJump):
             return self.add_delayed_jump(instruction)
         if isinstance(instruction, (Instruction, Prefix)):
-            self.instrs[self.size] = instruction
-            self.size += len(instruction.get_code())
+            self.fragments.append(instruction)
+            self.sizes.append(len(instruction.get_code()))
+            self.is_relaxed = False
+            self.code = None
             return
         raise ValueError("Don't know what to do with {0} of type {1}".format(instruction, type(instruction)))
 
     def add_label(self, label):
-        if label.name not in self.expected_labels:
-            # Label that have no jump before definition
-            # Just registed the address of the label
-            self.labels[label.name] = self.size
-            return
-        # Label with jmp before definition
-        # Lot of stuff todo:
-            # Find all delayed jump that refer to this jump
-            # Replace them with real jump
-            # If size of jump < JUMP_SIZE: relocate everything we can
-            # Update expected_labels
-        for jump_to_label in self.expected_labels[label.name]:
-            if jump_to_label.offset in self.instrs:
-                raise ValueError("WTF REPLACE EXISTING INSTR...")
-            distance = self.size - jump_to_label.offset
-            real_jump = jump_to_label.type(distance)
-            self.instrs[jump_to_label.offset] = real_jump
-            self.computed_jump.append((jump_to_label.offset, self.size))
-            for i in range(self.JUMP_SIZE - len(real_jump.get_code())):
-                self.instrs[jump_to_label.offset + len(real_jump.get_code()) + i] = _NopArtifact()
-        del self.expected_labels[label.name]
-        self.labels[label.name] = self.size
-        if not self.expected_labels:
-            # No more un-resolved label (for now): time to reduce the shellcode
-            self._reduce_shellcode()
+        position = _LabelPosition(label.name)
+        self.fragments.append(position)
+        self.sizes.append(0)
+        self.labels[label.name] = position
+        self.is_relaxed = False
+        self.code = None
+        # Resolve all the jumps waiting for this label
+        for jump in self.expected_labels.pop(label.name, ()):
+            jump.target = position
 
     def add_delayed_jump(self, jump):
-        dst = jump.label
-        if dst in self.labels:
-            # Jump to already defined labels
-            # Nothing fancy: get offset of label and jump to it !
-            distance = self.size - self.labels[dst]
-            jump_instruction = jump.type(-distance)
-            self.computed_jump.append((self.size, self.labels[dst]))
-            return self.add_instruction(jump_instruction)
-        # Jump to undefined label
-        # Add label to expected ones
-        # Add jump info -> offset of jump | type
-        # Reserve space for call !
-        jump.offset = self.size
-        self.expected_labels.setdefault(dst, []).append(jump)
-        self.size += self.JUMP_SIZE
-        return
-
-    def _reduce_shellcode(self):
-        to_remove = [offset for offset, instr in self.instrs.items() if type(instr) == _NopArtifact]
-        while to_remove:
-            self._remove_nop_artifact(to_remove[0])
-            # _remove_nop_artifact will change the offsets of the nop
-            # Need to refresh these offset
-            to_remove = [offset for offset, instr in self.instrs.items() if type(instr) == _NopArtifact]
-
-    def _remove_nop_artifact(self, offset):
-        """Remove a NOP from the shellcode, adjust jump and labels"""
-        for src, dst in self.computed_jump:
-            # Reduce size of Jump over the nop (both sens)
-            if src < offset < dst or dst < offset < src:
-                old_jmp = self.instrs[src]
-                old_jump_size = len(old_jmp.get_code())
-                if src < offset < dst:
-                    new_jmp = type(old_jmp)(dst - src - 1)
-                else:
-                    new_jmp = type(old_jmp)(dst - src + 1)
-                new_jmp_size = len(new_jmp.get_code())
-                if new_jmp_size > old_jump_size:
-                    raise ValueError("Wtf jump of smaller size of bigger.. ABORT")
-                self.instrs[src] = new_jmp
-                # Add other _NopArtifact if jump instruction size is reduced
-                for i in range(old_jump_size - new_jmp_size):
-                    self.instrs[src + new_jmp_size + i] = _NopArtifact()
-
-        # dec offset of all Label after the NOP
-        for name, labeloffset in self.labels.items():
-            if labeloffset > offset:
-                self.labels[name] = labeloffset - 1
-
-        # dec offset of all instr after the NOP
-        new_instr = {}
-        for instroffset, instr in self.instrs.items():
-            if instroffset == offset:
-                continue
-            if instroffset > offset:
-                instroffset -= 1
-            new_instr[instroffset] = instr
-        self.instrs = new_instr
-        # Update all computed jump
-        new_computed_jump = []
-        for src, dst in self.computed_jump:
-            if src > offset:
-                src -= 1
-            if dst > offset:
-                dst -= 1
-            new_computed_jump.append((src, dst))
-        self.computed_jump = new_computed_jump
-        # dec size of the shellcode
-        self.size -= 1
+        # A jump to a defined label jumps to its last definition
+        # A jump to an undefined label jumps to its next definition
+        labeled_jump = _LabeledJump(jump.type, jump.label, self.labels.get(jump.label))
+        if labeled_jump.target is None:
+            self.expected_labels.setdefault(jump.label, []).append(labeled_jump)
+        self.fragments.append(labeled_jump)
+        self.sizes.append(jump_size(jump.type, 0))
+        self.jumps.append(len(self.fragments) - 1)
+        self.is_relaxed = False
+        self.code = None
+
+    def compute_offsets(self):
+        offset = 0
+        for fragment, size in zip(self.fragments, self.sizes):
+            if type(fragment) in (_LabelPosition, _LabeledJump):
+                fragment.offset = offset
+            offset += size
+
+    def relax(self):
+        """Compute the size of all the jumps to labels"""
+        if self.expected_labels:
+            raise ValueError("Unresolved labels: {0}".format(self.expected_labels.keys()))
+        fragments = self.fragments
+        sizes = self.sizes
+        while not self.is_relaxed:
+            self.compute_offsets()
+            self.is_relaxed = True
+            for i in self.jumps:
+                jump = fragments[i]
+                # The displacement of a jump only grows with the jumps size:
+                # a jump that does not fit in its current size will never shrink back
+                new_size = jump_size(jump.type, jump.target.offset - jump.offset)
+                if new_size > sizes[i]:
+                    sizes[i] = new_size
+                    self.is_relaxed = False
 
     def merge_shellcode(self, other):
         shared_labels = set(self.labels) & set(other.labels)
         if shared_labels:
             raise ValueError("Cannot merge shellcode: shared labels {0}".format(shared_labels))
-        for offset, instr in sorted(other.instrs.items()):
-            for label_name in [name for name, label_offset in other.labels.items() if label_offset == offset]:
-                self.add_instruction(Label(label_name))
-            self.add_instruction(instr)
+        for fragment in other.fragments:
+            if isinstance(fragment, _LabelPosition):
+                self.add_label(Label(fragment.name))
+            elif isinstance(fragment, _LabeledJump):
+                self.add_delayed_jump(DelayedJump(fragment.type, fragment.label))
+            else:
+                self.add_instruction(fragment)
 
     def __iadd__(self, other):
         if isinstance(other, MultipleInstr):
@@ -1165,31 +1453,347 @@ def split_in_instruction(str):
                 continue
             yield instr.strip()
 
-def assemble(str):
-    """Play test"""
-    shellcode = MultipleInstr()
-    for instr in split_in_instruction(str):
-        data = instr.split(" ", 1)
-        mnemo, args_raw = data[0], data[1:]
+
+# Text assembler
+#   - instructions are separated by newlines or ';' and operands by ','
+#   - a '{name}' operand (immediat or displacement) is a placeholder patched by AssembledCode.patch
+#   - '#' starts a comment until the end of the line
+ASSEMBLE_CACHE_SIZE = 256
+
+asm_token_re = re.compile(r"""
+    (?P<space>[ \t\r]+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<sep>[\n;])
+  | (?P<number>0[xX][0-9a-fA-F]+|0[bB][01]+|[0-9]+)
+  | (?P<placeholder>\{\w+\})
+  | (?P<label>:\w+)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>[,\[\]+\-*:])
+""", re.VERBOSE)
+
+
+class AsmPlaceholder(object):
+    """A ``{name}`` operand of assembly text"""
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "{{{0}}}".format(self.name)
+
+
+# A copy of windows.utils.LRUCache: the encoder stays standalone and does not import windows
+class LRUCache(object):
+    """A dict with a maximum size that forgets the least recently used entries"""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
         try:
-            instr_object = globals()[mnemo.capitalize()]
-        except:
-            raise ValueError("Unknow mnemonic <{0}>".format(mnemo))
+            value = self.entries.pop(key)
+        except KeyError:
+            return default
+        self.entries[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def tokenize(str):
+    """Split assembly text in a list of ``(kind, value)``, the whitespaces and comments are dropped"""
+    tokens = []
+    pos = 0
+    while pos < len(str):
+        match = asm_token_re.match(str, pos)
+        if match is None:
+            raise ValueError("Invalid character <{0}> at offset {1} in assembly".format(str[pos], pos))
+        kind = match.lastgroup
+        if kind == "number":
+            tokens.append((kind, int(match.group(kind), 0)))
+        elif kind == "placeholder":
+            tokens.append((kind, AsmPlaceholder(match.group(kind)[1:-1])))
+        elif kind not in ("space", "comment"):
+            tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    tokens.append(("sep", None))
+    return tokens
+
+
+def asm_mnemonics():
+    """Return the mapping ``lowercase name -> Instruction type / Prefix / Label`` usable in assembly text"""
+    mnemonics = {"lock": LockPrefix}
+    for name, value in globals().items():
+        if isinstance(value, Prefix) or (isinstance(value, type) and issubclass(value, (Instruction, Label))):
+            mnemonics.setdefault(name.lower(), value)
+    return mnemonics
+
+
+class AsmParser(object):
+    """Parse assembly text to a list of ``(prefixes, instr_type, args)``
+
+       A memory operand is returned as the ``create_displacement`` parameters
+       as its displacement may be a placeholder.
+    """
+    mnemonics = None
+
+    def __init__(self, str):
+        if AsmParser.mnemonics is None:
+            AsmParser.mnemonics = asm_mnemonics()
+        self.tokens = tokenize(str)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def pop(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, kind, value=None):
+        token = self.pop()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise ValueError("Expected <{0}> got <{1}> in assembly".format(value or kind, token[1]))
+        return token[1]
+
+    def parse(self):
+        instrs = []
+        while self.pos < len(self.tokens):
+            if self.peek()[0] == "sep":
+                self.pos += 1
+                continue
+            instrs.append(self.parse_instruction())
+        return instrs
 
+    def parse_instruction(self):
+        prefixes = []
+        while True:
+            mnemo = self.expect("name")
+            try:
+                instr_type = self.mnemonics[mnemo.lower()]
+            except KeyError:
+                raise ValueError("Unknow mnemonic <{0}>".format(mnemo))
+            if not isinstance(instr_type, Prefix):
+                break
+            prefixes.append(instr_type)
         args = []
-        if args_raw:
-            for arg in args_raw[0].split(","):
-                arg = arg.strip()
-                if (arg[0] == "[" or arg[2:4] == ":[") and arg[-1] == "]":
-                    arg = mem(arg)
+        if self.peek()[0] != "sep":
+            args.append(self.parse_operand())
+            while self.peek() == ("op", ","):
+                self.pos += 1
+                args.append(self.parse_operand())
+        self.expect("sep")
+        return prefixes, instr_type, args
+
+    def parse_operand(self):
+        kind, value = self.pop()
+        if kind in ("number", "placeholder", "label"):
+            return value
+        if (kind, value) == ("op", "-"):
+            return -self.expect("number")
+        if (kind, value) == ("op", "["):
+            return self.parse_memory(None)
+        if kind == "name":
+            if self.peek() == ("op", ":"):
+                self.pos += 1
+                if value.upper() not in x64_segment_selectors:
+                    raise ValueError("Unknow segment selector {0}".format(value))
+                self.expect("op", "[")
+                return self.parse_memory(value.upper())
+            return value
+        raise ValueError("Invalid operand <{0}> in assembly".format(value))
+
+    def parse_memory(self, prefix):
+        mem_args = {'prefix': prefix}
+        sign = 1
+        while True:
+            kind, value = self.pop()
+            if (kind, value) == ("op", "-"):
+                sign = -sign
+                continue
+            if kind == "name":
+                if sign < 0 or not X64.is_reg(value):
+                    raise ValueError("Invalid base/index <{0}> in mem access".format(value))
+                if self.peek() == ("op", "*"):
+                    self.pos += 1
+                    if 'index' in mem_args:
+                        raise ValueError("Multiple index / index*scale in mem access")
+                    mem_args['index'] = value
+                    mem_args['scale'] = self.expect("number")
+                elif 'base' not in mem_args:
+                    mem_args['base'] = value
+                elif 'index' not in mem_args:
+                    mem_args['index'] = value
                 else:
-                    try:
-                        arg = int(arg, 0)
-                    except ValueError:
-                        pass
-                args.append(arg)
-        shellcode += instr_object(*args)
-    return shellcode.get_code()
+                    raise ValueError("Multiple index / index*scale in mem access")
+            elif kind in ("number", "placeholder"):
+                if 'disp' in mem_args:
+                    raise ValueError("Multiple displacement in mem access")
+                if kind == "placeholder" and sign < 0:
+                    raise ValueError("Cannot substract placeholder <{0}> in mem access".format(value))
+                mem_args['disp'] = value * sign if kind == "number" else value
+            else:
+                raise ValueError("Invalid item <{0}> in mem access".format(value))
+            sign = 1
+            kind, value = self.pop()
+            if (kind, value) == ("op", "]"):
+                return mem_args
+            if (kind, value) == ("op", "-"):
+                sign = -1
+            elif (kind, value) != ("op", "+"):
+                raise ValueError("Invalid item <{0}> in mem access".format(value))
+
+
+class AssembledCode(object):
+    """Code assembled from text and the location of its placeholders
+
+       ``placeholders`` maps a name to a list of ``(offset, size, addend, signed)``:
+       the field at ``offset`` is ``value + addend`` on ``size`` bytes (little endian).
+       A ``signed`` field is sign-extended by the CPU: it only accepts the signed values of ``size`` bytes.
+    """
+    field_formats = {1: "<B", 2: "<H", 4: "<I", 8: "<Q"}
+
+    def __init__(self, code, placeholders):
+        self.code = code
+        self.placeholders = placeholders
+
+    def patch(self, **values):
+        """Return the code with the placeholders replaced by ``values``"""
+        if set(values) != set(self.placeholders):
+            raise ValueError("Expected placeholders {0} got {1}".format(sorted(self.placeholders), sorted(values)))
+        if not values:
+            return self.code
+        code = bytearray(self.code)
+        for name, value in values.items():
+            for offset, size, addend, signed in self.placeholders[name]:
+                field = value + addend
+                upper = 1 << (size * 8 - 1) if signed else 1 << (size * 8)
+                if not -(1 << (size * 8 - 1)) <= field < upper:
+                    raise ImmediatOverflow("Value {0:#x} of placeholder <{1}> does not fit in {2} {3}bytes".format(value, name, size, "signed " if signed else ""))
+                struct.pack_into(self.field_formats[size], code, offset, field & ((1 << (size * 8)) - 1))
+        return bytes(code)
+
+
+def build_asm_instruction(prefixes, instr_type, args, values=None):
+    """Create the instruction parsed by :class:`AsmParser`, ``values`` gives the value of the placeholders"""
+    real_args = []
+    for arg in args:
+        if isinstance(arg, dict):
+            arg = dict(arg)
+            if isinstance(arg.get('disp'), AsmPlaceholder):
+                arg['disp'] = values[arg['disp'].name]
+            arg = create_displacement(**arg)
+        elif isinstance(arg, AsmPlaceholder):
+            arg = values[arg.name]
+        real_args.append(arg)
+    instr = instr_type(*real_args)
+    for prefix in reversed(prefixes):
+        instr = prefix + instr
+    return instr
+
+
+def asm_placeholders(args):
+    names = []
+    for arg in args:
+        if isinstance(arg, dict):
+            arg = arg.get('disp')
+        if isinstance(arg, AsmPlaceholder):
+            names.append(arg.name)
+    return names
+
+
+# (dummy value, value with a different first and last byte) for each possible size of placeholder field
+placeholder_probes = [(8, 0x7f7f7f7f7f7f7f7f, 0x7e7f7f7f7f7f7f7e), (4, 0x7f7f7f7f, 0x7e7f7f7e), (2, 0x7f7f, 0x7e7e), (1, 0x7f, 0x7e)]
+
+
+def locate_asm_placeholders(prefixes, instr_type, args):
+    """Encode an instruction with placeholders, return ``(instruction, [(name, offset, size, addend, signed)])``
+
+       Each placeholder gets the biggest probe value accepted by the instruction, then its field
+       is located by encoding the instruction with a value that only differs on the first and last byte.
+       The field is ``signed`` if the instruction does not encode it with its high bit set (sign-extended field).
+    """
+    names = sorted(set(asm_placeholders(args)))
+    probes = dict.fromkeys(names, placeholder_probes[-1])
+    for name in names:
+        for probe in placeholder_probes[:-1]:
+            values = dict((n, p[1]) for n, p in probes.items())
+            values[name] = probe[1]
+            try:
+                build_asm_instruction(prefixes, instr_type, args, values)
+            except ValueError:
+                continue
+            probes[name] = probe
+            break
+    values = dict((n, p[1]) for n, p in probes.items())
+    try:
+        instr = build_asm_instruction(prefixes, instr_type, args, values)
+    except ValueError:
+        raise ValueError("Cannot encode <{0} {1}> with placeholders".format(instr_type.__name__, args))
+    code = instr.get_code()
+    fields = []
+    for name in names:
+        size, dummy, other = probes[name]
+        other_code = build_asm_instruction(prefixes, instr_type, args, dict(values, **{name: other})).get_code()
+        diff = [i for i, (a, b) in enumerate(zip(code, other_code)) if a != b]
+        if len(code) != len(other_code) or not diff or diff[-1] - diff[0] + 1 != size:
+            raise ValueError("Cannot locate placeholder <{0}> in <{1} {2}>".format(name, instr_type.__name__, args))
+        offset = diff[0]
+        field = struct.unpack(AssembledCode.field_formats[size], code[offset: offset + size])[0]
+        addend = field - dummy
+        high = 1 << (size * 8 - 1)
+        try:
+            high_code = build_asm_instruction(prefixes, instr_type, args, dict(values, **{name: high - addend})).get_code()
+        except ValueError:
+            high_code = None
+        signed = (high_code is None or len(high_code) != len(code) or
+                    high_code[offset: offset + size] != struct.pack(AssembledCode.field_formats[size], high))
+        fields.append((name, offset, size, addend, signed))
+    return instr, fields
+
+
+assemble_cache = LRUCache(ASSEMBLE_CACHE_SIZE)
+
+
+def assemble_template(str):
+    """Assemble ``str`` to an :class:`AssembledCode`, the result is cached by source text"""
+    result = assemble_cache.get(str)
+    if result is not None:
+        return result
+    shellcode = MultipleInstr()
+    fields = []
+    for prefixes, instr_type, args in AsmParser(str).parse():
+        if asm_placeholders(args):
+            instr, instr_fields = locate_asm_placeholders(prefixes, instr_type, args)
+            fields.extend((len(shellcode.fragments), field) for field in instr_fields)
+        else:
+            instr = build_asm_instruction(prefixes, instr_type, args)
+        shellcode += instr
+    code = shellcode.get_code()
+    offsets = [0]
+    for size in shellcode.sizes:
+        offsets.append(offsets[-1] + size)
+    placeholders = {}
+    for index, (name, offset, size, addend, signed) in fields:
+        placeholders.setdefault(name, []).append((offsets[index] + offset, size, addend, signed))
+    result = AssembledCode(code, placeholders)
+    assemble_cache[str] = result
+    return result
+
+
+def assemble(str, **placeholders):
+    """Assemble ``str``: the ``{name}`` operands are replaced by ``placeholders[name]``"""
+    return assemble_template(str).patch(**placeholders)
 
 # import windows.native_exec.simple_x64 as x64
 try:
@@ -0,0 +1,111 @@
+import capstone
+import simple_x86 as x86
+import simple_x64 as x64
+import simple_disasm
+from simple_disasm import *
+from bench_encoding import load_test_corpus, x86_corpus, x64_corpus
+
+capstone_disassembleurs = {32: capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_32),
+                           64: capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_64)}
+
+
+def capstone_lengths(code, bitness):
+    return [instr.size for instr in capstone_disassembleurs[bitness].disasm(code, 0)]
+
+
+def check_length(code, bitness, expected_length=None):
+    length = instruction_length(code, 0, bitness)
+    if expected_length is None:
+        expected_length = capstone_lengths(code, bitness)[0]
+    if length != expected_length:
+        raise AssertionError("Length of <{0}> is {1} expected {2}".format(code.encode("hex"), length, expected_length))
+    print("{0} -> {1}".format(code.encode("hex"), length))
+
+
+def must_fail(code, bitness):
+    try:
+        decode_layout(code, 0, bitness)
+    except DecodeError:
+        return
+    raise AssertionError("Decoding of <{0}> should have failed".format(code.encode("hex")))
+
+
+# Lengths of the instructions of the tests and benchmark corpora
+for module, bitness, filename, corpus in [(x86, 32, "test_simple_x86.py", x86_corpus), (x64, 64, "test_simple_x64.py", x64_corpus)]:
+    corpus = load_test_corpus(module, filename) + corpus
+    for instr_type, args in corpus:
+        code = instr_type(*args).get_code()
+        check_length(code, bitness, len(code))
+        check_length(code, bitness)
+        # Round trip: decoding to an instruction that gives the same code
+        decoded = simple_disasm.decode(code, bitness=bitness)
+        if decoded.get_code() != code:
+            raise AssertionError("Decoding of <{0}> gave <{1}>".format(code.encode("hex"), decoded.get_code().encode("hex")))
+
+
+# Instructions that simple_x86 / simple_x64 cannot encode
+check_length("\xcc", 32, 1)
+check_length("\x55\x8b\xec", 32, 1)
+check_length("\x8b\xff", 32, 2)
+check_length("\x66\x0f\x1f\x44\x00\x00", 32, 6)
+check_length("\x0f\x1f\x84\x00\x00\x00\x00\x00", 64, 8)
+check_length("\x48\x8b\x05\x11\x22\x33\x44", 64, 7)
+check_length("\x48\xb8\x88\x77\x66\x55\x44\x33\x22\x11", 64, 10)
+check_length("\x66\xb8\x11\x22", 32, 4)
+check_length("\xa1\x11\x22\x33\x44", 32, 5)
+check_length("\x48\xa1\x88\x77\x66\x55\x44\x33\x22\x11", 64, 10)
+check_length("\xf6\xc1\x01", 32, 3)
+check_length("\xf7\xd0", 32, 2)
+check_length("\xf7\xc1\x11\x22\x33\x44", 32, 6)
+check_length("\xc2\x08\x00", 32, 3)
+check_length("\xc8\x10\x00\x00", 32, 4)
+check_length("\x66\x0f\x3a\x0f\xc1\x08", 64, 6)
+check_length("\xc5\xfc\x77", 64, 3)
+check_length("\xc5\xf8\x77", 64, 3)
+check_length("\xc4\xe2\x79\x18\x05\x11\x22\x33\x44", 64, 9)
+check_length("\xc4\xe3\x7d\x18\xc1\x01", 64, 6)
+check_length("\x62\xf1\x7c\x48\x28\xc1", 64, 6)
+check_length("\xc4\x01", 32, 2)  # LES in 32 bits
+check_length("\x9a\x11\x22\x33\x44\x33\x00", 32, 7)
+check_length("\x67\x8b\x00", 32, 3)
+check_length("\x67\x8b\x46\x11", 32, 4)
+
+must_fail("\x0f\x0b\x90"[:1], 32)
+must_fail("\x8b\x84\x24\x11\x22", 32)
+must_fail("\x06", 64)
+must_fail("\xd6", 32)
+must_fail("\x66" * 15 + "\x90", 32)
+
+# Code scan
+code = x86.MultipleInstr()
+code += x86.Push("EBP")
+code += x86.Mov("EBP", "ESP")
+code += x86.Mov("EAX", x86.mem("[EBP + 8]"))
+code += x86.Rep + x86.Movsb()
+code += x86.Pop("EBP")
+code += x86.Ret()
+code = code.get_code()
+offsets = [offset for offset, layout in iter_instructions(code)]
+assert offsets == [0, 1, 3, 7, 9, 10], offsets
+assert [layout.length for offset, layout in iter_instructions(code, offset=3, size=6)] == [4, 2]
+assert "".join(instr.get_code() for instr in decode_all(code)) == code
+assert isinstance(decode_all(code)[-1], x86.Ret)
+
+# Decoding errors
+try:
+    simple_disasm.decode("\x48\x8b\x05\x11\x22\x33\x44", bitness=64)
+except DecodeError:
+    pass
+else:
+    raise AssertionError("RIP relative addressing should not be decoded")
+
+# The errors report the offset of the instruction in the code of the caller
+for code, offset, bitness, message in [("\x90\x90\x90\x06", 3, 64, "Invalid opcode 06 at offset 0x3"),
+                                       ("\x90\x90\xe8\x00", 2, 32, "Truncated instruction at offset 0x2")]:
+    for data in (code, bytearray(code)):
+        try:
+            decode_layout(data, offset, bitness)
+        except DecodeError as e:
+            assert str(e) == message, str(e)
+        else:
+            raise AssertionError("Decoding of <{0}> should have failed".format(code.encode("hex")))
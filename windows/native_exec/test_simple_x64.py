@@ -2,6 +2,9 @@ import capstone
 import simple_x64 as x64
 from simple_x64 import *
 
+# Check that both encoding engines agree on every tested instruction
+x64.CROSS_CHECK_ENCODER = True
+
 disassembleur = capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_64)
 disassembleur.detail = True
 
@@ -187,6 +190,9 @@ TestInstr(Test, expected_result="test edi, eax")('EAX', 'EDI')
 TestInstr(Test)('RCX', 'RCX')
 
 TestInstr(Test)(mem('[RDI + 0x100]'), 'RCX')
+TestInstr(Test)('R9', 0x10)
+TestInstr(Test)(mem('[RSP + 8]'), 0x7fffffff)
+TestInstr(Jmp)(mem('[RAX + 8]'))
 
 assert Test(mem('[RDI + 0x100]'), 'RCX').get_code() == Test('RCX', mem('[RDI + 0x100]')).get_code()
 
@@ -207,6 +213,10 @@ assert len(Pop("RAX").get_code()) == 1
 TestInstr(Call)('RAX')
 TestInstr(Call)(mem('[RAX + RCX * 8]'))
 TestInstr(Cpuid)()
+TestInstr(Rdtsc)()
+TestInstr(Xadd)(mem('[RCX + 8]'), 'RAX')
+TestInstr(Xadd)(mem('[RAX]'), 'ECX')
+TestInstr(Xadd)('R9', 'RAX')
 TestInstr(Xchg)('RAX', 'RSP')
 assert Xchg('RAX', 'RCX').get_code() == Xchg('RCX', 'RAX').get_code()
 
@@ -248,9 +258,83 @@ TestInstr(Mov, must_fail=True)('ECX', mem('[RBX + ECX]'))
 TestInstr(Add, must_fail=True)('RAX', 0xffffffff)
 
 
+# The dispatch cache must choose the same encoding as a full search of the encodings
+def encode_jumps_and_immediats():
+    return [(Jmp(x).get_code(), Jz(x).get_code(), Add('RAX', x).get_code(), Push(x).get_code()) for x in range(-0x90, 0x90)]
+x64.USE_DISPATCH_CACHE = False
+uncached_code = encode_jumps_and_immediats()
+x64.USE_DISPATCH_CACHE = True
+assert encode_jumps_and_immediats() == uncached_code
+assert encode_jumps_and_immediats() == uncached_code
+
 code = MultipleInstr()
 code += Nop()
 code += Rep + Nop()
 code += Ret()
 print(repr(code.get_code()))
 assert code.get_code() == "\x90\xf3\x90\xc3"
+
+# Jump relaxation: a jump to a label only uses a 32bits displacement if needed
+code = MultipleInstr()
+code += Label(":BEGIN")
+code += Jmp(":END")
+code += Nop() * 0x7f
+code += Jz(":BEGIN")
+code += Jnz(":NEAR")
+code += Label(":NEAR")
+code += Label(":END")
+code += Ret()
+assert code.get_code() == "\xe9\x87\x00\x00\x00" + "\x90" * 0x7f + "\x0f\x84\x76\xff\xff\xff" + "\x75\x00" + "\xc3"
+
+# The code is assembled once and reassembled only if the code changes
+assembled = code.get_code()
+assert code.get_code() is assembled
+code += Jmp(":BEGIN")
+assert code.get_code() == assembled + "\xe9\x6e\xff\xff\xff"
+
+# The jumps to labels only pack the displacement of an already encoded jump of the same range
+for jump_type in (Jmp, Jz, Call):
+    for distance in [-0x81, -0x80, -2, 0, 0x7f, 0x81, 0x12345, -0x12345] * 2:
+        assert jump_code(jump_type, distance) == jump_type(distance).get_code()
+
+# Text assembler
+code = MultipleInstr()
+code += Label(":LOOP")
+code += Mov("RCX", mem("gs:[0x60]"))
+code += Add("RAX", mem("[RCX + R8 * 4 + -0x10]"))
+code += Repne + ScasW()
+code += Jnz(":LOOP")
+code += Ret()
+source = """label :LOOP
+    mov rcx, gs:[0x60] ; add rax, [rcx + r8 * 4 - 0x10]
+    repne scasw; jnz :LOOP
+    ret"""
+assert assemble(source) == code.get_code()
+assert assemble_template(source) is assemble_template(source)
+
+template = assemble_template("mov rax, {func}; push [rax + {offset}]; call rax; add rax, {func}")
+for func, offset in [(0x1122334455667788, 0x10), (0x7fffffff, -4), (0, 0)]:
+    try:
+        template.patch(func=func, offset=offset)
+    except ImmediatOverflow:
+        assert func > 0x7fffffff  # add rax, imm32
+        continue
+    instrs = disas(template.patch(func=func, offset=offset))
+    assert [x.mnemonic for x in instrs] == ["movabs", "push", "call", "add"]
+    assert instrs[0].operands[1].imm == func
+    assert instrs[1].operands[0].mem.disp == offset
+    assert instrs[3].operands[1].imm == func
+
+# Sign-extended imm32 / disp32 placeholders have the range of the encoders
+for source, instr in [("mov rcx, [{a}]", lambda a: Mov("RCX", mem("[{0}]".format(a)))), ("push {a}", Push)]:
+    template = assemble_template(source)
+    for value in [0x80000000, 0xffffffff]:
+        for build in [lambda: template.patch(a=value), lambda: instr(value).get_code()]:
+            try:
+                build()
+            except ValueError:
+                continue
+            raise AssertionError("<{0}> accepted {1:#x}".format(source, value))
+    for value in [0x7fffffff, -0x80000000]:
+        assert template.patch(a=value) == instr(value).get_code()
+assert disas(assemble("mov rax, {a}", a=0x80000000))[0].operands[1].imm == 0x80000000
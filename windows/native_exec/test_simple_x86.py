@@ -1,6 +1,10 @@
 import capstone
+import simple_x86 as x86
 from simple_x86 import *
 
+# Check that both encoding engines agree on every tested instruction
+x86.CROSS_CHECK_ENCODER = True
+
 disassembleur = capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_32)
 disassembleur.detail = True
 
@@ -131,6 +135,11 @@ TestInstr(Lea)('ECX', mem('[EDI + -0xff]'))
 TestInstr(Call)('EAX')
 TestInstr(Call)(mem('[EAX + ECX * 8]'))
 TestInstr(Cpuid)()
+TestInstr(Rdtsc)()
+TestInstr(Xadd)(mem('[EAX]'), 'ECX')
+TestInstr(Xadd)('EAX', 'ECX')
+TestInstr(Ret)()
+TestInstr(Ret)(0x10)
 TestInstr(Movsb, expected_result='movsb byte ptr es:[edi], byte ptr [esi]')()
 TestInstr(Movsd, expected_result='movsd dword ptr es:[edi], dword ptr [esi]')()
 TestInstr(Xchg)('EAX', 'ESP')
@@ -176,13 +185,79 @@ TestInstr(Test)('EAX', 'EAX')
 TestInstr(Test, expected_result="test edi, ecx")('ECX', 'EDI')
 
 TestInstr(Test)(mem('[ECX + 0x100]'), 'ECX')
+TestInstr(Test)('EAX', 0x10)
+TestInstr(Test)(mem('[ESP + 8]'), 0x80000000)
+TestInstr(Jmp)('EAX')
+TestInstr(Jmp)(mem('[0x80001000]'))
 
 assert Test(mem('[ECX + 0x100]'), 'ECX').get_code() == Test('ECX', mem('[ECX + 0x100]')).get_code()
 assert Xchg('EAX', 'ECX').get_code() == Xchg('ECX', 'EAX').get_code()
 
+# The dispatch cache must choose the same encoding as a full search of the encodings
+def encode_jumps_and_immediats():
+    return [(Jmp(x).get_code(), Jz(x).get_code(), Add('EAX', x).get_code(), Add('ECX', x).get_code()) for x in range(-0x90, 0x90)]
+x86.USE_DISPATCH_CACHE = False
+uncached_code = encode_jumps_and_immediats()
+x86.USE_DISPATCH_CACHE = True
+assert encode_jumps_and_immediats() == uncached_code
+assert encode_jumps_and_immediats() == uncached_code
+
 code = MultipleInstr()
 code += Nop()
 code += Rep + Nop()
 code += Ret()
 print(repr(code.get_code()))
 assert code.get_code() == "\x90\xf3\x90\xc3"
+
+# Jump relaxation: a jump to a label only uses a 32bits displacement if needed
+code = MultipleInstr()
+code += Label(":BEGIN")
+code += Jmp(":END")
+code += Nop() * 0x7f
+code += Jz(":BEGIN")
+code += Jnz(":NEAR")
+code += Label(":NEAR")
+code += Label(":END")
+code += Ret()
+assert code.get_code() == "\xe9\x87\x00\x00\x00" + "\x90" * 0x7f + "\x0f\x84\x76\xff\xff\xff" + "\x75\x00" + "\xc3"
+
+# The code is assembled once and reassembled only if the code changes
+assembled = code.get_code()
+assert code.get_code() is assembled
+code += Jmp(":BEGIN")
+assert code.get_code() == assembled + "\xe9\x6e\xff\xff\xff"
+
+# The jumps to labels only pack the displacement of an already encoded jump of the same range
+for jump_type in (Jmp, Jz, Call):
+    for distance in [-0x81, -0x80, -2, 0, 0x7f, 0x81, 0x12345, -0x12345] * 2:
+        assert jump_code(jump_type, distance) == jump_type(distance).get_code()
+
+# Text assembler
+code = MultipleInstr()
+code += Label(":LOOP")
+code += Mov("ECX", mem("fs:[0x30]"))
+code += Add("EAX", mem("[ECX + EDX * 4 + -0x10]"))
+code += Repne + ScasW()
+code += Jnz(":LOOP")
+code += Ret()
+source = """label :LOOP
+    mov ecx, fs:[0x30] ; add eax, [ecx + edx * 4 - 0x10]
+    repne scasw; jnz :LOOP
+    ret"""
+assert assemble(source) == code.get_code()
+assert assemble_template(source) is assemble_template(source)
+
+template = assemble_template("mov eax, {func}; push [eax + {offset}]; call eax; jmp {func}")
+for func, offset in [(0x11223344, 0x10), (0x7fffffff, -4), (0, 0)]:
+    instrs = disas(template.patch(func=func, offset=offset))
+    assert [x.mnemonic for x in instrs] == ["mov", "push", "call", "jmp"]
+    assert instrs[0].operands[1].imm & 0xffffffff == func
+    assert instrs[1].operands[0].mem.disp == offset
+    assert instrs[3].operands[0].imm & 0xffffffff == (instrs[3].address + func) & 0xffffffff
+
+# 32bits addresses use the whole disp32 / imm32
+assert assemble("mov ecx, [{a}]", a=0x80000000) == Mov("ECX", mem("[0x80000000]")).get_code()
+assert assemble("push {a}", a=0xffffffff) == Push(0xffffffff).get_code()
+
+# Placeholders with different field sizes in the same instruction
+assert assemble("call {cs}, {target}; ret", cs=0x33, target=0x11223344) == MultipleInstr([Call(0x33, 0x11223344), Ret()]).get_code()
@@ -0,0 +1,121 @@
+import ctypes
+import platform
+import struct
+
+import simple_x86 as x86
+import simple_x64 as x64
+import trampoline
+from trampoline import *
+
+
+def check_trampoline(code, source_addr, dest_addr, min_size, bitness, expected_trampoline, expected_stolen_size):
+    result, stolen_size = build_trampoline(code, source_addr, dest_addr, min_size, bitness)
+    if (result, stolen_size) != (expected_trampoline, expected_stolen_size):
+        raise AssertionError("Trampoline of <{0}> is <{1}> ({2} bytes stolen) expected <{3}> ({4} bytes stolen)".format(
+            code.encode("hex"), result.encode("hex"), stolen_size, expected_trampoline.encode("hex"), expected_stolen_size))
+    # The size of the trampoline does not depend of its address
+    assert len(build_trampoline(code, source_addr, dest_addr ^ 0x10000, min_size, bitness)[0]) == len(result)
+    print("{0} -> {1}".format(code[:stolen_size].encode("hex"), result.encode("hex")))
+
+
+def must_fail(code, source_addr, dest_addr, min_size, bitness):
+    try:
+        build_trampoline(code, source_addr, dest_addr, min_size, bitness)
+    except RelocationError as e:
+        print("Expected RelocationError: {0}".format(e))
+        return
+    raise AssertionError("Relocation of <{0}> should have failed".format(code.encode("hex")))
+
+
+def rel32(target, next_addr):
+    return struct.pack("<i", target - next_addr)
+
+
+def jmp64(target):
+    return "\xff\x25\x00\x00\x00\x00" + struct.pack("<Q", target)
+
+
+# x86: mov edi, edi; push ebp; mov ebp, esp; sub esp, 0x10
+prologue = "\x8b\xff\x55\x8b\xec\x83\xec\x10"
+check_trampoline(prologue + "\x90" * 8, 0x10000000, 0x20000000, 6, 32,
+                 prologue + "\xe9" + rel32(0x10000008, 0x2000000d), 8)
+# x86: call rel32 and jz rel8 relocation
+code = "\x55" + "\xe8" + rel32(0x10001000, 0x10000006) + "\x74\x10" + "\x90" * 8
+check_trampoline(code, 0x10000000, 0x20000000, 7, 32,
+                 "\x55" + "\xe8" + rel32(0x10001000, 0x20000006) + "\x0f\x84" + rel32(0x10000018, 0x2000000c) +
+                 "\xe9" + rel32(0x10000008, 0x20000011), 8)
+# x86: jmp rel8 at the end of the stolen bytes
+code = "\x8b\xff\x55\x8b\xec\xeb\x10" + "\x90" * 8
+check_trampoline(code, 0x10000000, 0x20000000, 6, 32,
+                 "\x8b\xff\x55\x8b\xec" + "\xe9" + rel32(0x10000017, 0x2000000a) + "\xe9" + rel32(0x10000007, 0x2000000f), 7)
+# x86: addresses wrap around 4GB
+code = "\xe8" + struct.pack("<i", 0x1000 - 0xf0000005 + 0x100000000) + "\x90" * 8
+check_trampoline(code, 0xf0000000, 0x10000000, 5, 32, "\xe8" + struct.pack("<i", 0x1000 - 0x10000005) + "\xe9" + struct.pack("<i", 0xf0000005 - 0x1000000a - 0x100000000), 5)
+
+# x64: push rbx; sub rsp, 0x20; mov rbx, rcx; (12 bytes detour)
+prologue = "\x40\x53\x48\x83\xec\x20\x48\x8b\xd9\x48\x8b\x05\x10\x00\x00\x00"
+source = 0x7ffe00001000
+dest = 0x7ffe10000000
+check_trampoline(prologue + "\x90" * 8, source, dest, 12, 64,
+                 prologue[:9] + "\x48\x8b\x05" + rel32(source + 0x20, dest + 16) + jmp64(source + 16), 16)
+# x64: call rel32 and jz rel8 are rewritten as absolute branches
+code = "\x48\x83\xec\x28" + "\xe8" + rel32(source + 0x1000, source + 9) + "\x74\x10" + "\x90" * 16
+check_trampoline(code, source, dest, 11, 64,
+                 "\x48\x83\xec\x28" + "\xff\x15\x02\x00\x00\x00\xeb\x08" + struct.pack("<Q", source + 0x1000) +
+                 "\x75\x0e" + jmp64(source + 0x1b) + jmp64(source + 11), 11)
+
+# Relocation errors
+must_fail("\x33\xc0\xc3" + "\x90" * 16, 0x10000000, 0x20000000, 6, 32)  # Function too short
+must_fail("\x85\xc9\x74\x01\x90\x90\x90" + "\x90" * 16, 0x10000000, 0x20000000, 6, 32)  # Branch to the stolen bytes
+must_fail("\xe3\x10\x90\x90\x90\x90" + "\x90" * 16, 0x10000000, 0x20000000, 6, 32)  # jecxz
+must_fail("\x48\x8b\x05\x00\x00\x00\x00" + "\x90" * 16, 0x7ffe00000000, 0x10000000, 12, 64)  # RIP relative too far
+must_fail("\x06" + "\x90" * 16, 0x7ffe00000000, 0x7ffe10000000, 12, 64)  # Invalid opcode in 64 bits
+
+# Patches grouped by pages
+assert hook_patch("\x68\x44\x33\x22\x11\xc3", 8) == "\x68\x44\x33\x22\x11\xc3\xcc\xcc"
+patches = [(0x10002ffc, "A" * 8), (0x10001010, "B" * 6), (0x10001000, "C" * 6), (0x10005000, "D" * 6)]
+assert patches_by_pages(patches) == [(0x10001000, 0x3000, [(0x10001000, "C" * 6), (0x10001010, "B" * 6), (0x10002ffc, "A" * 8)]),
+                                     (0x10005000, 0x1000, [(0x10005000, "D" * 6)])]
+
+# Hook a native function on a Linux x64 host (arguments in RDI) with the UnixMyMap allocator
+if platform.system().lower() == "linux" and platform.architecture()[0] == "64bit":
+    import native_function
+    allocator = native_function.CustomAllocator()
+
+    function = x64.MultipleInstr()
+    function += x64.Push("RBP")
+    function += x64.Mov("RBP", "RSP")
+    function += x64.Cmp("RDI", 0x1000)
+    function += x64.Jz(":BIG")
+    function += x64.Mov("RAX", "RDI")
+    function += x64.Add("RAX", 1)
+    function += x64.Pop("RBP")
+    function += x64.Ret()
+    function += x64.Label(":BIG")
+    function += x64.Mov("RAX", 0)
+    function += x64.Pop("RBP")
+    function += x64.Ret()
+    function_code = function.get_code() + "\xcc" * 16
+    function_addr = allocator.write_code(function_code)
+    call_function = ctypes.CFUNCTYPE(ctypes.c_ulong, ctypes.c_ulong)(function_addr)
+    assert call_function(5) == 6
+    assert call_function(0x1000) == 0
+
+    # The hook adds 1 to its argument and calls the trampoline
+    hook_addr = allocator.reserve_size(0x20)
+    detour = detour_code(hook_addr, 64)
+    trampoline_code, stolen_size = build_trampoline(function_code, function_addr, 0, len(detour), 64)
+    trampoline_addr = allocator.reserve_size(len(trampoline_code))
+    trampoline_code, stolen_size = build_trampoline(function_code, function_addr, trampoline_addr, len(detour), 64)
+    ctypes.memmove(trampoline_addr, trampoline_code, len(trampoline_code))
+    hook_code = x64.Add("RDI", 1).get_code() + x64.JmpAt(trampoline_addr).get_code()
+    ctypes.memmove(hook_addr, hook_code, len(hook_code))
+    patch = hook_patch(detour, stolen_size)
+    ctypes.memmove(function_addr, patch, len(patch))
+
+    assert call_function(5) == 7
+    assert call_function(0xfff) == 0  # Relocated jz
+    # Unhook
+    ctypes.memmove(function_addr, function_code[:stolen_size], stolen_size)
+    assert call_function(5) == 6
+    print("Native hook OK")
@@ -0,0 +1,150 @@
+"""Relocation of the first instructions of a function into a trampoline (used by inline hooks)
+
+The trampoline executes the relocated instructions and jumps back to the rest of the function.
+Nothing here writes to memory: it works on byte buffers and addresses.
+"""
+import struct
+
+import simple_x86 as x86
+import simple_x64 as x64
+import simple_disasm
+from simple_disasm import REL, RIP_RELATIVE
+
+
+class RelocationError(ValueError):
+    pass
+
+
+# Instructions after which the code of the function may not continue
+end_of_flow_opcodes = [(0xc3,), (0xc2,), (0xcb,), (0xca,), (0xcc,), (0xeb,), (0xe9,)]
+# Prefixes that can be dropped from a relocated branch (branch hints / BND)
+branch_hint_prefixes = [0x2e, 0x3e, 0xf2]
+
+PAGE_SIZE = 0x1000
+
+
+def detour_code(target_addr, bitness):
+    """The code written at the begin of a hooked function: a :func:`JmpAt` to ``target_addr``"""
+    module = x64 if bitness == 64 else x86
+    return module.JmpAt(target_addr).get_code()
+
+
+def absolute_jump(target_addr, bitness, here):
+    """A jump to ``target_addr`` from ``here`` that does not modify any register"""
+    if bitness == 64:
+        return "\xff\x25\x00\x00\x00\x00" + struct.pack("<Q", target_addr)  # jmp [rip + 0]; dq target_addr
+    return "\xe9" + struct.pack("<i", relative_offset(target_addr, here + 5, bitness))
+
+
+def relative_offset(target_addr, next_addr, bitness):
+    """The 32 bits offset to ``target_addr`` of a relative instruction that ends at ``next_addr``"""
+    offset = target_addr - next_addr
+    if bitness == 32:
+        # Addresses wrap in 32 bits
+        offset = ((offset + 0x80000000) & 0xffffffff) - 0x80000000
+    if not -0x80000000 <= offset <= 0x7fffffff:
+        raise RelocationError("Cannot reach {0:#x} from {1:#x} with a 32 bits offset".format(target_addr, next_addr))
+    return offset
+
+
+def is_end_of_flow(layout):
+    if layout.opcode in end_of_flow_opcodes:
+        return True
+    # jmp / jmp far through a register or memory (FF /4 and FF /5)
+    return layout.opcode == (0xff,) and (layout.modrm >> 3) & 7 in (4, 5)
+
+
+def stolen_instructions(code, min_size, bitness=32):
+    """Return the ``(offset, layout)`` of the first instructions of ``code`` that cover at least ``min_size`` bytes"""
+    instructions = []
+    offset = 0
+    while offset < min_size:
+        try:
+            layout = simple_disasm.decode_layout(code, offset, bitness)
+        except simple_disasm.DecodeError as e:
+            raise RelocationError("Cannot relocate the instruction at offset {0:#x}: {1}".format(offset, e))
+        instructions.append((offset, layout))
+        offset += layout.length
+        if offset < min_size and is_end_of_flow(layout):
+            raise RelocationError("Function is too short to be hooked ({0} bytes before the end of flow)".format(offset))
+    return instructions
+
+
+def relocate_instruction(code, layout, source_addr, dest_addr, bitness, stolen_range):
+    """Return the code of the instruction ``code`` of layout ``layout`` moved from ``source_addr`` to ``dest_addr``
+
+    Relative branches are rewritten with a 32 bits offset (or as absolute branches in 64 bits)
+    so the size of the relocated code does not depend of ``dest_addr``.
+    """
+    code = bytearray(code)
+    if layout.flags & REL:
+        if any(prefix not in branch_hint_prefixes for prefix in bytearray(layout.prefixes)):
+            raise RelocationError("Cannot relocate branch <{0}> with prefixes".format(str(code).encode("hex")))
+        offset = simple_disasm.integer_values(code[layout.imm_offset:layout.imm_offset + layout.imm_size], signed_only=True)[0]
+        target = source_addr + layout.length + offset
+        if bitness == 32:
+            target &= 0xffffffff
+        if stolen_range[0] < target < stolen_range[1]:
+            raise RelocationError("Branch to the relocated instructions at {0:#x}".format(target))
+        opcode = layout.opcode
+        if opcode in [(0xeb,), (0xe9,)]:
+            return absolute_jump(target, bitness, dest_addr)
+        if opcode == (0xe8,):
+            if bitness == 64:
+                # call [rip + 2]; jmp +8; dq target
+                return "\xff\x15\x02\x00\x00\x00\xeb\x08" + struct.pack("<Q", target)
+            return "\xe8" + struct.pack("<i", relative_offset(target, dest_addr + 5, bitness))
+        if 0x70 <= opcode[-1] <= 0x7f or (len(opcode) == 2 and 0x80 <= opcode[1] <= 0x8f):
+            condition = opcode[-1] & 0xf
+            if bitness == 64:
+                # Inverted jcc over an absolute jump
+                return chr(0x70 | (condition ^ 1)) + "\x0e" + absolute_jump(target, bitness, dest_addr + 2)
+            return "\x0f" + chr(0x80 | condition) + struct.pack("<i", relative_offset(target, dest_addr + 6, bitness))
+        raise RelocationError("Cannot relocate branch <{0}>".format(str(code).encode("hex")))
+    if layout.flags & RIP_RELATIVE:
+        disp = simple_disasm.integer_values(code[layout.disp_offset:layout.disp_offset + 4], signed_only=True)[0]
+        target = source_addr + layout.length + disp
+        code[layout.disp_offset:layout.disp_offset + 4] = struct.pack("<i", relative_offset(target, dest_addr + layout.length, bitness))
+    return str(code)
+
+
+def build_trampoline(code, source_addr, dest_addr, min_size, bitness=32):
+    """Relocate the first instructions of ``code`` (located at ``source_addr``) to ``dest_addr``
+
+    :param code: the code at ``source_addr``, at least ``min_size`` + 15 bytes if available
+    :param min_size: the number of bytes to relocate (the size of the detour)
+    :return: ``(trampoline_code, stolen_size)``: the size of the trampoline does not depend of ``dest_addr``
+    """
+    code = bytearray(code)
+    instructions = stolen_instructions(code, min_size, bitness)
+    last_offset, last_layout = instructions[-1]
+    stolen_size = last_offset + last_layout.length
+    stolen_range = (source_addr, source_addr + stolen_size)
+    trampoline = ""
+    for offset, layout in instructions:
+        instr_code = code[offset: offset + layout.length]
+        trampoline += relocate_instruction(instr_code, layout, source_addr + offset, dest_addr + len(trampoline), bitness, stolen_range)
+    trampoline += absolute_jump(source_addr + stolen_size, bitness, dest_addr + len(trampoline))
+    return trampoline, stolen_size
+
+
+def hook_patch(detour, stolen_size):
+    """The bytes that replace the ``stolen_size`` first bytes of a function hooked with ``detour``"""
+    return detour + "\xcc" * (stolen_size - len(detour))
+
+
+def patches_by_pages(patches, page_size=PAGE_SIZE):
+    """Group the ``(addr, data)`` patches by contiguous ranges of pages
+
+    :return: a list of ``(range_addr, range_size, patches)``
+    """
+    ranges = []
+    for addr, data in sorted(patches):
+        start = addr & ~(page_size - 1)
+        end = (addr + len(data) + page_size - 1) & ~(page_size - 1)
+        if ranges and start <= ranges[-1][0] + ranges[-1][1]:
+            range_addr, range_size, range_patches = ranges[-1]
+            ranges[-1] = (range_addr, max(range_size, end - range_addr), range_patches + [(addr, data)])
+        else:
+            ranges.append((start, end - start, [(addr, data)]))
+    return ranges
@@ -1,4 +1,11 @@
+import bisect
 import ctypes
+import hashlib
+import marshal
+import math
+import mmap
+import os
+import struct
 import windows
 import windows.hooks as hooks
 import windows.utils as utils
@@ -10,6 +17,16 @@ import windows.remotectypes as rctypes
 # This must go to windefs
 IMAGE_DIRECTORY_ENTRY_EXPORT = 0
 IMAGE_DIRECTORY_ENTRY_IMPORT = 1
+IMAGE_DIRECTORY_ENTRY_RESOURCE = 2
+IMAGE_DIRECTORY_ENTRY_EXCEPTION = 3
+IMAGE_DIRECTORY_ENTRY_SECURITY = 4
+IMAGE_DIRECTORY_ENTRY_BASERELOC = 5
+IMAGE_DIRECTORY_ENTRY_TLS = 9
+IMAGE_DIRECTORY_ENTRY_IAT = 12
+
+IMAGE_REL_BASED_ABSOLUTE = 0
+IMAGE_REL_BASED_HIGHLOW = 3
+IMAGE_REL_BASED_DIR64 = 10
 
 IMAGE_ORDINAL_FLAG32 = 0x80000000
 IMAGE_ORDINAL_FLAG64 = 0x8000000000000000
@@ -41,7 +58,10 @@ def get_structure_transformer_for_target(target, targetbitness=None):
 def get_pe_bitness(baseaddr, target):
     # We can force bitness as the filed we access are bitness-independant
     pe = GetPEFile(baseaddr, target, force_bitness=32)
-    machine = pe.get_NT_HEADER().FileHeader.Machine
+    return pe_bitness_from_machine(pe.get_NT_HEADER().FileHeader.Machine)
+
+
+def pe_bitness_from_machine(machine):
     if machine == 0x14c:
         return 32
     elif machine == 0x8664:
@@ -406,8 +426,12 @@ def GetPEFile(baseaddr, target=None, force_bitness=None):
     """
     proc_bitness = windows.current_process.bitness
 
+    header_snapshot = None
     if force_bitness is None:
-        targetedbitness = get_pe_bitness(baseaddr, target)
+        # We can force bitness as the filed we access are bitness-independant
+        pe = GetPEFile(baseaddr, target, force_bitness=32)
+        targetedbitness = pe_bitness_from_machine(pe.get_NT_HEADER().FileHeader.Machine)
+        header_snapshot = pe.header_snapshot
     else:
         targetedbitness = force_bitness
 
@@ -415,7 +439,254 @@ def GetPEFile(baseaddr, target=None, force_bitness=None):
     #ctypes_structure_transformer, create_structure_at = transformers
     transfor_funcs = CtypesStructureTransformers(*transformers)  # TODO: rename
 
-    return PEFile(target, baseaddr, targetedbitness, transfor_funcs)
+    pefile = PEFile(target, baseaddr, targetedbitness, transfor_funcs)
+    pefile.header_snapshot = header_snapshot
+    return pefile
+
+
+USE_HEADER_SNAPSHOT = True
+HEADER_SNAPSHOT_SIZE = 0x1000
+
+
+class HeaderSnapshot(object):
+    """The first page of a PE (headers and section table) read at once from ``target``.
+
+    Used as the target of the header structures of a remote :class:`PEFile`:
+    the reads outside of the snapshot go to ``target``.
+    """
+    def __init__(self, target, baseaddr, size=HEADER_SNAPSHOT_SIZE):
+        self.target = target
+        self.baseaddr = baseaddr
+        self.data = target.read_memory(baseaddr, size)
+
+    def read_memory(self, addr, size):
+        offset = addr - self.baseaddr
+        if 0 <= offset and offset + size <= len(self.data):
+            return self.data[offset: offset + size]
+        return self.target.read_memory(addr, size)
+
+    def read_string(self, addr):
+        offset = addr - self.baseaddr
+        if 0 <= offset < len(self.data):
+            end = self.data.find("\x00", offset)
+            if end != -1:
+                return self.data[offset: end]
+        return self.target.read_string(addr)
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+class ImageSnapshot(HeaderSnapshot):
+    """A copy of the whole image of a PE (``SizeOfImage`` bytes) read from ``target`` by ``regions``.
+
+    Used as the target of :meth:`PEFile.snapshot`: only the reads outside of the image go to ``target``.
+    """
+    def __init__(self, target, baseaddr, size, regions):
+        self.target = target
+        self.baseaddr = baseaddr
+        # The pages between the regions (not mapped) are zeros
+        data = bytearray(size)
+        for rva, region_size in regions:
+            data[rva: rva + region_size] = target.read_memory(baseaddr + rva, region_size)
+        self.data = str(data)
+
+
+Patch = collections.namedtuple("Patch", ["addr", "original", "current"])
+
+PATCH_COMPARE_SIZE = 0x1000
+
+
+class PEFileBuffer(object):
+    """A PE file (as stored on disk) that can be used as the ``target`` of a :class:`PEFile`.
+
+    The addresses read are ``baseaddr + RVA`` and are translated to file offsets with the section table.
+    ``data`` is a :class:`str`, a :class:`bytearray` or a :class:`mmap.mmap` and is never copied as a whole:
+    the header fields are unpacked in place and a read copies only the bytes it returns.
+    """
+    def __init__(self, data, baseaddr=None):
+        self.data = data
+        try:
+            self.view = memoryview(data)
+        except TypeError:  # Python2 mmap only has the old buffer interface
+            self.view = None
+        if self.slice(0, 2) != "MZ":
+            raise ValueError("Not a PE file (no MZ signature)")
+        e_lfanew, = self.unpack("<I", 0x3c)
+        if self.slice(e_lfanew, 4) != "PE\x00\x00":
+            raise ValueError("Not a PE file (no PE signature at {0:#x})".format(e_lfanew))
+        self.machine, nb_sections = self.unpack("<HH", e_lfanew + 4)
+        size_of_optional_header, = self.unpack("<H", e_lfanew + 20)
+        opt_header_offset = e_lfanew + 24
+        magic, = self.unpack("<H", opt_header_offset)
+        if magic == 0x10b:
+            self.bitness = 32
+            image_base, = self.unpack("<I", opt_header_offset + 28)
+        elif magic == 0x20b:
+            self.bitness = 64
+            image_base, = self.unpack("<Q", opt_header_offset + 24)
+        else:
+            raise ValueError("Unknow PE OptionalHeader magic <0x{0:x}>".format(magic))
+        # Offsets of the fields skipped by the Authenticode digest
+        self.checksum_offset = opt_header_offset + 64
+        data_directory_offset = opt_header_offset + (96 if self.bitness == 32 else 112)
+        nb_data_directory, = self.unpack("<I", data_directory_offset - 4)
+        if nb_data_directory > IMAGE_DIRECTORY_ENTRY_SECURITY:
+            self.security_entry_offset = data_directory_offset + 8 * IMAGE_DIRECTORY_ENTRY_SECURITY
+        else:
+            self.security_entry_offset = None
+        section_alignment, = self.unpack("<I", opt_header_offset + 32)
+        self.size_of_headers, = self.unpack("<I", opt_header_offset + 60)
+        # The loader maps the headers and the sections up to the section alignment (the rest is zeros)
+        align = lambda size: (size + section_alignment - 1) & ~(section_alignment - 1) if section_alignment else size
+        self.headers_virtual_size = align(self.size_of_headers)
+        self.baseaddr = image_base if baseaddr is None else baseaddr
+        # (VirtualAddress, mapped size, PointerToRawData, SizeOfRawData) of each section as mapped by the loader:
+        # the VirtualSize (SizeOfRawData if 0) aligned, the file bytes after the mapped size are not mapped
+        # and PointerToRawData is rounded down to 0x200
+        self.sections = []
+        section_offset = opt_header_offset + size_of_optional_header
+        for i in range(nb_sections):
+            virtual_size, virtual_address, raw_size, raw_offset = self.unpack("<IIII", section_offset + 40 * i + 8)
+            mapped_size = align(virtual_size or raw_size)
+            self.sections.append((virtual_address, mapped_size, raw_offset & ~0x1ff, min(raw_size, mapped_size)))
+
+    @classmethod
+    def from_file(cls, filename, baseaddr=None):
+        """Map the file ``filename`` (read only)"""
+        with open(filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data, baseaddr)
+
+    def slice(self, offset, size):
+        """The bytes at ``offset`` in the file (a :class:`str`: the only copy of these bytes)"""
+        if self.view is None:
+            return self.data[offset: offset + size]
+        return self.view[offset: offset + size].tobytes()
+
+    def unpack(self, format, offset):
+        """:func:`struct.unpack` the bytes at ``offset`` in the file without copying them"""
+        return struct.unpack_from(format, self.data if self.view is None else self.view, offset)
+
+    def rva_to_offset(self, rva):
+        """The file offset of ``rva``"""
+        return self.region(rva)[0]
+
+    def region(self, rva):
+        """Return ``(offset, raw_size, virtual_size)``: the file offset of ``rva``,
+        the number of bytes of its section after it in the file and in memory"""
+        for virtual_address, virtual_size, raw_offset, raw_size in self.sections:
+            if virtual_address <= rva < virtual_address + virtual_size:
+                delta = rva - virtual_address
+                return raw_offset + delta, max(raw_size - delta, 0), virtual_size - delta
+        if rva < self.headers_virtual_size:
+            return rva, max(self.size_of_headers - rva, 0), self.headers_virtual_size - rva
+        raise ValueError("RVA <0x{0:x}> is not in the PE file".format(rva))
+
+    def read_memory(self, addr, size):
+        res = []
+        rva = addr - self.baseaddr
+        while size > 0:
+            offset, raw_size, virtual_size = self.region(rva)
+            chunk = self.slice(offset, min(size, raw_size))
+            # The part of a section that is not in the file (.bss) is zeros
+            chunk += "\x00" * (min(size, virtual_size) - len(chunk))
+            res.append(chunk)
+            rva += len(chunk)
+            size -= len(chunk)
+        return "".join(res)
+
+    def read_string(self, addr):
+        offset, raw_size, virtual_size = self.region(addr - self.baseaddr)
+        end = self.data.find("\x00", offset, offset + raw_size)
+        if end == -1:
+            end = offset + raw_size
+        return self.slice(offset, end - offset)
+
+    def authenticode_ranges(self):
+        """The ``(offset, size)`` ranges of the file hashed by Authenticode: all the file but the ``CheckSum``,
+        the certificate table entry of the data directory and the certificate table (its offset is a file offset)"""
+        excluded = [(self.checksum_offset, 4)]
+        if self.security_entry_offset is not None:
+            excluded.append((self.security_entry_offset, 8))
+            cert_offset, cert_size = self.unpack("<II", self.security_entry_offset)
+            if cert_size:
+                excluded.append((cert_offset, cert_size))
+        ranges = []
+        offset = 0
+        for start, size in sorted(excluded):
+            ranges.append((offset, start - offset))
+            offset = max(offset, start + size)
+        ranges.append((offset, len(self.data) - offset))
+        return [(offset, size) for offset, size in ranges if size > 0]
+
+
+AUTHENTICODE_CHUNK_SIZE = 0x100000
+
+
+def authenticode_digest(filename, algorithm="sha1"):
+    """Return the Authenticode digest (:class:`str`) of the file ``filename`` without the Windows API.
+
+    ``algorithm`` is a :mod:`hashlib` algorithm name: ``sha1`` is the hash of :func:`windows.wintrust.get_file_hash`.
+    A file that is not a PE is hashed as a whole. Return ``None`` for an empty file.
+    """
+    with open(filename, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        try:
+            ranges = PEFileBuffer(data).authenticode_ranges()
+        except (ValueError, struct.error):
+            ranges = [(0, len(data))]
+        digest = hashlib.new(algorithm)
+        for offset, size in ranges:
+            end = offset + size
+            for chunk in range(offset, end, AUTHENTICODE_CHUNK_SIZE):
+                digest.update(data[chunk: min(chunk + AUTHENTICODE_CHUNK_SIZE, end)])
+        return digest.digest()
+    finally:
+        data.close()
+
+
+def _authenticode_digest_job(job):
+    filename, algorithm = job
+    return filename, authenticode_digest(filename, algorithm)
+
+
+def authenticode_digests(filenames, algorithm="sha1", processes=None):
+    """Return ``{filename: digest}``: the :func:`authenticode_digest` of ``filenames`` computed
+    by a pool of ``processes`` processes (default is the number of CPUs, ``1`` computes them in the current process)"""
+    jobs = [(filename, algorithm) for filename in filenames]
+    if processes == 1:
+        return dict(_authenticode_digest_job(job) for job in jobs)
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        return dict(pool.imap_unordered(_authenticode_digest_job, jobs, chunksize=4))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def GetPEFileFromData(data, baseaddr=None):
+    """Returns a :class:`PEFile` to explore the PE file in ``data`` (:class:`str`, :class:`bytearray` or :class:`mmap.mmap`).
+
+    The addresses of the :class:`PEFile` are relative to ``baseaddr`` (default is the ``ImageBase`` of the PE)
+
+    :rtype: :class:`PEFile`
+    """
+    target = PEFileBuffer(data, baseaddr)
+    return GetPEFile(target.baseaddr, target, force_bitness=target.bitness)
+
+
+def GetPEFileFromPath(filename, baseaddr=None):
+    """Returns a :class:`PEFile` to explore the PE file ``filename`` without loading it (the file is mapped read only).
+
+    :rtype: :class:`PEFile`
+    """
+    target = PEFileBuffer.from_file(filename, baseaddr)
+    return GetPEFile(target.baseaddr, target, force_bitness=target.bitness)
 
 
 class THUNK_DATA(ctypes.Union):
@@ -437,6 +708,101 @@ def get_string(target, addr):
     return target.read_string(addr)
 
 
+def read_memory(target, addr, size):
+    if target is None:
+        return ctypes.string_at(addr, size)
+    return target.read_memory(addr, size)
+
+
+IMPORT_CHUNK_SIZE = 0x1000
+
+
+class ChunkReader(object):
+    """Reads of ``target`` by aligned chunks (one page by default): the small reads in a same chunk cost one read.
+
+    The chunks are cut at ``end`` (the end of the image): nothing may be mapped after it."""
+    def __init__(self, target, end=None, chunk_size=IMPORT_CHUNK_SIZE):
+        self.target = target
+        self.end = end
+        self.chunk_size = chunk_size
+        self.chunks = {}
+
+    def chunk(self, chunk_addr):
+        try:
+            return self.chunks[chunk_addr]
+        except KeyError:
+            size = self.chunk_size
+            if self.end is not None:
+                if chunk_addr >= self.end:
+                    raise ValueError("Read at <{0:#x}> past the end of the image <{1:#x}>".format(chunk_addr, self.end))
+                size = min(size, self.end - chunk_addr)
+            data = read_memory(self.target, chunk_addr, size)
+            self.chunks[chunk_addr] = data
+            return data
+
+    def read(self, addr, size):
+        res = []
+        while size > 0:
+            chunk_addr = addr & ~(self.chunk_size - 1)
+            data = self.chunk(chunk_addr)[addr - chunk_addr: addr - chunk_addr + size]
+            if not data:
+                raise ValueError("Read at <{0:#x}> past the end of the image <{1:#x}>".format(addr, self.end))
+            res.append(data)
+            addr += len(data)
+            size -= len(data)
+        return "".join(res)
+
+    def read_string(self, addr):
+        res = []
+        while True:
+            chunk_addr = addr & ~(self.chunk_size - 1)
+            data = self.chunk(chunk_addr)
+            end = data.find("\x00", addr - chunk_addr)
+            if end != -1:
+                res.append(data[addr - chunk_addr: end])
+                return "".join(res)
+            res.append(data[addr - chunk_addr:])
+            addr = chunk_addr + self.chunk_size
+
+    def iter_values(self, addr, format, size):
+        """Yield the values of the array of ``format`` at ``addr`` up to the first ``0``"""
+        while True:
+            chunk_addr = addr & ~(self.chunk_size - 1)
+            data = self.chunk(chunk_addr)
+            for offset in range(addr - chunk_addr, len(data) - size + 1, size):
+                value, = struct.unpack_from(format, data, offset)
+                if not value:
+                    return
+                yield value
+            addr = chunk_addr + self.chunk_size
+
+
+USE_NUMPY = True
+
+
+def byte_histogram(data):
+    """Return the number of occurrences of each byte value in ``data`` (a list of 256 :class:`int`).
+
+    Counted with ``numpy.bincount`` if :mod:`numpy` is available (and :data:`USE_NUMPY`) else with ``str.count``
+    """
+    if USE_NUMPY:
+        try:
+            import numpy
+        except ImportError:
+            pass
+        else:
+            return numpy.bincount(numpy.frombuffer(data, dtype=numpy.uint8), minlength=256).tolist()
+    return [data.count(chr(byte)) for byte in range(256)]
+
+
+def histogram_entropy(histogram):
+    """Return the Shannon entropy in bits by byte (from ``0.0`` to ``8.0``) of the data of ``histogram``"""
+    size = float(sum(histogram))
+    if not size:
+        return 0.0
+    return sum(count / size * math.log(size / count, 2) for count in histogram if count)
+
+
 class PESection(IMAGE_SECTION_HEADER):
 
     @property
@@ -453,15 +819,34 @@ class PESection(IMAGE_SECTION_HEADER):
     def size(self):
         return self.VirtualSize
 
+    @property
+    def data(self):
+        """The content of the section in the image (read at once)"""
+        return read_memory(self.target, self.start, self.VirtualSize or self.SizeOfRawData)
+
+    @utils.fixedpropety
+    def histogram(self):
+        """The number of occurrences of each byte value in the section (see :func:`byte_histogram`)
+
+            :type: [:class:`int`]"""
+        return byte_histogram(self.data)
+
+    @utils.fixedpropety
+    def entropy(self):
+        """The Shannon entropy of the section in bits by byte (from ``0.0`` to ``8.0``)
+
+            :type: :class:`float`"""
+        return histogram_entropy(self.histogram)
+
     def __repr__(self):
         return "<PESection \"{0}\">".format(self.name)
 
 
     @classmethod
     def create(cls, pefile, addr):
-        self = pefile.transformers.create_structure_at(cls, addr)
+        self = pefile.create_header_structure_at(cls, addr)
         self.baseaddr = pefile.baseaddr
-        self.target = pefile.target
+        self.target = pefile.header_target
         return self
 
 
@@ -488,7 +873,7 @@ class IATEntry(ctypes.Structure):
     def __repr__(self):
         return '<{0} "{1}" ordinal {2}>'.format(self.__class__.__name__, self.name, self.ord)
 
-    def set_hook(self, callback, types=None):
+    def set_hook(self, callback, types=None, native_filter=None):
         """Setup a hook on the entry and return it.
         You MUST keep a reference to the hook while the hook is enabled.
 
@@ -498,6 +883,8 @@ class IATEntry(ctypes.Structure):
 
                 see :ref:`hook_protocol`
 
+        :param native_filter: a :class:`windows.hooks.NativeFilter`: only the matching calls call the hook
+
         :rtype: :class:`windows.hooks.IATHook`
 
         .. warning::
@@ -507,7 +894,7 @@ class IATEntry(ctypes.Structure):
         if self.target is not None:
             raise NotImplementedError("Setting hook in remote process (use python code injection)")
 
-        hook = hooks.IATHook(self, callback, types)
+        hook = hooks.IATHook(self, callback, types, native_filter)
         self.hook = hook
         hook.enable()
         return hook
@@ -562,31 +949,227 @@ class IMAGE_IMPORT_DESCRIPTOR(IMAGE_IMPORT_DESCRIPTOR): # TODO: use explicite na
         self.target = pefile.target
         return self
 
+ExportEntry = collections.namedtuple("ExportEntry", ["nb", "addr", "name", "forward"])
+
+
 class IMAGE_EXPORT_DIRECTORY(IMAGE_EXPORT_DIRECTORY): # TODO: use explicite name winstructs._IMAGE_EXPORT_DIRECTORY
     def get_exports(self):
-        NameOrdinals = self.transformers.create_structure_at((WORD * self.NumberOfNames), self.AddressOfNameOrdinals + self.baseaddr)
-        NameOrdinals = list(NameOrdinals)
-        Functions = self.transformers.create_structure_at((DWORD * self.NumberOfFunctions), self.AddressOfFunctions + self.baseaddr)
-        Names = self.transformers.create_structure_at((DWORD * self.NumberOfNames), self.AddressOfNames + self.baseaddr)
+        """Return a list of ``(nb, addr, name)``: ``name`` is ``None`` for the exports by ordinal only"""
+        return [(entry.nb, entry.addr, entry.name) for entry in self.get_export_entries()]
+
+    def get_export_entries(self):
+        """Return the exports as a list of :class:`ExportEntry`.
+
+        The three arrays of the directory are read at once and the names are
+        extracted from a single read of the export directory range when possible.
+        ``forward`` is the forwarder string (``"DLL.Function"``) of the forwarded exports
+        (whose address is inside the export directory range) and ``None`` otherwise.
+        """
+        nb_functions = self.NumberOfFunctions
+        nb_names = self.NumberOfNames
+        functions = struct.unpack("<{0}I".format(nb_functions), read_memory(self.target, self.baseaddr + self.AddressOfFunctions, 4 * nb_functions))
+        name_rvas = struct.unpack("<{0}I".format(nb_names), read_memory(self.target, self.baseaddr + self.AddressOfNames, 4 * nb_names))
+        name_ordinals = struct.unpack("<{0}H".format(nb_names), read_memory(self.target, self.baseaddr + self.AddressOfNameOrdinals, 2 * nb_names))
+
+        directory_start = self.directory_rva
+        directory_end = directory_start + self.directory_size
+        directory_data = read_memory(self.target, self.baseaddr + directory_start, self.directory_size) if self.directory_size else ""
+
+        def string_at_rva(rva):
+            if directory_start <= rva < directory_end:
+                offset = rva - directory_start
+                end = directory_data.find("\x00", offset)
+                if end != -1:
+                    return directory_data[offset:end]
+            return get_string(self.target, self.baseaddr + rva)
+
+        names_by_ordinal = {}
+        for name_rva, ordinal in zip(name_rvas, name_ordinals):
+            # The first name of an ordinal wins (as the old NameOrdinals.index lookup)
+            if ordinal not in names_by_ordinal:
+                names_by_ordinal[ordinal] = name_rva
         res = []
-        for nb, func in enumerate(Functions):
-            func += self.baseaddr
-            if nb in NameOrdinals:
-                name = get_string(self.target, Names[NameOrdinals.index(nb)] + self.baseaddr)
-            else:
-                name = None
-            res.append((nb, func, name))
+        for nb, func in enumerate(functions):
+            name = names_by_ordinal.get(nb)
+            if name is not None:
+                name = string_at_rva(name)
+            forward = None
+            if directory_start <= func < directory_end:
+                forward = string_at_rva(func)
+            res.append(ExportEntry(nb, func + self.baseaddr, name, forward))
         return res
 
     @classmethod
-    def create(cls, pefile, addr):
+    def create(cls, pefile, addr, size=0):
         self = pefile.transformers.create_structure_at(cls, addr)
         self.transformers = pefile.transformers
         self.target = pefile.target
         self.baseaddr = pefile.baseaddr
+        self.directory_rva = addr - pefile.baseaddr
+        self.directory_size = size
         return self
 
 
+class BaseRelocationsView(object):
+    """The base relocations of a PE decoded on demand from the data of the ``BASERELOC`` directory.
+
+    Iterating gives the ``(addr, type)`` of the relocations (without the ``IMAGE_REL_BASED_ABSOLUTE`` padding).
+    """
+    def __init__(self, data, baseaddr):
+        self.data = data
+        self.baseaddr = baseaddr
+        # (page_rva, offset, nb_entries) of the IMAGE_BASE_RELOCATION blocks (sorted by page in a valid PE)
+        self.blocks = []
+        offset = 0
+        while offset + 8 <= len(data):
+            page_rva, block_size = struct.unpack_from("<II", data, offset)
+            if block_size < 8:
+                break
+            self.blocks.append((page_rva, offset + 8, (min(block_size, len(data) - offset) - 8) // 2))
+            offset += block_size
+        self.block_pages = [block[0] for block in self.blocks]
+
+    def iter_block(self, block):
+        page_rva, offset, nb_entries = block
+        for entry in struct.unpack_from("<{0}H".format(nb_entries), self.data, offset):
+            type = entry >> 12
+            if type != IMAGE_REL_BASED_ABSOLUTE:
+                yield self.baseaddr + page_rva + (entry & 0xfff), type
+
+    def __iter__(self):
+        for block in self.blocks:
+            for relocation in self.iter_block(block):
+                yield relocation
+
+    def in_range(self, addr, size):
+        """The ``(addr, type)`` of the relocations in ``[addr, addr + size[`` (only the blocks of these pages are decoded)"""
+        start_rva = addr - self.baseaddr
+        first = bisect.bisect_right(self.block_pages, start_rva & ~0xfff) - 1
+        res = []
+        for block in self.blocks[max(first, 0):]:
+            if block[0] >= start_rva + size:
+                break
+            res.extend(relocation for relocation in self.iter_block(block) if addr <= relocation[0] < addr + size)
+        return res
+
+    def __repr__(self):
+        return "<{0} of {1} blocks>".format(type(self).__name__, len(self.blocks))
+
+
+RuntimeFunction = collections.namedtuple("RuntimeFunction", ["begin", "end", "unwind_info"])
+
+
+class RuntimeFunctionsView(object):
+    """The ``RUNTIME_FUNCTION`` of the ``EXCEPTION`` directory (``.pdata`` of a x64 PE) decoded on demand.
+
+    The entries are sorted by address: :func:`find` is a binary search.
+    """
+    entry_size = 12
+
+    def __init__(self, data, baseaddr):
+        self.data = data
+        self.baseaddr = baseaddr
+
+    def __len__(self):
+        return len(self.data) // self.entry_size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RuntimeFunctionsView index out of range")
+        begin, end, unwind_info = struct.unpack_from("<III", self.data, index * self.entry_size)
+        return RuntimeFunction(self.baseaddr + begin, self.baseaddr + end, self.baseaddr + unwind_info)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def find(self, addr):
+        """The :class:`RuntimeFunction` that contains ``addr`` or ``None``"""
+        rva = addr - self.baseaddr
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            begin, end = struct.unpack_from("<II", self.data, middle * self.entry_size)
+            if rva < begin:
+                high = middle
+            elif rva >= end:
+                low = middle + 1
+            else:
+                return self[middle]
+        return None
+
+    def __repr__(self):
+        return "<{0} of {1} functions>".format(type(self).__name__, len(self))
+
+
+ResourceData = collections.namedtuple("ResourceData", ["addr", "size", "codepage"])
+
+
+class ResourceDirectoryView(object):
+    """A directory of the resource tree decoded on demand from the data of the ``RESOURCE`` directory.
+
+    The keys are the ids (:class:`int`) and names (:class:`unicode`) of the entries, the values are
+    :class:`ResourceDirectoryView` for the subdirectories and :class:`ResourceData` for the leaves.
+    """
+    def __init__(self, data, baseaddr, offset=0):
+        self.data = data
+        self.baseaddr = baseaddr
+        self.offset = offset
+
+    def __len__(self):
+        nb_named, nb_ids = struct.unpack_from("<HH", self.data, self.offset + 12)
+        return nb_named + nb_ids
+
+    def iter_entries(self):
+        """Yield the ``(key, offset)`` of the entries: ``offset`` has the high bit set for a subdirectory"""
+        for i in range(len(self)):
+            name, offset = struct.unpack_from("<II", self.data, self.offset + 16 + 8 * i)
+            if name & 0x80000000:
+                name_offset = name & 0x7fffffff
+                length, = struct.unpack_from("<H", self.data, name_offset)
+                name = self.data[name_offset + 2: name_offset + 2 + 2 * length].decode("utf-16-le")
+            yield name, offset
+
+    def child(self, offset):
+        if offset & 0x80000000:
+            return ResourceDirectoryView(self.data, self.baseaddr, offset & 0x7fffffff)
+        rva, size, codepage = struct.unpack_from("<III", self.data, offset)
+        return ResourceData(self.baseaddr + rva, size, codepage)
+
+    def keys(self):
+        return [key for key, offset in self.iter_entries()]
+
+    def items(self):
+        return [(key, self.child(offset)) for key, offset in self.iter_entries()]
+
+    def __getitem__(self, key):
+        for entry_key, offset in self.iter_entries():
+            if entry_key == key:
+                return self.child(offset)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def iter_leaves(self, path=()):
+        """Yield the ``(path, ResourceData)`` of all the resources (``path`` is ``(type, name, language)``)"""
+        for key, offset in self.iter_entries():
+            child = self.child(offset)
+            if isinstance(child, ResourceDirectoryView):
+                for leaf in child.iter_leaves(path + (key,)):
+                    yield leaf
+            else:
+                yield path + (key,), child
+
+    def __repr__(self):
+        return "<{0} {1}>".format(type(self).__name__, self.keys())
+
+
 class IMAGE_DOS_HEADER(ctypes.Structure):
     _fields_ = [
         ("e_magic", CHAR * 2),
@@ -623,20 +1206,42 @@ class PEFile(object):
             self.IMAGE_ORDINAL_FLAG = IMAGE_ORDINAL_FLAG32
         else:
             self.IMAGE_ORDINAL_FLAG = IMAGE_ORDINAL_FLAG64
+        self.header_snapshot = None
 
     def get_string(self, addr):
         if self.target is None:
             return ctypes.c_char_p(addr).value
         return self.target.read_string(addr)
 
+    @property
+    def header_target(self):
+        """The target of the header structures: a :class:`HeaderSnapshot` of the first page for a remote PE"""
+        # The reads of a PEFileBuffer or an ImageSnapshot are already local
+        if self.target is None or isinstance(self.target, (PEFileBuffer, ImageSnapshot)) or not USE_HEADER_SNAPSHOT:
+            return self.target
+        if self.header_snapshot is None:
+            self.header_snapshot = HeaderSnapshot(self.target, self.baseaddr)
+        return self.header_snapshot
+
+    def create_header_structure_at(self, structcls, addr):
+        target = self.header_target
+        if target is self.target:
+            return self.transformers.create_structure_at(structcls, addr)
+        return self.transformers.ctypes_structure_transformer(structcls)(addr, target)
+
+    def refresh_headers(self):
+        """Forget the snapshot of the headers and the sections: they are read again at the next query"""
+        self.header_snapshot = None
+        self.__dict__.pop("_sections", None)
+
     def get_DOS_HEADER(self):
-        return self.transformers.create_structure_at(IMAGE_DOS_HEADER, self.baseaddr)
+        return self.create_header_structure_at(IMAGE_DOS_HEADER, self.baseaddr)
 
     def get_NT_HEADER(self):
         offset = self.get_DOS_HEADER().e_lfanew
         if self.bitness == 32:
-            return self.transformers.create_structure_at(IMAGE_NT_HEADERS32, self.baseaddr + offset)
-        return self.transformers.create_structure_at(IMAGE_NT_HEADERS64, self.baseaddr + offset)
+            return self.create_header_structure_at(IMAGE_NT_HEADERS32, self.baseaddr + offset)
+        return self.create_header_structure_at(IMAGE_NT_HEADERS64, self.baseaddr + offset)
 
     def get_OptionalHeader(self):
         return self.get_NT_HEADER().OptionalHeader
@@ -652,7 +1257,7 @@ class PEFile(object):
         else:
             opt_header_addr = self.get_NT_HEADER().OptionalHeader._base_addr
         DataDirectory_addr = opt_header_addr + SizeOfOptionalHeader - ctypes.sizeof(DataDirectory_type)
-        return self.transformers.create_structure_at(DataDirectory_type, DataDirectory_addr)
+        return self.create_header_structure_at(DataDirectory_type, DataDirectory_addr)
 
 
     def get_IMPORT_DESCRIPTORS(self):
@@ -669,11 +1274,11 @@ class PEFile(object):
         return res
 
     def get_EXPORT_DIRECTORY(self):
-        export_directory_rva = self.get_DataDirectory()[IMAGE_DIRECTORY_ENTRY_EXPORT].VirtualAddress
-        if export_directory_rva == 0:
+        export_datadir = self.get_DataDirectory()[IMAGE_DIRECTORY_ENTRY_EXPORT]
+        if export_datadir.VirtualAddress == 0:
             return None
-        export_directory_addr = self.baseaddr + export_directory_rva
-        exp_dir = IMAGE_EXPORT_DIRECTORY.create(self, export_directory_addr)
+        export_directory_addr = self.baseaddr + export_datadir.VirtualAddress
+        exp_dir = IMAGE_EXPORT_DIRECTORY.create(self, export_directory_addr, export_datadir.Size)
         return exp_dir
 
     @utils.fixedpropety
@@ -692,21 +1297,177 @@ class PEFile(object):
         #return list(sections_array)
 
     @utils.fixedpropety
-    def exports(self):
-        """The exports of the PE in a dict. Keys are ordinal (:class:`int`) and name (:class:`str`).
-         The values are the addresses of the exports.
+    def identity(self):
+        """The ``(TimeDateStamp, SizeOfImage, CheckSum, Machine)`` of the PE: its key in the :data:`pe_index`"""
+        nt_header = self.get_NT_HEADER()
+        return (nt_header.FileHeader.TimeDateStamp, nt_header.OptionalHeader.SizeOfImage,
+                nt_header.OptionalHeader.CheckSum, nt_header.FileHeader.Machine)
 
-            :type: {(:class:`int` or :class:`str`) : :class:`int`}"""
-        res = {}
+    def get_export_entries(self):
+        """The exports of the PE as a list of :class:`ExportEntry` (parsed at each call)"""
         exp_dir = self.get_EXPORT_DIRECTORY()
         if exp_dir is None:
-            return res
-        raw_exports = exp_dir.get_exports()
-        for id, rva_addr, rva_name in raw_exports:
-            res[id] = rva_addr
-            if rva_name is not None:
-                res[rva_name] = rva_addr
-        return res
+            return []
+        return exp_dir.get_export_entries()
+
+    def get_export_tables(self):
+        """Return ``(rvas, forwarded)``: the RVAs and the forwarder strings of the exports by ordinal and name"""
+        if USE_PE_INDEX:
+            return pe_index.get_export_tables(self)
+        return export_tables(self.get_export_entries(), self.baseaddr)
+
+    @utils.fixedpropety
+    def exports(self):
+        """The exports of the PE in a read-only mapping (rebased at lookup). Keys are ordinal (:class:`int`)
+         and name (:class:`str`). The values are the addresses of the exports.
+         Use ``dict(pe.exports)`` for a modifiable copy.
+
+            :type: :class:`RebasedExports` {(:class:`int` or :class:`str`) : :class:`int`}"""
+        return RebasedExports(self.get_export_tables()[0], self.baseaddr)
+
+    @utils.fixedpropety
+    def forwarded_exports(self):
+        """The forwarded exports of the PE in a dict. Keys are ordinal (:class:`int`) and name (:class:`str`).
+         The values are the forwarder strings (``"DLL.Function"``).
+
+            :type: {(:class:`int` or :class:`str`) : :class:`str`}"""
+        return dict(self.get_export_tables()[1])
+
+    def read_directory(self, index):
+        """Return the data of the data directory ``index`` (one read) or ``None`` if the PE does not have it"""
+        datadir = self.get_DataDirectory()[index]
+        if not datadir.VirtualAddress or not datadir.Size:
+            return None
+        return read_memory(self.target, self.baseaddr + datadir.VirtualAddress, datadir.Size)
+
+    @utils.fixedpropety
+    def relocations(self):
+        """The base relocations of the PE
+
+            :type: :class:`BaseRelocationsView`"""
+        return BaseRelocationsView(self.read_directory(IMAGE_DIRECTORY_ENTRY_BASERELOC) or "", self.baseaddr)
+
+    @utils.fixedpropety
+    def runtime_functions(self):
+        """The ``RUNTIME_FUNCTION`` of the PE (``.pdata`` of a 64 bits PE)
+
+            :type: :class:`RuntimeFunctionsView`"""
+        return RuntimeFunctionsView(self.read_directory(IMAGE_DIRECTORY_ENTRY_EXCEPTION) or "", self.baseaddr)
+
+    @utils.fixedpropety
+    def resources(self):
+        """The root of the resource tree or ``None``
+
+            :type: :class:`ResourceDirectoryView`"""
+        data = self.read_directory(IMAGE_DIRECTORY_ENTRY_RESOURCE)
+        if data is None:
+            return None
+        return ResourceDirectoryView(data, self.baseaddr)
+
+    @utils.fixedpropety
+    def tls_callbacks(self):
+        """The addresses of the TLS callbacks of the PE
+
+            :type: [:class:`int`]"""
+        data = self.read_directory(IMAGE_DIRECTORY_ENTRY_TLS)
+        if data is None:
+            return []
+        pointer_format, pointer_size = ("<I", 4) if self.bitness == 32 else ("<Q", 8)
+        # StartAddressOfRawData, EndAddressOfRawData, AddressOfIndex, AddressOfCallBacks are VA
+        callbacks_va, = struct.unpack_from(pointer_format, data, 3 * pointer_size)
+        if not callbacks_va:
+            return []
+        # The VA are relative to the ImageBase of the headers (updated by the loader)
+        delta = self.baseaddr - self.get_OptionalHeader().ImageBase
+        reader = ChunkReader(self.target, self.baseaddr + self.get_OptionalHeader().SizeOfImage)
+        return [callback + delta for callback in reader.iter_values(callbacks_va + delta, pointer_format, pointer_size)]
+
+    def snapshot(self):
+        """Return a :class:`PEFile` of the PE parsed from a copy of its whole image (:class:`ImageSnapshot`)
+        read with one read by section: parsing it does not read the target anymore.
+
+        :rtype: :class:`PEFile`
+        """
+        opt_header = self.get_OptionalHeader()
+        size = opt_header.SizeOfImage
+        alignment = opt_header.SectionAlignment or 1
+        align = lambda size: (size + alignment - 1) & ~(alignment - 1)
+        regions = [(0, min(align(opt_header.SizeOfHeaders), size))]
+        for section in self.sections:
+            section_size = align(max(section.VirtualSize, section.SizeOfRawData))
+            regions.append((section.VirtualAddress, min(section_size, size - section.VirtualAddress)))
+        target = self.target if self.target is not None else windows.current_process
+        snapshot = ImageSnapshot(target, self.baseaddr, size, [region for region in regions if region[1] > 0])
+        return GetPEFile(self.baseaddr, snapshot, force_bitness=self.bitness)
+
+    def find_patches(self, filename, sections=None):
+        """Return the :class:`Patch` ``(addr, original, current)`` of the bytes of the image that differ from the PE file ``filename``.
+
+        ``sections`` is a list of section names (default is the sections that are not writable).
+        The file is relocated at :data:`baseaddr` and the Import Address Table (written by the loader) is ignored.
+        The sections are compared by blocks of :data:`PATCH_COMPARE_SIZE` bytes: only the blocks that differ are relocated and diffed.
+        """
+        image = self.target if isinstance(self.target, ImageSnapshot) else self.snapshot().target
+        original = GetPEFileFromPath(filename, self.baseaddr)
+        delta = self.baseaddr - original.get_OptionalHeader().ImageBase
+        iat = self.get_DataDirectory()[IMAGE_DIRECTORY_ENTRY_IAT]
+        iat_start, iat_end = self.baseaddr + iat.VirtualAddress, self.baseaddr + iat.VirtualAddress + iat.Size
+        patches = []
+        for section in self.sections:
+            if sections is None and section.Characteristics & IMAGE_SCN_MEM_WRITE:
+                continue
+            if sections is not None and section.name not in sections:
+                continue
+            section_end = section.start + section.VirtualSize
+            for addr in range(section.start, section_end, PATCH_COMPARE_SIZE):
+                size = min(PATCH_COMPARE_SIZE, section_end - addr)
+                current = image.read_memory(addr, size)
+                expected = original.target.read_memory(addr, size)
+                if current == expected:
+                    continue
+                expected = bytearray(expected)
+                if delta:
+                    self._relocate_block(original, expected, addr, delta)
+                # The IAT is expected to differ from the file
+                for offset in range(max(iat_start, addr) - addr, min(iat_end, addr + size) - addr):
+                    expected[offset] = current[offset]
+                self._diff_block(patches, addr, str(expected), current)
+        return patches
+
+    @staticmethod
+    def _relocate_block(original, block, addr, delta):
+        # The relocated pointers can start before the block
+        for reloc_addr, type in original.relocations.in_range(addr - 7, len(block) + 7):
+            if type == IMAGE_REL_BASED_HIGHLOW:
+                pointer_format, mask = "<I", 0xffffffff
+            elif type == IMAGE_REL_BASED_DIR64:
+                pointer_format, mask = "<Q", 0xffffffffffffffff
+            else:
+                continue
+            pointer_size = struct.calcsize(pointer_format)
+            value, = struct.unpack(pointer_format, original.target.read_memory(reloc_addr, pointer_size))
+            relocated = struct.pack(pointer_format, (value + delta) & mask)
+            for i in range(pointer_size):
+                if 0 <= reloc_addr + i - addr < len(block):
+                    block[reloc_addr + i - addr] = relocated[i]
+
+    @staticmethod
+    def _diff_block(patches, addr, expected, current):
+        offset = 0
+        size = len(current)
+        while offset < size:
+            if expected[offset] == current[offset]:
+                offset += 1
+                continue
+            start = offset
+            while offset < size and expected[offset] != current[offset]:
+                offset += 1
+            # Merge with a patch that ends at the previous block
+            if patches and patches[-1].addr + len(patches[-1].current) == addr + start:
+                last = patches.pop()
+                patches.append(Patch(last.addr, last.original + expected[start: offset], last.current + current[start: offset]))
+            else:
+                patches.append(Patch(addr + start, expected[start: offset], current[start: offset]))
 
     @utils.fixedpropety
     def export_name(self):
@@ -718,6 +1479,58 @@ class PEFile(object):
             return None
         return get_string(self.target, self.baseaddr + exp_dir.Name)
 
+    def iter_imports(self):
+        """Yield the ``(dll_name, name, ord, iat_addr)`` of the imports of the PE.
+
+        The descriptors, the thunk arrays and the names are read by chunks of :data:`IMPORT_CHUNK_SIZE` bytes.
+        As in :class:`IATEntry`: ``ord`` is the hint of the imports by name, ``name`` is ``""`` for the imports
+        by ordinal and ``name`` / ``ord`` are ``"??"`` / ``-1`` if the descriptor has no INT.
+        """
+        import_datadir = self.get_DataDirectory()[IMAGE_DIRECTORY_ENTRY_IMPORT]
+        if import_datadir.VirtualAddress == 0:
+            return
+        reader = ChunkReader(self.target, self.baseaddr + self.get_OptionalHeader().SizeOfImage)
+        if self.bitness == 32:
+            thunk_format, thunk_size = "<I", 4
+        else:
+            thunk_format, thunk_size = "<Q", 8
+        descriptor_addr = self.baseaddr + import_datadir.VirtualAddress
+        while True:
+            # OriginalFirstThunk, TimeDateStamp, ForwarderChain, Name, FirstThunk
+            original_first_thunk, _, _, name_rva, first_thunk = struct.unpack("<5I", reader.read(descriptor_addr, 20))
+            if not first_thunk:
+                return
+            dll_name = reader.read_string(self.baseaddr + name_rva).lower()
+            iat_addr = self.baseaddr + first_thunk
+            if not original_first_thunk:
+                for thunk in reader.iter_values(iat_addr, thunk_format, thunk_size):
+                    yield dll_name, "??", -1, iat_addr
+                    iat_addr += thunk_size
+            else:
+                for thunk in reader.iter_values(self.baseaddr + original_first_thunk, thunk_format, thunk_size):
+                    if thunk & self.IMAGE_ORDINAL_FLAG:
+                        yield dll_name, "", thunk & 0x7fffffff, iat_addr
+                    else:
+                        hint, = struct.unpack("<H", reader.read(self.baseaddr + thunk, 2))
+                        yield dll_name, reader.read_string(self.baseaddr + thunk + 2), hint, iat_addr
+                    iat_addr += thunk_size
+            descriptor_addr += 20
+
+    def parse_import_table(self):
+        """Return the imports as a list of ``(dll_name, [(iat_rva, ord, name)])`` (parsed at each call)"""
+        res = []
+        for dll_name, name, ord, iat_addr in self.iter_imports():
+            if not res or res[-1][0] != dll_name:
+                res.append((dll_name, []))
+            res[-1][1].append((iat_addr - self.baseaddr, ord, name))
+        return res
+
+    def get_import_table(self):
+        """Return the imports as a list of ``(dll_name, [(iat_rva, ord, name)])``"""
+        if USE_PE_INDEX:
+            return pe_index.get_import_table(self)
+        return self.parse_import_table()
+
     # TODO: get imports by parsing other modules exports if no INT
     @utils.fixedpropety
     def imports(self):
@@ -727,14 +1540,125 @@ class PEFile(object):
 
             :type: {:class:`str` : [:class:`IATEntry`]}"""
         res = {}
-        for import_descriptor in self.get_IMPORT_DESCRIPTORS():
-            INT = import_descriptor.get_INT()
-            IAT = import_descriptor.get_IAT()
-            if INT is not None:
-                for iat_entry, (ord, name) in zip(IAT, INT):
-                    # str(name.decode()) -> python2 and python3 compatible for str result
-                    iat_entry.ord = ord
-                    iat_entry.name = str(name.decode()) if name else ""
-            name = get_string(self.target, self.baseaddr + import_descriptor.Name)
-            res.setdefault(name.lower(), []).extend(IAT)
-        return res
\ No newline at end of file
+        for dll_name, entries in self.get_import_table():
+            IAT = [IATEntry.create(self.baseaddr + rva, ord, name, self.target, self.transformers) for rva, ord, name in entries]
+            res.setdefault(dll_name, []).extend(IAT)
+        return res
+
+
+def export_tables(entries, baseaddr):
+    """Return ``(rvas, forwarded)``: the dicts by ordinal and name of the RVAs and forwarder strings of the :class:`ExportEntry`"""
+    rvas = {}
+    forwarded = {}
+    for entry in entries:
+        rva = entry.addr - baseaddr
+        rvas[entry.nb] = rva
+        if entry.name is not None:
+            rvas[entry.name] = rva
+        if entry.forward is not None:
+            forwarded[entry.nb] = entry.forward
+            if entry.name is not None:
+                forwarded[entry.name] = entry.forward
+    return rvas, forwarded
+
+
+class RebasedExports(collections.Mapping):
+    """A read only dict of the addresses of the exports: the RVAs are rebased at lookup"""
+    def __init__(self, rvas, baseaddr):
+        self.rvas = rvas
+        self.baseaddr = baseaddr
+
+    def __getitem__(self, key):
+        return self.baseaddr + self.rvas[key]
+
+    def __contains__(self, key):
+        return key in self.rvas
+
+    def __iter__(self):
+        return iter(self.rvas)
+
+    def __len__(self):
+        return len(self.rvas)
+
+    def __repr__(self):
+        return "<{0} of {1} exports at {2:#x}>".format(type(self).__name__, len(self.rvas), self.baseaddr)
+
+
+USE_PE_INDEX = True
+PE_INDEX_SIZE = 256
+
+
+def identity_string(identity):
+    return "{0:08x}-{1:x}-{2:08x}-{3:04x}".format(*identity)
+
+
+class PEIndex(object):
+    """The export and import tables of the PE by identity (see :data:`PEFile.identity`).
+
+    The tables are stored as RVAs in a LRU and in an optional sqlite file shared by
+    the processes and the runs. Disable it with ``USE_PE_INDEX = False``.
+    """
+    def __init__(self, maxsize=PE_INDEX_SIZE, filename=None):
+        self.cache = utils.LRUCache(maxsize)
+        self.store = None
+        if filename is not None:
+            self.open_store(filename)
+
+    def open_store(self, filename):
+        """Use the sqlite file ``filename`` as the on-disk store (created if needed)"""
+        import sqlite3
+        self.close_store()
+        self.store = sqlite3.connect(filename, check_same_thread=False)
+        with self.store:
+            self.store.execute("CREATE TABLE IF NOT EXISTS pe_index (identity TEXT, kind TEXT, data BLOB, PRIMARY KEY (identity, kind))")
+
+    def close_store(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def get(self, pefile, kind, parse):
+        """The table ``kind`` of ``pefile``: from the LRU, the store or ``parse()``"""
+        timestamp, size_of_image, checksum, machine = pefile.identity
+        if not timestamp and not checksum:
+            # No identity (generated or zeroed headers)
+            return parse()
+        key = (pefile.identity, kind)
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        value = self.load(key)
+        if value is None:
+            value = parse()
+            self.save(key, value)
+        self.cache[key] = value
+        return value
+
+    def load(self, key):
+        if self.store is None:
+            return None
+        identity, kind = key
+        row = self.store.execute("SELECT data FROM pe_index WHERE identity = ? AND kind = ?", (identity_string(identity), kind)).fetchone()
+        if row is None:
+            return None
+        return marshal.loads(str(row[0]))
+
+    def save(self, key, value):
+        if self.store is None:
+            return
+        identity, kind = key
+        with self.store:
+            self.store.execute("INSERT OR REPLACE INTO pe_index VALUES (?, ?, ?)", (identity_string(identity), kind, buffer(marshal.dumps(value))))
+
+    def clear(self):
+        """Forget the tables in memory (the store is unchanged)"""
+        self.cache.clear()
+
+    def get_export_tables(self, pefile):
+        return self.get(pefile, "exports", lambda: export_tables(pefile.get_export_entries(), pefile.baseaddr))
+
+    def get_import_table(self, pefile):
+        return self.get(pefile, "imports", pefile.parse_import_table)
+
+
+pe_index = PEIndex()
@@ -5,6 +5,7 @@ import _ctypes
 import ctypes
 import ctypes.wintypes
 import itertools
+import time
 from _ctypes import _SimpleCData
 
 
@@ -32,6 +33,51 @@ def is_structure_type(x):
 def is_union_type(x):
     return issubclass(x, ctypes.Union)
 
+
+# ## Prefetch ### #
+
+# The first access to a field of a remote structure (or to an item of a remote array) reads the whole object:
+# the next accesses use this local copy until ``refresh()``
+USE_PREFETCH = False
+# Validity of the local copy in seconds (None: until ``refresh()``)
+PREFETCH_TTL = None
+
+
+class RemotePrefetch(object):
+    """A remote structure or array that can be read through a local copy of the whole object (see :data:`USE_PREFETCH`)"""
+    _prefetched = None
+    _prefetch_time = None
+
+    def refresh(self, target=None):
+        """Read the whole object from the target: the next accesses use this copy"""
+        if target is None:
+            target = self._target
+        self._prefetched = target.read_memory(self._base_addr, ctypes.sizeof(type(self)))
+        self._prefetch_time = time.time()
+        return self._prefetched
+
+    def _get_prefetched(self, target):
+        """The local copy (read if needed) or ``None`` if the object is not prefetched"""
+        data = self._prefetched
+        if data is not None and PREFETCH_TTL is not None and time.time() - self._prefetch_time > PREFETCH_TTL:
+            data = None
+        if data is None and (USE_PREFETCH or self._prefetch_time is not None):
+            data = self.refresh(target)
+        return data
+
+    def _read_remote(self, target, offset, size):
+        data = self._get_prefetched(target)
+        if data is None:
+            return target.read_memory(self._base_addr + offset, size)
+        return data[offset: offset + size]
+
+    def _share_prefetched(self, child, offset, size):
+        """Give to ``child`` (a sub-structure or array) its part of our local copy"""
+        if self._prefetched is not None:
+            child._prefetched = self._prefetched[offset: offset + size]
+            child._prefetch_time = self._prefetch_time
+        return child
+
 # ### My types ### #
 
 # # 64bits pointer types # #
@@ -91,48 +137,16 @@ class RemotePtr(RemoteValue):
 class RemoteCCharP(RemotePtr, ctypes.c_char_p):
     @property
     def value(self):
-        base = self.raw_value
-        res = []
-        for i in itertools.count():
-            x = self.target.read_memory(base + (i * 0x100), 0x100)
-            if "\x00" in x:
-                res.append(x.split("\x00", 1)[0])
-                break
-            res.append(x)
-        return "".join(res)
+        # Not at the top: windows.winobject.process imports this module
+        from windows.winobject.process import read_terminated_string
+        return read_terminated_string(self.target, self.raw_value, 1)
 
 
 class RemoteWCharP(RemotePtr, ctypes.c_char_p):
     @property
     def value(self):
-        base = self.raw_value
-        # Simple case where target in a WinProcess
-        try:
-            return self.target.read_wstring(base)
-        except AttributeError as e:
-            pass
-        # Copy of Winprocess.read_wstring if target is a custom object
-        read_size = 0x100
-        readden = 0
-        # I am trying to do something smart here..
-        while True:
-            try:
-                x = self.read_memory(addr + readden, read_size)
-            except winproxy.Kernel32Error as e:
-                if read_size == 2:
-                    raise
-                # handle read_wstring at end of page
-                # Of read failed: read only the half of size
-                # read_size must remain a multiple of 2
-                read_size = read_size / 2
-                continue
-            readden += read_size
-            utf16_chars = ["".join(c) for c in zip(*[iter(x)] * 2)]
-            if "\x00\x00" in utf16_chars:
-                res.extend(utf16_chars[:utf16_chars.index("\x00\x00")])
-                break
-            res.extend(x)
-        return "".join(res).decode('utf16')
+        from windows.winobject.process import read_terminated_string
+        return read_terminated_string(self.target, self.raw_value, 2).decode("utf16")
 
 
 class RemoteStructurePointer(RemotePtr, ctypes.c_void_p):
@@ -154,13 +168,14 @@ class RemoteStructurePointer(RemotePtr, ctypes.c_void_p):
 
 def create_remote_array(subtype, len):
 
-    class RemoteArray(_ctypes.Array):
+    class RemoteArray(RemotePrefetch, _ctypes.Array):
         _length_ = len
         _type_ = subtype
 
         def __init__(self, addr, target):
             self._base_addr = addr
             self.target = target
+            self._target = target
 
         def __getitem__(self, slice):
             if not isinstance(slice, (int, long)):
@@ -172,7 +187,10 @@ def create_remote_array(subtype, len):
             # TODO: do better ?
             class TST(ctypes.Structure):
                 _fields_ = [("TST", subtype)]
-            return RemoteStructure.from_structure(TST)(item_addr, target=self.target).TST
+            item = RemoteStructure.from_structure(TST)(item_addr, target=self.target)
+            if self._get_prefetched(self.target) is not None:
+                self._share_prefetched(item, item_addr - self._base_addr, ctypes.sizeof(subtype))
+            return item.TST
     return RemoteArray
 
 
@@ -292,11 +310,12 @@ type_64_32_translation_table = {
 }
 
 
-class RemoteStructureUnion(object):
+class RemoteStructureUnion(RemotePrefetch):
     """Target is a process object"""
     _reserved_name = ["_target", "_fields_", "_fields_dict_", "_base_addr", "_get_field_by_name",
                       "_get_field_descrptor_by_name", "_handle_field_getattr", "_field_type_to_remote_type",
-                      "__getattribute__", "_fields_"]
+                      "__getattribute__", "_fields_", "_prefetched", "_prefetch_time", "_get_prefetched",
+                      "_read_remote", "_share_prefetched", "refresh"]
 
     _field_type_to_remote_type = {
         ctypes.c_char_p: RemoteCCharP,
@@ -324,7 +343,7 @@ class RemoteStructureUnion(object):
         return getattr(type(self), fieldname)  # ctypes metaclass fill this for us
 
     def _handle_field_getattr(self, ftype, fosset, fsize):
-        s = self._target.read_memory(self._base_addr + fosset, fsize)
+        s = self._read_remote(self._target, fosset, fsize)
         if ftype in self._field_type_to_remote_type:
             return self._field_type_to_remote_type[ftype].from_buffer_with_target(bytearray(s), target=self._target).value
         if issubclass(ftype, _ctypes._Pointer):  # Pointer
@@ -334,13 +353,13 @@ class RemoteStructureUnion(object):
         if issubclass(ftype, RemotePtr32):  # Pointer to remote32 bits process
             return RemoteStructurePointer32.from_buffer_with_target_and_ptr_type(bytearray(s), target=self._target, ptr_type=ftype)
         if issubclass(ftype, RemoteStructureUnion):  # Structure|Union already transfomed in remote
-            return ftype(self._base_addr + fosset, self._target)
+            return self._share_prefetched(ftype(self._base_addr + fosset, self._target), fosset, fsize)
         if issubclass(ftype, ctypes.Structure):  # Structure that must be transfomed
-            return RemoteStructure.from_structure(ftype)(self._base_addr + fosset, self._target)
+            return self._share_prefetched(RemoteStructure.from_structure(ftype)(self._base_addr + fosset, self._target), fosset, fsize)
         if issubclass(ftype, ctypes.Union):  # Union that must be transfomed
-            return RemoteUnion.from_structure(ftype)(self._base_addr + fosset, self._target)
+            return self._share_prefetched(RemoteUnion.from_structure(ftype)(self._base_addr + fosset, self._target), fosset, fsize)
         if issubclass(ftype, _ctypes.Array):  # Arrays
-            return create_remote_array(ftype._type_, ftype._length_)(self._base_addr + fosset, self._target)
+            return self._share_prefetched(create_remote_array(ftype._type_, ftype._length_)(self._base_addr + fosset, self._target), fosset, fsize)
         # Normal types
         # Follow the ctypes usage: if it's not directly inherited from _SimpleCData
         # We do not apply the .value
@@ -17,97 +17,88 @@ CS_32bits = 0x23
 CS_64bits = 0x33
 
 
+# Stubs are assembled once (simple_x86/simple_x64 cache the assembled text)
+# and the addresses ({placeholder}) are patched for each call
+transition64_stub = """
+    call :TOEXEC
+    mov rdx, rax
+    shr rdx, 32
+    retf32  # 32 bits return addr
+    label :TOEXEC
+"""
+
+transition32_stub = """
+    call {cs}, {target}
+    ret
+"""
+
+
 def generate_64bits_execution_stub_from_syswow(x64shellcode):
     """shellcode must NOT end by a ret"""
     current_process = windows.current_process
     if not current_process.is_wow_64:
         raise ValueError("Calling generate_64bits_execution_stub_from_syswow from non-syswow process")
 
-    transition64 = x64.MultipleInstr()
-    transition64 += x64.Call(":TOEXEC")
-    transition64 += x64.Mov("RDX", "RAX")
-    transition64 += x64.Shr("RDX", 32)
-    transition64 += x64.Retf32()  # 32 bits return addr
-    transition64 += x64.Label(":TOEXEC")
-    x64shellcodeaddr = windows.current_process.allocator.write_code(transition64.get_code() + x64shellcode)
-
-    transition =     x86.MultipleInstr()
-    transition +=    x86.Call(CS_64bits, x64shellcodeaddr)
-    transition +=    x86.Ret()
-
-    stubaddr = windows.current_process.allocator.write_code(transition.get_code())
+    x64shellcodeaddr = windows.current_process.allocator.write_code(x64.assemble(transition64_stub) + x64shellcode)
+    transition = x86.assemble(transition32_stub, cs=CS_64bits, target=x64shellcodeaddr)
+    stubaddr = windows.current_process.allocator.write_code(transition)
     exec_stub = ctypes.CFUNCTYPE(ULONG64)(stubaddr)
     return exec_stub
 
 def execute_64bits_code_from_syswow(x64shellcode):
     return generate_64bits_execution_stub_from_syswow(x64shellcode)()
 
-def generate_syswow64_call(target):
-    nb_args = len(target.prototype._argtypes_)
-    target_addr = get_syswow_ntdll_exports()[target.__name__]
-    argument_buffer_len = (nb_args * 8)
-    argument_buffer = windows.current_process.allocator.reserve_size(argument_buffer_len)
-    alignement_information = windows.current_process.allocator.reserve_size(8)
+syswow64_call_templates = {}
+
+def syswow64_call_template(nb_args):
+    """Return the :class:`x64.AssembledCode` of the 64b stub calling a function with ``nb_args`` arguments.
 
+       The placeholders are ``target``, ``alignement_information`` and ``arg0`` ... ``argN`` (address of each argument)
+    """
+    if nb_args in syswow64_call_templates:
+        return syswow64_call_templates[nb_args]
     nb_args_on_stack = max(nb_args - 4, 0)
+    saved_registers = ['RBX', 'RCX', 'RDX', 'RSI', 'RDI', 'R8', 'R9', 'R10', 'R11', 'R12', 'R13']
 
-    code_64b = x64.MultipleInstr()
     # Save registers
-
-    code_64b += x64.Push('RBX')
-    code_64b += x64.Push('RCX')
-    code_64b += x64.Push('RDX')
-    code_64b += x64.Push('RSI')
-    code_64b += x64.Push('RDI')
-    code_64b += x64.Push('R8')
-    code_64b += x64.Push('R9')
-    code_64b += x64.Push('R10')
-    code_64b += x64.Push('R11')
-    code_64b += x64.Push('R12')
-    code_64b += x64.Push('R13')
-
+    code = ["push {0}".format(reg) for reg in saved_registers]
     # Alignment stuff :)
-    code_64b += x64.Mov('RCX', 'RSP')
-    code_64b += x64.And('RCX', 0x0f)
-    code_64b += x64.Mov(x64.deref(alignement_information), 'RCX')
-    code_64b += x64.Sub('RSP', 'RCX')
+    code += ["mov rcx, rsp", "and rcx, 0x0f", "mov [{alignement_information}], rcx", "sub rsp, rcx"]
     # retrieve argument from the argument buffer
-    if nb_args >= 1:
-        code_64b += x64.Mov('RCX', x64.create_displacement(disp=argument_buffer))
-    if nb_args >= 2:
-        code_64b += x64.Mov('RDX', x64.create_displacement(disp=argument_buffer + (8 * 1)))
-    if nb_args >= 3:
-        code_64b += x64.Mov('R8', x64.create_displacement(disp=argument_buffer + (8 * 2)))
-    if nb_args >= 4:
-        code_64b += x64.Mov('R9', x64.create_displacement(disp=argument_buffer + (8 * 3)))
+    for i, reg in enumerate(['RCX', 'RDX', 'R8', 'R9'][:nb_args]):
+        code.append("mov {0}, [{{arg{1}}}]".format(reg, i))
     for i in range(nb_args_on_stack):
-        code_64b += x64.Mov('RAX',  x64.create_displacement(disp=argument_buffer + 8 * (nb_args - 1 - i)))
-        code_64b += x64.Push('RAX')
+        code += ["mov rax, [{{arg{0}}}]".format(nb_args - 1 - i), "push rax"]
     # reserve space for register (calling convention)
-    code_64b += x64.Push('R9')
-    code_64b += x64.Push('R8')
-    code_64b += x64.Push('RDX')
-    code_64b += x64.Push('RCX')
+    code += ["push r9", "push r8", "push rdx", "push rcx"]
     # Call
-    code_64b += x64.Mov('R13', target_addr)
-    code_64b += x64.Call('R13')
+    code += ["mov r13, {target}", "call r13"]
     # Realign stack :)
-    code_64b += x64.Add('RSP', x64.deref(alignement_information))
+    code.append("add rsp, [{alignement_information}]")
     # Clean stack
-    code_64b += x64.Add('RSP', (4 + nb_args_on_stack) * 8)
-    code_64b += x64.Pop('R13')
-    code_64b += x64.Pop('R12')
-    code_64b += x64.Pop('R11')
-    code_64b += x64.Pop('R10')
-    code_64b += x64.Pop('R9')
-    code_64b += x64.Pop('R8')
-    code_64b += x64.Pop('RDI')
-    code_64b += x64.Pop('RSI')
-    code_64b += x64.Pop('RDX')
-    code_64b += x64.Pop('RCX')
-    code_64b += x64.Pop('RBX')
-    code_64b += x64.Ret()
-    return try_generate_stub_target(code_64b.get_code(), argument_buffer, target)
+    code.append("add rsp, {0}".format((4 + nb_args_on_stack) * 8))
+    code += ["pop {0}".format(reg) for reg in reversed(saved_registers)]
+    code.append("ret")
+
+    template = x64.assemble_template("\n".join(code))
+    syswow64_call_templates[nb_args] = template
+    return template
+
+
+def generate_syswow64_call_code(nb_args, target_addr, argument_buffer, alignement_information):
+    """Return the 64b stub calling ``target_addr`` with the ``nb_args`` arguments stored at ``argument_buffer``"""
+    arguments_addr = dict(("arg{0}".format(i), argument_buffer + (8 * i)) for i in range(nb_args))
+    return syswow64_call_template(nb_args).patch(target=target_addr, alignement_information=alignement_information, **arguments_addr)
+
+
+def generate_syswow64_call(target):
+    nb_args = len(target.prototype._argtypes_)
+    target_addr = get_syswow_ntdll_exports()[target.__name__]
+    argument_buffer_len = (nb_args * 8)
+    argument_buffer = windows.current_process.allocator.reserve_size(argument_buffer_len)
+    alignement_information = windows.current_process.allocator.reserve_size(8)
+    code = generate_syswow64_call_code(nb_args, target_addr, argument_buffer, alignement_information)
+    return try_generate_stub_target(code, argument_buffer, target)
 
 
 def try_generate_stub_target(shellcode, argument_buffer, target):
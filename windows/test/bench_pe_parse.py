@@ -0,0 +1,151 @@
+"""Benchmark of the export and import tables parsing of pe_parse
+
+Usage: python bench_pe_parse.py [NB_EXPORTS]
+
+Build a synthetic PE with ``NB_EXPORTS`` exports (1/4 by ordinal only, 1/16 forwarded)
+in a buffer of the current process and print the time of :meth:`IMAGE_EXPORT_DIRECTORY.get_export_entries`
+and of the old quadratic parsing (``nb in NameOrdinals`` / ``NameOrdinals.index``) on the same table.
+
+Then enumerate the imports of the loaded modules through a target that counts the reads
+with :meth:`PEFile.iter_imports` and with the ``THUNK_DATA`` by ``THUNK_DATA`` walk of ``get_INT`` / ``get_IAT``.
+"""
+import sys
+import time
+import ctypes
+import struct
+
+import windows
+import windows.pe_parse as pe_parse
+from windows.generated_def.winstructs import *
+
+
+def build_synthetic_pe(nb_exports):
+    """Return a ctypes buffer with the headers and an export directory of ``nb_exports`` functions"""
+    bitness = windows.current_process.bitness
+    nt_header_type = IMAGE_NT_HEADERS32 if bitness == 32 else IMAGE_NT_HEADERS64
+    e_lfanew = 0x80
+    export_dir_rva = 0x1000
+    exported = [nb for nb in range(nb_exports) if nb % 4]
+    names = ["SyntheticExport{0:06d}".format(nb) for nb in exported]
+    # The name pointer table is sorted by name
+    functions_rva = export_dir_rva + ctypes.sizeof(IMAGE_EXPORT_DIRECTORY)
+    names_rva = functions_rva + 4 * nb_exports
+    ordinals_rva = names_rva + 4 * len(names)
+    strings_rva = ordinals_rva + 2 * len(names)
+
+    strings = "synthetic.dll\x00"
+    name_rvas = []
+    for name in names:
+        name_rvas.append(strings_rva + len(strings))
+        strings += name + "\x00"
+    functions = []
+    for nb in range(nb_exports):
+        if nb % 16 == 1:
+            functions.append(strings_rva + len(strings))
+            strings += "NTDLL.Forwarded{0}\x00".format(nb)
+        else:
+            functions.append(0x100000 + nb * 0x10)
+    export_dir_size = strings_rva + len(strings) - export_dir_rva
+
+    buf = ctypes.create_string_buffer(export_dir_rva + export_dir_size)
+    base = ctypes.addressof(buf)
+    dos_header = pe_parse.IMAGE_DOS_HEADER.from_address(base)
+    dos_header.e_magic = "MZ"
+    dos_header.e_lfanew = e_lfanew
+    nt_header = nt_header_type.from_address(base + e_lfanew)
+    nt_header.FileHeader.Machine = 0x14c if bitness == 32 else 0x8664
+    nt_header.FileHeader.SizeOfOptionalHeader = ctypes.sizeof(nt_header.OptionalHeader)
+    datadir = nt_header.OptionalHeader.DataDirectory[pe_parse.IMAGE_DIRECTORY_ENTRY_EXPORT]
+    datadir.VirtualAddress = export_dir_rva
+    datadir.Size = export_dir_size
+    export_dir = IMAGE_EXPORT_DIRECTORY.from_address(base + export_dir_rva)
+    export_dir.Name = strings_rva
+    export_dir.Base = 1
+    export_dir.NumberOfFunctions = nb_exports
+    export_dir.NumberOfNames = len(names)
+    export_dir.AddressOfFunctions = functions_rva
+    export_dir.AddressOfNames = names_rva
+    export_dir.AddressOfNameOrdinals = ordinals_rva
+    struct.pack_into("<{0}I".format(nb_exports), buf, functions_rva, *functions)
+    struct.pack_into("<{0}I".format(len(names)), buf, names_rva, *name_rvas)
+    struct.pack_into("<{0}H".format(len(names)), buf, ordinals_rva, *exported)
+    ctypes.memmove(base + strings_rva, strings, len(strings))
+    return buf
+
+
+def quadratic_get_exports(exp_dir):
+    """The export parsing before the ordinal -> name dict"""
+    NameOrdinals = exp_dir.transformers.create_structure_at((WORD * exp_dir.NumberOfNames), exp_dir.AddressOfNameOrdinals + exp_dir.baseaddr)
+    NameOrdinals = list(NameOrdinals)
+    Functions = exp_dir.transformers.create_structure_at((DWORD * exp_dir.NumberOfFunctions), exp_dir.AddressOfFunctions + exp_dir.baseaddr)
+    Names = exp_dir.transformers.create_structure_at((DWORD * exp_dir.NumberOfNames), exp_dir.AddressOfNames + exp_dir.baseaddr)
+    res = []
+    for nb, func in enumerate(Functions):
+        func += exp_dir.baseaddr
+        if nb in NameOrdinals:
+            name = pe_parse.get_string(exp_dir.target, Names[NameOrdinals.index(nb)] + exp_dir.baseaddr)
+        else:
+            name = None
+        res.append((nb, func, name))
+    return res
+
+
+class CountingTarget(object):
+    """A target that reads the current process as a remote process and counts the reads"""
+    bitness = windows.current_process.bitness
+
+    def __init__(self):
+        self.nb_reads = 0
+
+    def read_memory(self, addr, size):
+        self.nb_reads += 1
+        return ctypes.string_at(addr, size)
+
+    def read_string(self, addr):
+        self.nb_reads += 1
+        return ctypes.c_char_p(addr).value
+
+
+def thunk_by_thunk_imports(pe):
+    """The import parsing before PEFile.iter_imports"""
+    res = []
+    for import_descriptor in pe.get_IMPORT_DESCRIPTORS():
+        INT = import_descriptor.get_INT()
+        IAT = import_descriptor.get_IAT()
+        dll_name = pe_parse.get_string(pe.target, pe.baseaddr + import_descriptor.Name).lower()
+        for iat_entry in IAT:
+            res.append((dll_name, iat_entry.addr))
+    return res
+
+
+def bench_imports():
+    modules = windows.current_process.peb.modules
+    for name, parse in [("THUNK_DATA walk", thunk_by_thunk_imports), ("iter_imports", lambda pe: list(pe.iter_imports()))]:
+        target = CountingTarget()
+        pes = [pe_parse.GetPEFile(module.baseaddr, target) for module in modules]
+        target.nb_reads = 0
+        start = time.time()
+        nb_imports = sum(len(parse(pe)) for pe in pes)
+        duration = time.time() - start
+        print("{0:<24} {1:>8.3f} s {2:>8} reads ({3} imports of {4} modules)".format(name, duration, target.nb_reads, nb_imports, len(pes)))
+
+
+def bench(name, func, nb_exports):
+    start = time.time()
+    result = func()
+    duration = time.time() - start
+    print("{0:<24} {1:>8.3f} s ({2:>10.0f} exports/s)".format(name, duration, nb_exports / duration))
+    return result
+
+
+if __name__ == "__main__":
+    nb_exports = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    buf = build_synthetic_pe(nb_exports)
+    pe = pe_parse.GetPEFile(ctypes.addressof(buf))
+    exp_dir = pe.get_EXPORT_DIRECTORY()
+    print("{0} exports ({1} names)".format(exp_dir.NumberOfFunctions, exp_dir.NumberOfNames))
+    entries = bench("get_export_entries", exp_dir.get_export_entries, nb_exports)
+    old_exports = bench("quadratic get_exports", lambda: quadratic_get_exports(exp_dir), nb_exports)
+    assert [(entry.nb, entry.addr, entry.name) for entry in entries] == old_exports
+    assert len([entry for entry in entries if entry.forward is not None]) == len(range(1, nb_exports, 16))
+    bench_imports()
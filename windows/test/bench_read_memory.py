@@ -0,0 +1,64 @@
+"""Benchmark of the typed reads of WinProcess
+
+Usage: python bench_read_memory.py [NB_READS]
+
+Do ``NB_READS`` :meth:`WinProcess.read_dword` in a fake process whose memory is a local buffer
+with the :class:`windows.winobject.process.ReadArena` and with the old
+``create_string_buffer`` + ``buffer[:]`` + ``struct.unpack`` reads,
+then read 0x100 bytes the same way and into a caller :class:`bytearray`.
+"""
+import sys
+import time
+import ctypes
+import struct
+
+import windows
+from windows.winobject.process import WinProcess
+
+MEMORY_SIZE = 0x10000
+
+
+class FakeProcess(WinProcess):
+    """A process whose memory (addresses 0 - ``MEMORY_SIZE``) is a buffer of the current process"""
+    def __init__(self):
+        super(FakeProcess, self).__init__(pid=0xffffffff, name="fake.exe")
+        self._bitness = windows.current_process.bitness
+        self.memory = ctypes.create_string_buffer("".join(chr(x & 0xff) for x in range(MEMORY_SIZE)), MEMORY_SIZE)
+        self.memory_addr = ctypes.addressof(self.memory)
+
+    def low_read_memory(self, addr, buffer_addr, size):
+        if addr + size > MEMORY_SIZE:
+            raise ValueError("Read outside of the fake process")
+        ctypes.memmove(buffer_addr, self.memory_addr + addr, size)
+
+
+def old_read_memory(process, addr, size):
+    buffer = ctypes.create_string_buffer(size)
+    process.low_read_memory(addr, ctypes.byref(buffer), size)
+    return buffer[:]
+
+
+def old_read_dword(process, addr):
+    return struct.unpack("<I", old_read_memory(process, addr, ctypes.sizeof(ctypes.c_uint32)))[0]
+
+
+def bench(name, func, addrs):
+    start = time.time()
+    for addr in addrs:
+        func(addr)
+    duration = time.time() - start
+    print("{0:<24} {1:>8.3f} s ({2:>10.0f} reads/s)".format(name, duration, len(addrs) / duration))
+
+
+if __name__ == "__main__":
+    nb_reads = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    process = FakeProcess()
+    addrs = [(x * 0x44) % (MEMORY_SIZE - 0x100) for x in range(nb_reads)]
+    assert process.read_dword(0x1234) == old_read_dword(process, 0x1234) == 0x37363534
+    bench("old read_dword", lambda addr: old_read_dword(process, addr), addrs)
+    bench("read_dword", process.read_dword, addrs)
+    bench("old read_memory(0x100)", lambda addr: old_read_memory(process, addr, 0x100), addrs)
+    bench("read_memory(0x100)", lambda addr: process.read_memory(addr, 0x100), addrs)
+    bench("read_memory_arena(0x100)", lambda addr: process.read_memory_arena(addr, 0x100), addrs)
+    buffer = bytearray(0x100)
+    bench("read_memory_into_buffer", lambda addr: process.read_memory_into_buffer(addr, buffer), addrs)
@@ -0,0 +1,61 @@
+"""Benchmark of the byte histogram and entropy of the PE sections
+
+Usage: python bench_section_stats.py [SIZE]
+
+Compute the histogram of synthetic sections of ``SIZE`` bytes (zeros, text, random)
+with :func:`pe_parse.byte_histogram` (``numpy.bincount`` if available and ``str.count``)
+and with :class:`collections.Counter`, then the entropy of the sections of the loaded modules.
+"""
+import os
+import sys
+import time
+import collections
+
+import windows
+import windows.pe_parse as pe_parse
+
+try:
+    import numpy
+    has_numpy = True
+except ImportError:
+    has_numpy = False
+
+
+def counter_histogram(data):
+    counter = collections.Counter(data)
+    return [counter[chr(byte)] for byte in range(256)]
+
+
+def bench(name, func, data):
+    start = time.time()
+    result = func(data)
+    duration = time.time() - start
+    print("{0:<24} {1:>8.3f} s ({2:>8.1f} MB/s)".format(name, duration, len(data) / duration / 0x100000))
+    return result
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 0x1000000
+    sections = [("zeros", "\x00" * size),
+                ("text", ("The quick brown fox jumps over the lazy dog. " * (size // 45 + 1))[:size]),
+                ("random", os.urandom(size))]
+    for name, data in sections:
+        print("{0} ({1:#x} bytes)".format(name, size))
+        methods = [("str.count", False)]
+        if has_numpy:
+            methods.append(("numpy.bincount", True))
+        for method, use_numpy in methods:
+            pe_parse.USE_NUMPY = use_numpy
+            histogram = bench(method, pe_parse.byte_histogram, data)
+        pe_parse.USE_NUMPY = True
+        assert bench("Counter", counter_histogram, data) == histogram
+        print("entropy: {0:.3f}".format(pe_parse.histogram_entropy(histogram)))
+
+    start = time.time()
+    nb_bytes = 0
+    for module in windows.current_process.peb.modules:
+        for section in module.pe.sections:
+            section.entropy
+            nb_bytes += section.size
+    duration = time.time() - start
+    print("Loaded modules: {0:#x} bytes of sections in {1:.3f} s".format(nb_bytes, duration))
@@ -0,0 +1,45 @@
+"""Benchmark of the address -> symbol resolution of windows.debug.Symbolizer
+
+Usage: python bench_symbols.py [NB_LOOKUPS]
+
+Resolve ``NB_LOOKUPS`` random addresses in the modules of the current process
+and in a synthetic PE of 20000 exports (see bench_pe_parse.py) and print the number of lookups by second.
+"""
+import sys
+import time
+import random
+import ctypes
+
+import windows
+import windows.pe_parse as pe_parse
+from windows.debug import Symbolizer
+
+from bench_pe_parse import build_synthetic_pe
+
+
+def bench(name, func, addrs):
+    start = time.time()
+    for addr in addrs:
+        func(addr)
+    duration = time.time() - start
+    print("{0:<24} {1:>8.3f} s ({2:>10.0f} lookups/s)".format(name, duration, len(addrs) / duration))
+
+
+if __name__ == "__main__":
+    nb_lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    buf = build_synthetic_pe(20000)
+    symbolizer = Symbolizer.from_process(windows.current_process)
+    synthetic = pe_parse.GetPEFile(ctypes.addressof(buf))
+    symbolizer.add_module("synthetic.dll", synthetic.baseaddr, 0x100000 + 20000 * 0x10, synthetic)
+    print("{0} modules".format(len(symbolizer)))
+    addrs = []
+    for _ in range(nb_lookups):
+        module = random.choice(symbolizer.modules)
+        addrs.append(module.baseaddr + random.randrange(module.size))
+    # Load the exports of all the modules before the measure
+    for module in symbolizer.modules:
+        module.resolve(module.baseaddr)
+    bench("resolve", symbolizer.resolve, addrs)
+    bench("symbolize", symbolizer.symbolize, addrs)
+    for addr in addrs[:5]:
+        print("{0:#x} -> {1}".format(addr, symbolizer.symbolize(addr)))
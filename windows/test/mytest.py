@@ -1,10 +1,12 @@
 import sys
+import ctypes
 import struct
 import time
 import os
 import textwrap
 import random
 import pickle
+import tempfile
 
 from test_utils import *
 from windows.generated_def.winstructs import *
@@ -102,6 +104,14 @@ class WindowsTestCase(unittest.TestCase):
         k32_base = windows.winproxy.LoadLibraryA("kernel32.dll")
         self.assertEqual(windows.winproxy.GetProcAddress(k32_base, "GetCurrentProcessId"), current_proc_id_iat.value)
 
+    @check_for_gc_garbage
+    def test_local_process_pe_iter_imports(self):
+        python_module = windows.current_process.peb.modules[0]
+        imports = list(python_module.pe.iter_imports())
+        self.assertIn(("kernel32.dll", "GetCurrentProcessId"), [(dll, name) for dll, name, ord, iat_addr in imports])
+        iat_entries = [(dll, entry.name, entry.ord, entry.addr) for dll, entries in python_module.pe.imports.items() for entry in entries]
+        self.assertEqual(sorted(imports), sorted(iat_entries))
+
     @check_for_gc_garbage
     def test_local_process_pe_exports(self):
         mods = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"]
@@ -111,6 +121,202 @@ class WindowsTestCase(unittest.TestCase):
         k32_base = windows.winproxy.LoadLibraryA("kernel32.dll")
         self.assertEqual(windows.winproxy.GetProcAddress(k32_base, "GetCurrentProcessId"), get_current_proc_id)
 
+    @check_for_gc_garbage
+    def test_local_process_pe_forwarded_exports(self):
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+        # kernel32!HeapAlloc is forwarded to ntdll!RtlAllocateHeap
+        self.assertEqual(k32.pe.forwarded_exports["HeapAlloc"].lower(), "ntdll.rtlallocateheap")
+        self.assertNotIn("GetCurrentProcessId", k32.pe.forwarded_exports)
+        entries = k32.pe.get_EXPORT_DIRECTORY().get_export_entries()
+        self.assertEqual([(e.nb, e.addr, e.name) for e in entries], k32.pe.get_EXPORT_DIRECTORY().get_exports())
+
+    @check_for_gc_garbage
+    def test_offline_pe_file(self):
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+        # The file system redirection of syswow64 gives the kernel32 of our bitness
+        filename = os.path.join(os.environ["SystemRoot"], "system32", "kernel32.dll")
+        pe = windows.pe_parse.GetPEFileFromPath(filename, baseaddr=k32.baseaddr)
+        self.assertEqual(pe.bitness, windows.current_process.bitness)
+        self.assertEqual(pe.exports, k32.pe.exports)
+        self.assertEqual([s.name for s in pe.sections], [s.name for s in k32.pe.sections])
+        self.assertEqual(sorted(pe.imports), sorted(k32.pe.imports))
+        with open(filename, "rb") as f:
+            pe = windows.pe_parse.GetPEFileFromData(f.read())
+        self.assertEqual(pe.export_name.lower(), "kernel32.dll")
+        self.assertEqual(pe.exports["GetCurrentProcessId"] - pe.baseaddr, k32.pe.exports["GetCurrentProcessId"] - k32.baseaddr)
+
+    def test_pe_file_buffer_sections(self):
+        # Headers and 2 sections with a section alignment of 0x200: the raw data of the first section
+        # is bigger than its VirtualSize (up to the second section) and its PointerToRawData is not aligned
+        data = bytearray(0x800)
+        data[0:2] = "MZ"
+        struct.pack_into("<I", data, 0x3c, 0x40)
+        data[0x40:0x44] = "PE\x00\x00"
+        struct.pack_into("<HH", data, 0x44, 0x14c, 2)
+        struct.pack_into("<H", data, 0x54, 0xe0)
+        struct.pack_into("<H", data, 0x58, 0x10b)
+        struct.pack_into("<III", data, 0x58 + 28, 0x400000, 0x200, 0x200)
+        struct.pack_into("<I", data, 0x58 + 60, 0x200)
+        struct.pack_into("<I", data, 0x58 + 92, 16)
+        struct.pack_into("<8sIIII", data, 0x138, ".text", 0x100, 0x200, 0x400, 0x201)
+        struct.pack_into("<8sIIII", data, 0x160, ".data", 0x200, 0x400, 0x200, 0x600)
+        data[0x200:0x600] = "Z" + "A" * 0x1ff + "B" * 0x200
+        data[0x600:0x800] = "C" * 0x200
+        target = windows.pe_parse.PEFileBuffer(str(data))
+        self.assertEqual(target.bitness, 32)
+        self.assertEqual(target.read_memory(0x400200, 0x200), "Z" + "A" * 0x1ff)
+        self.assertEqual(target.read_memory(0x400400, 0x10), "C" * 0x10)
+        self.assertEqual(target.region(0x400), (0x600, 0x200, 0x200))
+
+    def test_pe_file_buffer_imports(self):
+        # A 0x400 bytes PE with a section alignment of 0x200: nothing is mapped after its
+        # only section, the import name ends at the last bytes of the image
+        data = bytearray(0x400)
+        data[0:2] = "MZ"
+        struct.pack_into("<I", data, 0x3c, 0x40)
+        data[0x40:0x44] = "PE\x00\x00"
+        struct.pack_into("<HH", data, 0x44, 0x14c, 1)
+        struct.pack_into("<H", data, 0x54, 0xe0)
+        struct.pack_into("<H", data, 0x58, 0x10b)
+        struct.pack_into("<III", data, 0x58 + 28, 0x400000, 0x200, 0x200)
+        struct.pack_into("<II", data, 0x58 + 56, 0x400, 0x200)
+        struct.pack_into("<I", data, 0x58 + 92, 16)
+        struct.pack_into("<II", data, 0x58 + 104, 0x200, 0x28)
+        struct.pack_into("<8sIIII", data, 0x138, ".idata", 0x200, 0x200, 0x200, 0x200)
+        # OriginalFirstThunk, TimeDateStamp, ForwarderChain, Name, FirstThunk
+        struct.pack_into("<5I", data, 0x200, 0x240, 0, 0, 0x3e0, 0x260)
+        struct.pack_into("<I", data, 0x240, 0x3ee)
+        struct.pack_into("<I", data, 0x260, 0x3ee)
+        data[0x3e0:0x3e8] = "K32.dll\x00"
+        data[0x3ee:0x400] = "\x07\x00Sleep\x00".ljust(0x12, "\x00")
+        pe = windows.pe_parse.GetPEFileFromData(str(data))
+        self.assertEqual(list(pe.iter_imports()), [("k32.dll", "Sleep", 7, 0x400260)])
+
+    def test_authenticode_digest(self):
+        system32 = os.path.join(os.environ["SystemRoot"], "system32")
+        filenames = [os.path.join(system32, name) for name in ["kernel32.dll", "ntdll.dll", "notepad.exe"]]
+        for filename in filenames:
+            self.assertEqual(windows.pe_parse.authenticode_digest(filename), str(bytearray(windows.wintrust.get_file_hash(filename))))
+        digests = windows.pe_parse.authenticode_digests(filenames, processes=2)
+        self.assertEqual(digests, dict((filename, windows.pe_parse.authenticode_digest(filename)) for filename in filenames))
+
+    @check_for_gc_garbage
+    def test_pe_index(self):
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+        store_fd, store_filename = tempfile.mkstemp(suffix=".sqlite")
+        os.close(store_fd)
+        try:
+            index = windows.pe_parse.PEIndex(filename=store_filename)
+            tables = index.get_export_tables(k32.pe)
+            self.assertIs(index.get_export_tables(k32.pe), tables)
+            self.assertEqual(tables[0]["GetCurrentProcessId"] + k32.baseaddr, k32.pe.exports["GetCurrentProcessId"])
+            index.close_store()
+            # A new index (another process or run) finds the tables in the store
+            index = windows.pe_parse.PEIndex(filename=store_filename)
+            def fail_parse():
+                raise AssertionError("Exports of kernel32 parsed twice")
+            self.assertEqual(index.get(k32.pe, "exports", fail_parse), tables)
+            index.close_store()
+        finally:
+            os.remove(store_filename)
+
+    @check_for_gc_garbage
+    def test_pe_header_snapshot(self):
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+
+        def read_headers(target):
+            pe = windows.pe_parse.GetPEFile(k32.baseaddr, target)
+            self.assertIn(".text", [s.name for s in pe.sections])
+            self.assertTrue(pe.get_DataDirectory()[windows.pe_parse.IMAGE_DIRECTORY_ENTRY_EXPORT].VirtualAddress)
+            self.assertEqual(pe.get_NT_HEADER().OptionalHeader.SizeOfImage, k32.pe.get_NT_HEADER().OptionalHeader.SizeOfImage)
+            return pe
+
+        target = CountingTarget()
+        pe = read_headers(target)
+        self.assertEqual(target.nb_reads, 1)
+        pe.refresh_headers()
+        pe.get_NT_HEADER().FileHeader.Machine
+        self.assertEqual(target.nb_reads, 2)
+
+        windows.pe_parse.USE_HEADER_SNAPSHOT = False
+        try:
+            target = CountingTarget()
+            read_headers(target)
+            self.assertGreater(target.nb_reads, 10)
+        finally:
+            windows.pe_parse.USE_HEADER_SNAPSHOT = True
+
+    @check_for_gc_garbage
+    def test_pe_image_snapshot(self):
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+        filename = os.path.join(os.environ["SystemRoot"], "system32", "kernel32.dll")
+        snapshot = k32.pe.snapshot()
+        self.assertIsInstance(snapshot.target, windows.pe_parse.ImageSnapshot)
+        self.assertEqual(dict(snapshot.exports), dict(k32.pe.exports))
+        self.assertEqual(sorted(snapshot.imports), sorted(k32.pe.imports))
+        self.assertEqual(snapshot.find_patches(filename), [])
+        # Patch a byte of the copy of .text
+        text = [s for s in snapshot.sections if s.name == ".text"][0]
+        offset = text.VirtualAddress + 0x10
+        data = snapshot.target.data
+        snapshot.target.data = data[:offset] + chr(ord(data[offset]) ^ 0xff) + data[offset + 1:]
+        self.assertEqual(snapshot.find_patches(filename), [windows.pe_parse.Patch(text.start + 0x10, data[offset], snapshot.target.data[offset])])
+
+    @check_for_gc_garbage
+    def test_local_process_pe_directories(self):
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+        pe = k32.pe
+        image_end = k32.baseaddr + pe.get_OptionalHeader().SizeOfImage
+        pointer_type = ctypes.c_uint if pe.bitness == 32 else ctypes.c_ulonglong
+        relocations = list(pe.relocations)
+        self.assertTrue(relocations)
+        # The relocated pointers point in the image
+        for addr, type in relocations[:20]:
+            self.assertIn(type, [windows.pe_parse.IMAGE_REL_BASED_HIGHLOW, windows.pe_parse.IMAGE_REL_BASED_DIR64])
+            self.assertTrue(k32.baseaddr <= pointer_type.from_address(addr).value < image_end)
+        addr = relocations[len(relocations) // 2][0]
+        self.assertEqual(pe.relocations.in_range(addr, 0x100), [r for r in relocations if addr <= r[0] < addr + 0x100])
+        # RT_VERSION
+        self.assertIn(16, pe.resources)
+        self.assertEqual(pe.tls_callbacks, [])
+        if pe.bitness == 64:
+            functions = pe.runtime_functions
+            self.assertTrue(len(functions))
+            for function in list(functions)[::50]:
+                self.assertEqual(functions.find(function.begin), function)
+                self.assertEqual(functions.find(function.end - 1), function)
+            self.assertIsNone(functions.find(k32.baseaddr))
+
+    @check_for_gc_garbage
+    def test_local_process_symbolizer(self):
+        symbolizer = windows.debug.Symbolizer.from_process(windows.current_process)
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+        exports = k32.pe.exports
+        addr = exports["CreateFileA"]
+        symbol = symbolizer.resolve(addr + 3)
+        self.assertEqual(symbol.module, "kernel32.dll")
+        self.assertEqual(symbol.offset, 3)
+        self.assertEqual(exports[symbol.export], addr)
+        self.assertEqual(symbolizer.symbolize(addr + 3), "kernel32.dll!{0}+0x3".format(symbol.export))
+        self.assertEqual(symbolizer.symbolize(k32.baseaddr + 0x10), "kernel32.dll+0x10")
+        self.assertIsNone(symbolizer.resolve(0x10))
+        self.assertTrue(symbolizer.remove_module(k32.baseaddr))
+        self.assertIsNone(symbolizer.resolve(addr))
+
+    def test_symbolizer_exports(self):
+        class FakePE(object):
+            def get_export_tables(self):
+                # Ordinal 1 is an unused slot, 2 has 2 names, 4 and 5 have no name, 6 is forwarded
+                rvas = {1: 0, 2: 0x1000, "b": 0x1000, "a": 0x1000, 3: 0x1800, "c": 0x1800, 5: 0x2000, 4: 0x2000, 6: 0x3000}
+                return rvas, {6: "NTDLL.Forwarded"}
+
+        symbolizer = windows.debug.Symbolizer()
+        symbolizer.add_module("fake.dll", 0x10000, 0x4000, FakePE())
+        self.assertEqual(symbolizer.symbolize(0x10010), "fake.dll+0x10")
+        self.assertEqual(symbolizer.symbolize(0x11004), "fake.dll!a+0x4")
+        self.assertEqual(symbolizer.symbolize(0x11800), "fake.dll!c")
+        self.assertEqual(symbolizer.symbolize(0x13000), "fake.dll!#4+0x1000")
+
     @check_for_gc_garbage
     def test_local_process_pe_sections(self):
         mods = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"]
@@ -122,6 +328,210 @@ class WindowsTestCase(unittest.TestCase):
         sections[0].start
         sections[0].size
 
+    def test_section_statistics(self):
+        synthetic_sections = ["", "\x00" * 0x1000, "".join(chr(byte) for byte in range(256)) * 16, "ABCD" * 0x100 + "\xff"]
+        for use_numpy in [True, False]:
+            windows.pe_parse.USE_NUMPY = use_numpy
+            try:
+                histograms = [windows.pe_parse.byte_histogram(data) for data in synthetic_sections]
+            finally:
+                windows.pe_parse.USE_NUMPY = True
+            self.assertEqual(histograms[0], [0] * 256)
+            self.assertEqual(histograms[1], [0x1000] + [0] * 255)
+            self.assertEqual(histograms[2], [16] * 256)
+            self.assertEqual(histograms[3][ord("A")], 0x100)
+            self.assertEqual(histograms[3][0xff], 1)
+        entropies = [windows.pe_parse.histogram_entropy(histogram) for histogram in histograms]
+        self.assertEqual(entropies[:3], [0.0, 0.0, 8.0])
+        self.assertTrue(2.0 < entropies[3] < 2.1)
+
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+        filename = os.path.join(os.environ["SystemRoot"], "system32", "kernel32.dll")
+        offline = dict((s.name, s) for s in windows.pe_parse.GetPEFileFromPath(filename, k32.baseaddr).sections)
+        snapshot = dict((s.name, s) for s in k32.pe.snapshot().sections)
+        for section in k32.pe.sections:
+            self.assertEqual(sum(section.histogram), len(section.data))
+            self.assertTrue(0.0 < section.entropy < 8.0)
+            self.assertEqual(snapshot[section.name].histogram, section.histogram)
+        # The resources are not relocated
+        self.assertEqual(offline[".rsrc"].histogram, [s for s in k32.pe.sections if s.name == ".rsrc"][0].histogram)
+
+    def test_remote_structure_prefetch(self):
+        class POINT(ctypes.Structure):
+            _fields_ = [("x", DWORD), ("y", DWORD)]
+
+        class ENTRY(ctypes.Structure):
+            _fields_ = [("a", DWORD), ("b", WORD), ("c", ULONGLONG), ("point", POINT), ("array", DWORD * 4)]
+
+        entry = ENTRY(1, 2, 3, POINT(4, 5), (DWORD * 4)(6, 7, 8, 9))
+        RemoteENTRY = windows.remotectypes.RemoteStructure.from_structure(ENTRY)
+
+        def read_fields(target):
+            remote = RemoteENTRY(ctypes.addressof(entry), target)
+            self.assertEqual((remote.a, remote.b, remote.c, remote.point.y, remote.array[3]), (entry.a, 2, 3, 5, 9))
+            return remote
+
+        target = CountingTarget()
+        read_fields(target)
+        # The sub-structure and the array are read before their field / item
+        self.assertEqual(target.nb_reads, 7)
+        windows.remotectypes.USE_PREFETCH = True
+        try:
+            target = CountingTarget()
+            remote = read_fields(target)
+            self.assertEqual(target.nb_reads, 1)
+            entry.a = 42
+            self.assertEqual(remote.a, 1)
+            remote.refresh()
+            self.assertEqual(remote.a, 42)
+            self.assertEqual(target.nb_reads, 2)
+            windows.remotectypes.PREFETCH_TTL = 0
+            time.sleep(0.01)
+            entry.a = 43
+            self.assertEqual(remote.a, 43)
+            self.assertEqual(target.nb_reads, 3)
+        finally:
+            windows.remotectypes.USE_PREFETCH = False
+            windows.remotectypes.PREFETCH_TTL = None
+
+    def test_cached_target(self):
+        PAGE_SIZE = windows.winobject.process.PAGE_SIZE
+        buffer = ctypes.create_string_buffer(9 * PAGE_SIZE)
+        base = (ctypes.addressof(buffer) + PAGE_SIZE - 1) & ~(PAGE_SIZE - 1)
+        ctypes.memmove(base + 0x10, "hello\x00", 6)
+        target = CountingTarget()
+        cached = windows.winobject.process.CachedTarget(target)
+        self.assertEqual(cached.read_string(base + 0x10), "hello")
+        self.assertEqual(cached.read_memory(base + 0x10, 5), "hello")
+        self.assertEqual(target.reads, [(base, PAGE_SIZE)])
+        # The adjacent missing pages are read at once
+        target.reads = []
+        self.assertEqual(len(cached.read_memory(base + 0x800, 4 * PAGE_SIZE)), 4 * PAGE_SIZE)
+        self.assertEqual(target.reads, [(base + PAGE_SIZE, 4 * PAGE_SIZE)])
+        # The writes invalidate the pages
+        cached.write_memory(base + 0x11, "E")
+        self.assertEqual(cached.read_memory(base + 0x10, 5), "hEllo")
+        self.assertEqual(len(target.reads), 2)
+        # The typed writes go through the cache too
+        self.assertEqual(cached.read_dword(base + 0x20), 0)
+        cached.write_dword(base + 0x20, 0x11223344)
+        self.assertEqual(cached.read_dword(base + 0x20), 0x11223344)
+        self.assertEqual(cached.read_memory_multi([(base + 0x20, 4)])[0].tobytes(), "\x44\x33\x22\x11")
+        self.assertFalse(hasattr(cached, "low_read_memory"))
+        # The least recently used pages are dropped above the budget
+        cached = windows.winobject.process.CachedTarget(target, max_size=2 * PAGE_SIZE)
+        for i in range(8):
+            cached.read_memory(base + i * PAGE_SIZE, 1)
+        self.assertEqual(len(cached.pages), 2)
+        frozen = windows.winobject.process.CachedTarget(target, max_size=2 * PAGE_SIZE, frozen=True)
+        for i in range(8):
+            frozen.read_memory(base + i * PAGE_SIZE, 1)
+        self.assertEqual(len(frozen.pages), 8)
+
+    @check_for_gc_garbage
+    def test_cached_target_remote_peb_32(self):
+        with Calc32() as calc:
+            cached = windows.winobject.process.CachedTarget(calc)
+            modules = cached.peb.modules
+            self.assertEqual([m.name for m in modules], [m.name for m in calc.peb.modules])
+            k32 = [m for m in modules if m.name == "kernel32.dll"][0]
+            self.assertIs(k32.pe.target, cached)
+            self.assertEqual(k32.pe.exports["CreateFileA"], [m for m in calc.peb.modules if m.name == "kernel32.dll"][0].pe.exports["CreateFileA"])
+
+    def test_read_memory_multi_plan(self):
+        plan_reads = windows.winobject.process.plan_reads
+        ranges = [(0x10100, 4), (0x10000, 8), (0x10004, 8), (0x10200, 0x10), (0x11000, 4)]
+        self.assertEqual(plan_reads(ranges), [(0x10000, 0x210, [1, 2, 0, 3]), (0x11000, 4, [4])])
+        self.assertEqual(plan_reads(ranges, max_gap=0), [(0x10000, 0xc, [1, 2]), (0x10100, 4, [0]), (0x10200, 0x10, [3]), (0x11000, 4, [4])])
+
+        # Pages 0x10000 - 0x14000 are readable except 0x12000: the byte at addr is addr & 0xff
+        expected = lambda addr, size: "".join(chr(x & 0xff) for x in range(addr, addr + size))
+        memory = expected(0x10000, 0x4000)
+        target = FakeTarget(memory, unreadable=[0x12000])
+        res = windows.winobject.process.read_memory_multi(target, ranges)
+        self.assertEqual([view.tobytes() for view in res], [expected(addr, size) for addr, size in ranges])
+        self.assertEqual(target.reads, [(0x10000, 0x210), (0x11000, 4)])
+        # Unreadable ranges are truncated
+        ranges = [(0x11ff0, 0x20), (0x12010, 4), (0x13000, 8), (0x11f00, 4), (0x20000, 4), (0x13ffc, 8)]
+        res = windows.winobject.process.read_memory_multi(FakeTarget(memory, unreadable=[0x12000]), ranges, max_gap=0x2000)
+        self.assertEqual([view.tobytes() for view in res], [expected(0x11ff0, 0x10), "", expected(0x13000, 8), expected(0x11f00, 4), "", expected(0x13ffc, 4)])
+
+        class LowReadTarget(FakeTarget):
+            def low_read_memory(self, addr, buffer_addr, size):
+                ctypes.memmove(buffer_addr, "X" * size, size)
+
+        # A snapshot of a process is read through its read_memory, not the low_read_memory of the process
+        snapshot = windows.pe_parse.HeaderSnapshot(LowReadTarget(memory), 0x10000)
+        self.assertEqual(windows.winobject.process.read_memory_multi(snapshot, [(0x10010, 4)])[0].tobytes(), expected(0x10010, 4))
+        self.assertEqual(windows.winobject.process.read_memory_multi(LowReadTarget(memory), [(0x10010, 4)])[0].tobytes(), "XXXX")
+
+    def test_read_terminated_strings(self):
+        # Pages 0x10000 - 0x12000 are readable
+        memory = bytearray("A" * 0x2000)
+        memory[0x10: 0x16] = "hello\x00"
+        memory[0x801: 0x809] = u"odd\x00".encode("utf-16-le")
+        memory[0xf00: 0x1101] = "B" * 0x200 + "\x00"
+        # Ends with the last readable page
+        memory[0x1ff8: 0x2000] = "x" * 7 + "\x00"
+        target = FakeTarget(str(memory))
+        read_terminated_string = windows.winobject.process.read_terminated_string
+        self.assertEqual(read_terminated_string(target, 0x10010), "hello")
+        self.assertEqual(target.reads, [(0x10010, 0xff0)])
+        self.assertEqual(read_terminated_string(target, 0x11ff8), "x" * 7)
+        self.assertEqual(read_terminated_string(target, 0x10f00), "B" * 0x200)
+        self.assertEqual(read_terminated_string(target, 0x10f00, max_length=0x180), "B" * 0x180)
+        self.assertEqual(read_terminated_string(target, 0x10801, 2).decode("utf16"), u"odd")
+        self.assertEqual(read_terminated_string(target, 0x10801, 2, max_length=2).decode("utf16"), u"od")
+        with self.assertRaises(windows.winproxy.Kernel32Error):
+            read_terminated_string(target, 0x20000)
+
+        target.reads = []
+        res = windows.winobject.process.read_terminated_strings(target, [0x10010, 0x11ff8, 0x10f00, 0x20000, 0x10801])
+        self.assertEqual(res, ["hello", "x" * 7, "B" * 0x200, None, "o"])
+        # The starts of the strings of the first page in one read, then the end of the long string
+        self.assertEqual(target.reads, [(0x10010, 0xff0), (0x11ff8, 8), (0x20000, 0x1000), (0x20000, 0x1000), (0x11000, 0x1000)])
+
+    @check_for_gc_garbage
+    def test_read_memory_multi_32(self):
+        with Calc32() as calc:
+            k32 = [m for m in calc.peb.modules if m.name == "kernel32.dll"][0]
+            ranges = [(k32.baseaddr, 2), (k32.baseaddr + 0x3c, 4), (0, 4)]
+            res = calc.read_memory_multi(ranges)
+            self.assertEqual([view.tobytes() for view in res], [calc.read_memory(k32.baseaddr, 2), calc.read_memory(k32.baseaddr + 0x3c, 4), ""])
+
+    @check_for_gc_garbage
+    def test_read_memory_into_buffer_32(self):
+        with Calc32() as calc:
+            k32 = [m for m in calc.peb.modules if m.name == "kernel32.dll"][0]
+            buffer = bytearray("XXXXXX")
+            self.assertIs(calc.read_memory_into_buffer(k32.baseaddr, buffer, 2, offset=2), buffer)
+            self.assertEqual(buffer, bytearray("XXMZXX"))
+            view = memoryview(buffer)
+            calc.read_memory_into_buffer(k32.baseaddr, view[4:])
+            self.assertEqual(buffer, bytearray("XXMZMZ"))
+            with self.assertRaises(ValueError):
+                calc.read_memory_into_buffer(k32.baseaddr, buffer, 8)
+            self.assertEqual(calc.read_memory_arena(k32.baseaddr, 2).tobytes(), "MZ")
+            self.assertIs(calc.get_read_arena(), calc.get_read_arena(0x10))
+            e_lfanew = calc.read_dword(k32.baseaddr + 0x3c)
+            self.assertEqual(e_lfanew, struct.unpack("<I", calc.read_memory(k32.baseaddr + 0x3c, 4))[0])
+            self.assertEqual(calc.read_memory(k32.baseaddr + e_lfanew, 4), "PE\x00\x00")
+            self.assertEqual(calc.read_short(k32.baseaddr), 0x5a4d)
+            self.assertEqual(calc.read_qword(k32.baseaddr), struct.unpack("<Q", calc.read_memory(k32.baseaddr, 8))[0])
+
+    @check_for_gc_garbage
+    def test_read_strings_32(self):
+        with Calc32() as calc:
+            addr = calc.virtual_alloc(0x1000)
+            # The page after the allocation is not readable
+            calc.write_memory(addr + 0x1000 - 6, "hello\x00")
+            calc.write_memory(addr + 0x100, u"wide\x00".encode("utf-16-le"))
+            self.assertEqual(calc.read_string(addr + 0x1000 - 6), "hello")
+            self.assertEqual(calc.read_string(addr + 0x1000 - 6, max_length=2), "he")
+            self.assertEqual(calc.read_wstring(addr + 0x100), u"wide")
+            self.assertEqual(calc.read_strings([addr + 0x1000 - 6, 0, addr + 0x100]), ["hello", None, "w"])
+            self.assertEqual(calc.read_wstrings([addr + 0x100, 0], max_length=3), [u"wid", None])
+
     # Read / write
     @check_for_gc_garbage
     def test_read_memory_32(self):
@@ -47,6 +47,69 @@ class HookTestCase(unittest.TestCase):
         self.assertEqual(ar.exception.winerror, 0x11223344)
         x.disable()
 
+    @check_for_gc_garbage
+    def test_self_iat_hook_native_filter(self):
+        """Test IAT hook with a native filter in single(self) thread"""
+        pythondll_mod = [m for m in windows.current_process.peb.modules if m.name.startswith("python") and m.name.endswith(".dll")][0]
+        RegOpenKeyExA = [n for n in pythondll_mod.pe.imports['advapi32.dll'] if n.name == "RegOpenKeyExA"][0]
+
+        hook_value = []
+
+        @windows.hooks.RegOpenKeyExACallback
+        def open_reg_hook(hKey, lpSubKey, ulOptions, samDesired, phkResult, real_function):
+            hook_value.append((hKey, lpSubKey.value))
+            phkResult[0] = 12345678
+            return 0
+
+        native_filter = windows.hooks.NativeFilter((0, "==", 0x12345678))
+        x = RegOpenKeyExA.set_hook(open_reg_hook, native_filter=native_filter)
+        import _winreg
+        k = _winreg.OpenKey(0x12345678, "MY_KEY_VALUE")
+        self.assertEqual(k.handle, 12345678)
+        # Calls that do not match the filter go directly to the real function
+        k = _winreg.OpenKey(_winreg.HKEY_LOCAL_MACHINE, "SOFTWARE")
+        self.assertNotEqual(k.handle, 12345678)
+        self.assertEqual(hook_value, [(0x12345678, "MY_KEY_VALUE")])
+        self.assertEqual(native_filter.nb_matched, 1)
+        self.assertGreaterEqual(native_filter.nb_calls, 2)
+        x.disable()
+
+    @check_for_gc_garbage
+    def test_self_counting_hook(self):
+        """Test counting hook with latency samples in single(self) thread"""
+        pythondll_mod = [m for m in windows.current_process.peb.modules if m.name.startswith("python") and m.name.endswith(".dll")][0]
+        RegOpenKeyExA = [n for n in pythondll_mod.pe.imports['advapi32.dll'] if n.name == "RegOpenKeyExA"][0]
+
+        x = windows.hooks.CountingHook(RegOpenKeyExA, latency_ring_size=4)
+        x.enable()
+        import _winreg
+        for i in range(6):
+            _winreg.OpenKey(_winreg.HKEY_LOCAL_MACHINE, "SOFTWARE")
+        x.disable()
+        self.assertGreaterEqual(x.nb_calls, 6)
+        latencies = x.latencies()
+        self.assertEqual(len(latencies), 4)
+        self.assertTrue(all(latencies))
+        x.reset()
+        self.assertEqual((x.nb_calls, x.latencies()), (0, []))
+
+    @check_for_gc_garbage
+    def test_counting_hook_exception(self):
+        """Test that an exception raised by the function of a counting hook with latency samples goes through its stub"""
+        k32 = [m for m in windows.current_process.peb.modules if m.name == "kernel32.dll"][0]
+
+        class RaiseExceptionEntry(object):
+            name = "RaiseException"
+            nonhookvalue = k32.pe.exports["RaiseException"]
+
+        x = windows.hooks.CountingHook(RaiseExceptionEntry(), types=(None, DWORD, DWORD, DWORD, PVOID), latency_ring_size=4)
+        raise_exception = ctypes.WINFUNCTYPE(None, DWORD, DWORD, DWORD, PVOID)(x.code_addr)
+        # ctypes catches the SEH exception raised by the called function
+        with self.assertRaises(WindowsError):
+            raise_exception(0xe0424242, 0, 0, None)
+        self.assertEqual(x.nb_calls, 1)
+        self.assertEqual(x.latencies(), [])
+
     @check_for_gc_garbage
     def test_self_iat_hook_multithread(self):
         """Test IAT hook in current process with multi thread trigger"""
@@ -75,6 +138,36 @@ class HookTestCase(unittest.TestCase):
         self.assertEqual(len(calling_thread), 2)
         x.disable()
 
+    @check_for_gc_garbage
+    def test_self_inline_hook(self):
+        """Test inline hook of a native function with its trampoline in single(self) thread"""
+        if windows.current_process.bitness == 32:
+            code = x86.MultipleInstr()
+            code += x86.Mov("EAX", 0x11223344)
+            code += x86.Nop() * 4
+            code += x86.Ret()
+        else:
+            code = x64.MultipleInstr()
+            code += x64.Mov("RAX", 0x11223344)
+            code += x64.Nop() * 8
+            code += x64.Ret()
+        func = windows.native_exec.create_function(code.get_code(), [DWORD])
+
+        @windows.hooks.Callback(DWORD)
+        def add_one_hook(real_function):
+            return real_function() + 1
+
+        x = windows.hooks.InlineHook(func.code_addr, add_one_hook)
+        x.enable()
+        self.assertEqual(func(), 0x11223345)
+        x.disable()
+        self.assertEqual(func(), 0x11223344)
+        # Batch of hooks
+        windows.hooks.enable_inline_hooks([x])
+        self.assertEqual(func(), 0x11223345)
+        windows.hooks.disable_inline_hooks([x])
+        self.assertEqual(func(), 0x11223344)
+
     @check_for_gc_garbage
     def test_remote_iat_hook_32(self):
         with Calc32() as calc:
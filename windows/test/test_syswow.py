@@ -1,5 +1,6 @@
 import windows
 import time
+import struct
 import textwrap
 from test_utils import *
 from windows.generated_def.winstructs import *
@@ -14,6 +15,16 @@ class SyswowTestCase(unittest.TestCase):
         res = windows.syswow64.execute_64bits_code_from_syswow(x64_code)
         self.assertEqual(res, 0x4242424242424242)
 
+    def test_syswow64_call_code(self):
+        code = windows.syswow64.generate_syswow64_call_code(5, 0x7ff812345678, 0x10000, 0x20000)
+        for addr in [0x10000 + 8 * i for i in range(5)] + [0x20000]:
+            self.assertIn(struct.pack("<I", addr), code)
+        # The disp32 of the stub are sign-extended: no silent 0xffffffff8xxxxxxx address
+        with self.assertRaises(ValueError):
+            windows.syswow64.generate_syswow64_call_code(5, 0x7ff812345678, 0x80001000, 0x20000)
+        with self.assertRaises(ValueError):
+            windows.syswow64.generate_syswow64_call_code(2, 0x7ff812345678, 0x10000, 0x80000000)
+
     @windows_64bit_only
     @process_32bit_only
     @check_for_gc_garbage
@@ -1,5 +1,6 @@
 from contextlib import contextmanager
 
+import ctypes
 import unittest
 import windows
 import windows.debug
@@ -77,6 +78,49 @@ def Calc32(dwCreationFlags=DEFAULT_CREATION_FLAGS, exit_code=0):
             calc.exit(exit_code)
 
 
+class CountingTarget(object):
+    """A 'remote' target that reads the current process and logs the ``(addr, size)`` of the reads"""
+    bitness = windows.current_process.bitness
+
+    def __init__(self):
+        self.reads = []
+
+    @property
+    def nb_reads(self):
+        return len(self.reads)
+
+    def read_memory(self, addr, size):
+        self.reads.append((addr, size))
+        return ctypes.string_at(addr, size)
+
+    def read_string(self, addr):
+        self.reads.append((addr, None))
+        return ctypes.c_char_p(addr).value
+
+    def write_memory(self, addr, data):
+        ctypes.memmove(addr, data, len(data))
+
+
+class FakeTarget(object):
+    """A target whose memory is the :class:`str` ``memory`` at ``baseaddr`` and logs the ``(addr, size)`` of the reads.
+
+    The reads outside of ``memory`` or in the ``unreadable`` pages fail.
+    """
+    def __init__(self, memory, baseaddr=0x10000, unreadable=()):
+        self.memory = memory
+        self.baseaddr = baseaddr
+        self.unreadable = unreadable
+        self.reads = []
+
+    def read_memory(self, addr, size):
+        self.reads.append((addr, size))
+        offset = addr - self.baseaddr
+        unreadable = [page for page in range(addr & ~0xfff, addr + size, 0x1000) if page in self.unreadable]
+        if offset < 0 or offset + size > len(self.memory) or unreadable:
+            raise windows.winproxy.Kernel32Error("ReadProcessMemory")
+        return self.memory[offset: offset + size]
+
+
 def check_for_gc_garbage(f):
     def wrapper(testcase, *args, **kwargs):
         garbage_before = set(gc.garbage)
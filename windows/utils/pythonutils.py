@@ -1,6 +1,7 @@
 """utils fonctions non windows-related"""
 import ctypes
 import _ctypes
+import collections
 from windows.generated_def import Flag
 
 
@@ -16,6 +17,36 @@ def fixedpropety(f):
     return property(prop, doc=f.__doc__)
 
 
+class LRUCache(object):
+    """A dict with a maximum size that forgets the least recently used entries"""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            return default
+        self.entries[key] = value
+        return value
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
+
+    def __setitem__(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+
 def swallow_ctypes_copy(ctypes_object):
     new_copy = type(ctypes_object)()
     ctypes.memmove(ctypes.byref(new_copy), ctypes.byref(ctypes_object), ctypes.sizeof(new_copy))
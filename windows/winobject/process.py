@@ -4,6 +4,7 @@ import copy
 import time
 import struct
 import itertools
+import threading
 
 from contextlib import contextmanager
 from collections import namedtuple
@@ -28,6 +29,11 @@ from windows.winobject import exception
 TimeInfo = namedtuple("TimeInfo", ["creation", "exit", "kernel", "user"])
 """Time information about a process"""
 
+BYTE_STRUCT = struct.Struct("<B")
+SHORT_STRUCT = struct.Struct("<H")
+DWORD_STRUCT = struct.Struct("<I")
+QWORD_STRUCT = struct.Struct("<Q")
+
 class AutoHandle(object):
     """An abstract class that allow easy handle creation/destruction/wait"""
      # Big bypass to prevent missing reference at programm close..
@@ -562,25 +568,41 @@ class Process(AutoHandle):
             return None
         return buffer[:size]
 
+    def read_memory_multi(self, ranges):
+        """Read the ``(addr, size)`` of ``ranges`` with the minimum number of reads (see :func:`read_memory_multi`)
+
+        :return: A view of the data of each range (truncated to its readable part)
+        :rtype: [:class:`memoryview`]
+        """
+        return read_memory_multi(self, ranges)
+
+    def read_memory_into_buffer(self, addr, buffer, size=None, offset=0):
+        """Read ``size`` bytes at ``addr`` at ``offset`` in ``buffer`` (:class:`bytearray` or writable :class:`memoryview`).
+
+        ``size`` is by default the size of ``buffer`` after ``offset``
+
+        :returns: buffer
+        """
+        if size is None:
+            size = len(buffer) - offset
+        read_memory_into_buffer(self, addr, size, buffer, offset)
+        return buffer
+
     def read_byte(self, addr):
         """Read a ``CHAR`` at ``addr``"""
-        sizeof_char = sizeof(CHAR)
-        return struct.unpack("<B", self.read_memory(addr, sizeof_char))[0]
+        return BYTE_STRUCT.unpack(self.read_memory(addr, 1))[0]
 
     def read_short(self, addr):
         """Read a ``SHORT`` at ``addr``"""
-        sizeof_short = sizeof(ctypes.c_short)
-        return struct.unpack("<H", self.read_memory(addr, sizeof_short))[0]
+        return SHORT_STRUCT.unpack(self.read_memory(addr, 2))[0]
 
     def read_dword(self, addr):
         """Read a ``DWORD`` at ``addr``"""
-        sizeof_dword = sizeof(DWORD)
-        return struct.unpack("<I", self.read_memory(addr, sizeof_dword))[0]
+        return DWORD_STRUCT.unpack(self.read_memory(addr, 4))[0]
 
     def read_qword(self, addr):
         """Read a ``ULONG64`` at ``addr``"""
-        sizeof_qword = sizeof(ULONG64)
-        return struct.unpack("<Q", self.read_memory(addr, sizeof_qword))[0]
+        return QWORD_STRUCT.unpack(self.read_memory(addr, 8))[0]
 
     def read_ptr(self, addr):
         """Read a ``PTR`` at ``addr``"""
@@ -588,53 +610,29 @@ class Process(AutoHandle):
             return self.read_dword(addr)
         return self.read_qword(addr)
 
-    def read_string(self, addr):
-        """Read an ascii string at ``addr``"""
-        res = []
-        read_size = 0x100
-        readden = 0
-        for i in itertools.count():
-            try:
-                x = self.read_memory(addr + readden, read_size)
-            except winproxy.Kernel32Error as e:
-                if read_size == 2:
-                    raise
-                # handle read_wstring at end of page
-                # Of read failed: read only the half of size
-                # read_size must remain a multiple of 2
-                read_size = read_size / 2
-                continue
-            readden += read_size
-            if "\x00" in x:
-                res.append(x.split("\x00", 1)[0])
-                break
-            res.append(x)
-        return "".join(res)
-
-    def read_wstring(self, addr):
-        """Read a windows UTF16 string at ``addr``"""
-        res = []
-        read_size = 0x100
-        readden = 0
-        # I am trying to do something smart here..
-        while True:
-            try:
-                x = self.read_memory(addr + readden, read_size)
-            except winproxy.Kernel32Error as e:
-                if read_size == 2:
-                    raise
-                # handle read_wstring at end of page
-                # Of read failed: read only the half of size
-                # read_size must remain a multiple of 2
-                read_size = read_size / 2
-                continue
-            readden += read_size
-            utf16_chars = ["".join(c) for c in zip(*[iter(x)] * 2)]
-            if "\x00\x00" in utf16_chars:
-                res.extend(utf16_chars[:utf16_chars.index("\x00\x00")])
-                break
-            res.extend(x)
-        return "".join(res).decode('utf16')
+    def read_string(self, addr, max_length=None):
+        """Read an ascii string at ``addr`` (truncated to ``max_length`` chars)"""
+        return read_terminated_string(self, addr, 1, max_length)
+
+    def read_wstring(self, addr, max_length=None):
+        """Read a windows UTF16 string at ``addr`` (truncated to ``max_length`` chars)"""
+        return read_terminated_string(self, addr, 2, max_length).decode("utf16")
+
+    def read_strings(self, addrs, max_length=None):
+        """Read the ascii strings at ``addrs`` with one scatter-gather plan (see :func:`read_terminated_strings`)
+
+        :return: The strings (``None`` for the unreadable ones)
+        :rtype: [:class:`str`]
+        """
+        return read_terminated_strings(self, addrs, 1, max_length)
+
+    def read_wstrings(self, addrs, max_length=None):
+        """Read the windows UTF16 strings at ``addrs`` with one scatter-gather plan (see :func:`read_terminated_strings`)
+
+        :return: The strings (``None`` for the unreadable ones)
+        :rtype: [:class:`unicode`]
+        """
+        return [None if data is None else data.decode("utf16") for data in read_terminated_strings(self, addrs, 2, max_length)]
 
     def write_byte(self, addr, byte):
         """write a byte at ``addr``"""
@@ -856,6 +854,8 @@ class WinProcess(Process):
         if handle is not None: self._handle = handle
         if name is not None:   self._name = name
         if ppid is not None:   self._ppid = ppid
+        # One ReadArena by thread
+        self._read_arenas = threading.local()
 
 
     @staticmethod
@@ -939,33 +939,38 @@ class WinProcess(Process):
         #    return winproxy.NtWow64ReadVirtualMemory64(self.handle, addr, buffer_addr, size)
         return winproxy.ReadProcessMemory(self.handle, addr, lpBuffer=buffer_addr, nSize=size)
 
+    def get_read_arena(self, size=0):
+        """The :class:`ReadArena` of the current thread for the reads in the process (of at least ``size`` bytes)"""
+        arenas = self._read_arenas
+        arena = getattr(arenas, "arena", None)
+        if arena is None or arena.size < size:
+            arena = ReadArena(max(size, READ_ARENA_SIZE))
+            arenas.arena = arena
+        return arena
+
+    def read_memory_arena(self, addr, size):
+        """Read ``size`` from ``addr`` in the :class:`ReadArena` of the current thread without allocation.
+
+        :return: A view of the data read, valid until the next read of the thread in the process
+        :rtype: :class:`memoryview`
+        """
+        arena = self.get_read_arena(size)
+        self.low_read_memory(addr, arena.ref, size)
+        return arena.view[:size]
+
     def read_memory(self, addr, size):
         """Read ``size`` from ``addr``
 
         :return: The data read
         :rtype: :class:`str`
 		"""
-        buffer = ctypes.create_string_buffer(size)
-        self.low_read_memory(addr, ctypes.byref(buffer), size)
-        return buffer[:]
-
-    # Simple cache test
-    # real_read = read_memory
-    #
-    # def read_memory(self, addr, size):
-    #     """Cached version for test"""
-    #     dbgprint('Read remote Memory of {0}'.format(self), 'READMEM')
-    #     if not hasattr(self, "_cache_cache"):
-    #         self._cache_cache = {}
-    #     page_addr = addr & 0xfffffffffffff000
-    #     if page_addr in self._cache_cache:
-    #         #print("CACHED Read on page {0}".format(hex(page_addr)))
-    #         page_data = self._cache_cache[page_addr]
-    #         return page_data[addr & 0xfff: (addr & 0xfff) + size]
-    #     else:
-    #         page_data = self.real_read(page_addr, 0x1000)
-    #         self._cache_cache[page_addr] = page_data
-    #         return page_data[addr & 0xfff: (addr & 0xfff) + size]
+        if size > READ_ARENA_MAX_SIZE:
+            buffer = ctypes.create_string_buffer(size)
+            self.low_read_memory(addr, ctypes.byref(buffer), size)
+            return buffer.raw
+        arena = self.get_read_arena(size)
+        self.low_read_memory(addr, arena.ref, size)
+        return arena.cbuffer[:size]
 
     def read_memory_into(self, addr, struct):
         """Read a :mod:`ctypes` struct from `addr`
@@ -975,6 +980,31 @@ class WinProcess(Process):
         self.low_read_memory(addr, ctypes.byref(struct), ctypes.sizeof(struct))
         return struct
 
+    # The typed reads unpack directly from the ReadArena
+    def read_byte(self, addr):
+        """Read a ``CHAR`` at ``addr``"""
+        arena = self.get_read_arena(1)
+        self.low_read_memory(addr, arena.ref, 1)
+        return BYTE_STRUCT.unpack_from(arena.buffer)[0]
+
+    def read_short(self, addr):
+        """Read a ``SHORT`` at ``addr``"""
+        arena = self.get_read_arena(2)
+        self.low_read_memory(addr, arena.ref, 2)
+        return SHORT_STRUCT.unpack_from(arena.buffer)[0]
+
+    def read_dword(self, addr):
+        """Read a ``DWORD`` at ``addr``"""
+        arena = self.get_read_arena(4)
+        self.low_read_memory(addr, arena.ref, 4)
+        return DWORD_STRUCT.unpack_from(arena.buffer)[0]
+
+    def read_qword(self, addr):
+        """Read a ``ULONG64`` at ``addr``"""
+        arena = self.get_read_arena(8)
+        self.low_read_memory(addr, arena.ref, 8)
+        return QWORD_STRUCT.unpack_from(arena.buffer)[0]
+
     def create_thread(self, addr, param):
         """Create a remote thread
 
@@ -1096,6 +1126,370 @@ SECURITY_MANDATORY_PROTECTED_PROCESS_RID]
 know_integrity_level_mapper = {x:x for x in KNOW_INTEGRITY_LEVEL}
 
 # Create ProcessToken and Thread Token objects ?
+PAGE_SIZE = 0x1000
+CACHED_TARGET_SIZE = 0x1000000
+
+
+class CachedTarget(object):
+    """A cache of the memory of ``target`` (any object with a ``read_memory``, like a :class:`WinProcess`) by pages of 4KB.
+
+    The missing pages of a read are read with one ``read_memory`` by range of adjacent pages.
+    Above ``max_size`` bytes, the least recently used pages are dropped.
+    The ``write_memory`` and ``virtual_protect`` done through the :class:`CachedTarget` invalidate their pages.
+
+    With ``frozen=True`` the pages are never dropped: the :class:`CachedTarget` is a snapshot
+    of a suspended or debugged process.
+
+    The :class:`CachedTarget` can be used as the target of :mod:`windows.remotectypes` and :mod:`windows.pe_parse`
+    (``CachedTarget(process).peb.modules``). The other attributes are the ones of ``target``,
+    except the ones that access its memory directly (``low_read_memory``, ``read_memory_arena``, ...).
+    """
+    # Would bypass the cache (and invalidation) if forwarded to target
+    uncached_attributes = frozenset(["low_read_memory", "get_read_arena", "read_memory_arena"])
+
+    def __init__(self, target, max_size=CACHED_TARGET_SIZE, frozen=False):
+        self.target = target
+        self.frozen = frozen
+        if frozen:
+            self.pages = {}
+        else:
+            self.pages = utils.LRUCache(max(max_size // PAGE_SIZE, 1))
+
+    def __getattr__(self, name):
+        if name in CachedTarget.uncached_attributes:
+            raise AttributeError("{0} has no attribute {1}".format(type(self).__name__, name))
+        return getattr(self.target, name)
+
+    def __repr__(self):
+        return "<{0} of {1} ({2} pages)>".format(type(self).__name__, self.target, len(self.pages))
+
+    @property
+    def peb(self):
+        """The PEB of ``target`` read through the cache"""
+        return type(self.target).peb.fget(self)
+
+    def invalidate(self, addr=None, size=PAGE_SIZE):
+        """Drop the pages of ``[addr, addr + size[`` (default is all the pages)"""
+        if addr is None:
+            self.pages.clear()
+            return
+        for page in range(addr & ~(PAGE_SIZE - 1), addr + size, PAGE_SIZE):
+            self.pages.pop(page, None)
+
+    def read_pages(self, addr, nb_pages):
+        """Read ``nb_pages`` pages at ``addr`` in ``target``: one read, then one by page if it fails"""
+        try:
+            data = self.target.read_memory(addr, nb_pages * PAGE_SIZE)
+        except winproxy.Kernel32Error:
+            if nb_pages == 1:
+                raise
+            return [self.read_pages(addr + i * PAGE_SIZE, 1)[0] for i in range(nb_pages)]
+        return [data[i: i + PAGE_SIZE] for i in range(0, len(data), PAGE_SIZE)]
+
+    def read_memory(self, addr, size):
+        """Read ``size`` from ``addr`` (through the cache)
+
+        :rtype: :class:`str`
+        """
+        first_page = addr & ~(PAGE_SIZE - 1)
+        pages = range(first_page, addr + size, PAGE_SIZE)
+        data = [self.pages.get(page) for page in pages]
+        index = 0
+        while index < len(pages):
+            if data[index] is not None:
+                index += 1
+                continue
+            # Read the adjacent missing pages at once
+            end = index
+            while end < len(pages) and data[end] is None:
+                end += 1
+            for i, page_data in enumerate(self.read_pages(pages[index], end - index), index):
+                data[i] = page_data
+                self.pages[pages[i]] = page_data
+            index = end
+        offset = addr - first_page
+        return "".join(data)[offset: offset + size]
+
+    def write_memory(self, addr, data):
+        """Write ``data`` at ``addr`` in ``target`` and invalidate the pages"""
+        try:
+            return self.target.write_memory(addr, data)
+        finally:
+            self.invalidate(addr, len(data))
+
+    def virtual_protect(self, addr, size, protect, old_protect):
+        """Change the protection of the pages in ``target`` and invalidate them"""
+        try:
+            return self.target.virtual_protect(addr, size, protect, old_protect)
+        finally:
+            self.invalidate(addr, size)
+
+    @contextmanager
+    def virtual_protected(self, addr, size, protect):
+        """A context manager for :meth:`virtual_protect` (old Protection are restored at exit)"""
+        old_protect = DWORD()
+        self.virtual_protect(addr, size, protect, old_protect)
+        try:
+            yield addr
+        finally:
+            self.virtual_protect(addr, size, old_protect.value, old_protect)
+
+    def write_byte(self, addr, byte):
+        """write a byte at ``addr``"""
+        return self.write_memory(addr, BYTE_STRUCT.pack(byte))
+
+    def write_short(self, addr, word):
+        """write a word at ``addr``"""
+        return self.write_memory(addr, SHORT_STRUCT.pack(word))
+
+    def write_dword(self, addr, dword):
+        """write a dword at ``addr``"""
+        return self.write_memory(addr, DWORD_STRUCT.pack(dword))
+
+    def write_qword(self, addr, qword):
+        """write a qword at ``addr``"""
+        return self.write_memory(addr, QWORD_STRUCT.pack(qword))
+
+    def read_memory_into(self, addr, struct):
+        """Read a :mod:`ctypes` struct from `addr` (through the cache)
+
+            :returns: struct
+        """
+        size = ctypes.sizeof(struct)
+        ctypes.memmove(ctypes.addressof(struct), self.read_memory(addr, size), size)
+        return struct
+
+    def read_memory_into_buffer(self, addr, buffer, size=None, offset=0):
+        """Read ``size`` bytes at ``addr`` at ``offset`` in ``buffer`` (through the cache)"""
+        if size is None:
+            size = len(buffer) - offset
+        read_memory_into_buffer(self, addr, size, buffer, offset)
+        return buffer
+
+    def read_memory_multi(self, ranges):
+        """Read the ``(addr, size)`` of ``ranges`` (through the cache, see :func:`read_memory_multi`)"""
+        return read_memory_multi(self, ranges)
+
+    def read_byte(self, addr):
+        """Read a ``CHAR`` at ``addr``"""
+        return BYTE_STRUCT.unpack(self.read_memory(addr, 1))[0]
+
+    def read_short(self, addr):
+        """Read a ``SHORT`` at ``addr``"""
+        return SHORT_STRUCT.unpack(self.read_memory(addr, 2))[0]
+
+    def read_dword(self, addr):
+        """Read a ``DWORD`` at ``addr``"""
+        return DWORD_STRUCT.unpack(self.read_memory(addr, 4))[0]
+
+    def read_qword(self, addr):
+        """Read a ``ULONG64`` at ``addr``"""
+        return QWORD_STRUCT.unpack(self.read_memory(addr, 8))[0]
+
+    def read_ptr(self, addr):
+        """Read a ``PTR`` at ``addr``"""
+        if self.bitness == 32:
+            return self.read_dword(addr)
+        return self.read_qword(addr)
+
+    def read_string(self, addr, max_length=None):
+        """Read an ascii string at ``addr`` (page by page)"""
+        return read_terminated_string(self, addr, 1, max_length)
+
+    def read_wstring(self, addr, max_length=None):
+        """Read a windows UTF16 string at ``addr`` (page by page)"""
+        return read_terminated_string(self, addr, 2, max_length).decode("utf16")
+
+    def read_strings(self, addrs, max_length=None):
+        """Read the ascii strings at ``addrs`` (see :func:`read_terminated_strings`)"""
+        return read_terminated_strings(self, addrs, 1, max_length)
+
+    def read_wstrings(self, addrs, max_length=None):
+        """Read the windows UTF16 strings at ``addrs`` (see :func:`read_terminated_strings`)"""
+        return [None if data is None else data.decode("utf16") for data in read_terminated_strings(self, addrs, 2, max_length)]
+
+
+READ_MULTI_GAP = 0x100
+
+
+def plan_reads(ranges, max_gap=READ_MULTI_GAP):
+    """Return the reads that cover ``ranges`` (a list of ``(addr, size)``) as a list of ``(addr, size, indexes)``.
+
+    The ranges are sorted and merged when they overlap or when at most ``max_gap`` bytes separate them.
+    ``indexes`` are the indexes in ``ranges`` of the ranges covered by the read.
+    """
+    reads = []
+    for index in sorted(range(len(ranges)), key=lambda index: ranges[index][0]):
+        addr, size = ranges[index]
+        if reads and addr <= reads[-1][0] + reads[-1][1] + max_gap:
+            read_addr, read_size, indexes = reads[-1]
+            reads[-1] = (read_addr, max(read_size, addr + size - read_addr), indexes)
+            indexes.append(index)
+        else:
+            reads.append((addr, size, [index]))
+    return reads
+
+
+def read_memory_into_buffer(target, addr, size, buffer, offset):
+    """Read ``size`` bytes at ``addr`` in ``target`` at ``offset`` in the :class:`bytearray` (or :class:`memoryview`) ``buffer``"""
+    if not size:
+        return
+    if offset + size > len(buffer):
+        raise ValueError("Cannot read {0:#x} bytes at offset {1:#x} of a buffer of size {2:#x}".format(size, offset, len(buffer)))
+    # Looked up on the type: the wrappers (CachedTarget, pe_parse.HeaderSnapshot, ...) forward
+    # their unknown attributes to the process but must be read through their read_memory
+    low_read_memory = getattr(type(target), "low_read_memory", None)
+    if low_read_memory is not None:
+        try:
+            cbuffer = (c_char * size).from_buffer(buffer, offset)
+        except TypeError:
+            # python2 memoryview: no ctypes view
+            cbuffer = None
+        if cbuffer is not None:
+            # ReadProcessMemory directly in the buffer
+            low_read_memory(target, addr, ctypes.byref(cbuffer), size)
+            return
+    buffer[offset: offset + size] = target.read_memory(addr, size)
+
+
+READ_ARENA_SIZE = 0x1000
+READ_ARENA_MAX_SIZE = 0x100000
+
+
+class ReadArena(object):
+    """A reusable buffer for the reads in a process: a :class:`bytearray` and its :mod:`ctypes` view"""
+    def __init__(self, size):
+        self.size = size
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.cbuffer = (c_char * size).from_buffer(self.buffer)
+        self.ref = ctypes.byref(self.cbuffer)
+
+    def __repr__(self):
+        return "<{0} size={1:#x}>".format(type(self).__name__, self.size)
+
+
+def read_readable_memory_into_buffer(target, addr, size, buffer, offset):
+    """Same as :func:`read_memory_into_buffer` but return the size of the readable start of the range instead of failing"""
+    try:
+        read_memory_into_buffer(target, addr, size, buffer, offset)
+        return size
+    except (winproxy.Kernel32Error, NtStatusException):
+        pass
+    # Read page by page up to the first unreadable page
+    readable = 0
+    while readable < size:
+        chunk_size = min(PAGE_SIZE - ((addr + readable) & (PAGE_SIZE - 1)), size - readable)
+        try:
+            read_memory_into_buffer(target, addr + readable, chunk_size, buffer, offset + readable)
+        except (winproxy.Kernel32Error, NtStatusException):
+            break
+        readable += chunk_size
+    return readable
+
+
+def read_memory_multi(target, ranges, max_gap=READ_MULTI_GAP):
+    """Read the ``(addr, size)`` of ``ranges`` in ``target`` with the reads of :func:`plan_reads` in one shared buffer.
+
+    Return a :class:`memoryview` of the buffer by range. The view of a range that is not readable is truncated
+    to the readable start of the range (it can be empty): the reads do not raise.
+    ``target`` is any object with a ``read_memory`` (a ``low_read_memory`` method of its class reads directly in the buffer).
+    """
+    reads = plan_reads(ranges, max_gap)
+    buffer = bytearray(sum(size for addr, size, indexes in reads))
+    view = memoryview(buffer)
+    res = [None] * len(ranges)
+    offset = 0
+    for addr, size, indexes in reads:
+        readable = read_readable_memory_into_buffer(target, addr, size, buffer, offset)
+        # The end of the first unreadable page
+        unreadable_end = ((addr + readable) & ~(PAGE_SIZE - 1)) + PAGE_SIZE
+        for index in indexes:
+            range_addr, range_size = ranges[index]
+            start = offset + range_addr - addr
+            if range_addr + range_size <= addr + readable:
+                range_readable = range_size
+            elif range_addr < unreadable_end:
+                range_readable = max(addr + readable - range_addr, 0)
+            else:
+                # After the unreadable page: the range may be readable alone
+                range_readable = read_readable_memory_into_buffer(target, range_addr, range_size, buffer, start)
+            res[index] = view[start: start + range_readable]
+        offset += size
+    return res
+
+
+def find_terminator(data, char_size=1):
+    """The offset of the first NULL char of ``char_size`` bytes in ``data`` (aligned on ``char_size``) or ``-1``"""
+    terminator = "\x00" * char_size
+    end = data.find(terminator)
+    while end != -1 and end % char_size:
+        end = data.find(terminator, end + 1)
+    return end
+
+
+def read_terminated_string(target, addr, char_size=1, max_length=None):
+    """Read the NULL terminated string of ``char_size`` bytes chars at ``addr`` in ``target`` (without the NULL char).
+
+    The reads stop at the page boundaries: the string does not need to be followed by readable memory.
+    The string is truncated to ``max_length`` chars.
+    """
+    max_size = None if max_length is None else max_length * char_size
+    return _read_terminated_string(target, addr, char_size, max_size, "")
+
+
+def _read_terminated_string(target, addr, char_size, max_size, data):
+    # data: the start of the string already read, addr: the address after data
+    res = []
+    read_size = len(data)
+    while True:
+        end = find_terminator(data, char_size)
+        if end != -1:
+            res.append(data[:end])
+            break
+        if max_size is not None and read_size >= max_size:
+            res.append(data)
+            break
+        # An incomplete char stays in data for the next read
+        complete = len(data) - len(data) % char_size
+        res.append(data[:complete])
+        size = PAGE_SIZE - (addr & (PAGE_SIZE - 1))
+        if max_size is not None:
+            size = min(size, max_size - read_size)
+        data = data[complete:] + target.read_memory(addr, size)
+        addr += size
+        read_size += size
+    return "".join(res)
+
+
+def read_terminated_strings(target, addrs, char_size=1, max_length=None, max_gap=READ_MULTI_GAP):
+    """Read the NULL terminated strings at ``addrs`` in ``target`` (see :func:`read_terminated_string`).
+
+    The starts of the strings (up to their page boundary) are read with one :func:`read_memory_multi`,
+    the strings longer than that are completed one by one. The string of an unreadable address is ``None``.
+    """
+    max_size = None if max_length is None else max_length * char_size
+    ranges = []
+    for addr in addrs:
+        size = PAGE_SIZE - (addr & (PAGE_SIZE - 1))
+        if max_size is not None:
+            size = min(size, max_size)
+        ranges.append((addr, size))
+    res = []
+    for (addr, size), view in zip(ranges, read_memory_multi(target, ranges, max_gap)):
+        data = view.tobytes()
+        if len(data) < size:
+            # The end of the start of the string is not readable
+            end = find_terminator(data, char_size)
+            res.append(data[:end] if end != -1 else None)
+            continue
+        try:
+            res.append(_read_terminated_string(target, addr + size, char_size, max_size, data))
+        except (winproxy.Kernel32Error, NtStatusException):
+            res.append(None)
+    return res
+
+
 class Token(AutoHandle):
     """The token of a process"""
     def __init__(self, handle):
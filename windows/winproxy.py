@@ -834,6 +834,16 @@ def RtlDecompressBuffer(CompressionFormat, UncompressedBuffer, UncompressedBuffe
     return RtlDecompressBuffer.ctypes_function(CompressionFormat, UncompressedBuffer, UncompressedBufferSize, CompressedBuffer, CompressedBufferSize, FinalUncompressedSize)
 
 
+@NtdllProxy("RtlAddFunctionTable", zero_is_fail_error_check)
+def RtlAddFunctionTable(FunctionTable, EntryCount, BaseAddress):
+    return RtlAddFunctionTable.ctypes_function(FunctionTable, EntryCount, BaseAddress)
+
+
+@NtdllProxy("RtlDeleteFunctionTable", zero_is_fail_error_check)
+def RtlDeleteFunctionTable(FunctionTable):
+    return RtlDeleteFunctionTable.ctypes_function(FunctionTable)
+
+
 
 # ##### ADVAPI32 ####### #
 